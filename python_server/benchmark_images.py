@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark for parallel image resolution
+Compares fetching images one word at a time with resolve_images(),
+using local stub upstreams so results are repeatable and offline
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from stub_upstreams import StubUpstream
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Benchmark sequential vs parallel image resolution')
+    parser.add_argument('--words', type=int, default=50, help='Words per vocabulary list (default: 50)')
+    parser.add_argument('--latency-ms', type=float, default=100, help='Stub upstream latency per request (default: 100)')
+    parser.add_argument('--workers', type=int, default=8, help='IMAGE_WORKERS for the parallel run (default: 8)')
+    parser.add_argument('--runs', type=int, default=3, help='Repetitions of each mode (default: 3)')
+    return parser.parse_args()
+
+
+def clear_images(server, words):
+    """
+    Remove downloaded images (and their manifest entries) and the words'
+    cached image URLs, so every run starts cold and repeats the lookups.
+    """
+    for path in server.image_store.manifest.paths():
+        server.image_store.remove(path)
+    for word in words:
+        server.resolution_cache.delete(word)
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    args = parse_args()
+
+    stub = StubUpstream(latency=args.latency_ms / 1000)
+    base_url = stub.start()
+    images_dir = Path(tempfile.mkdtemp(prefix='vocab-bench-'))
+
+    # server.py reads its configuration at import time
+    os.environ['WIKIPEDIA_API_URL'] = f"{base_url}/w/api.php"
+    os.environ['UNSPLASH_ACCESS_KEY'] = ''
+    os.environ['VOCAB_IMAGES_DIR'] = str(images_dir)
+    # Inside the images directory, so they are removed with it
+    os.environ['RESOLUTION_CACHE_PATH'] = str(images_dir / '.resolution_cache.sqlite3')
+    os.environ['IMAGE_STORE_DB_PATH'] = str(images_dir / '.index.sqlite3')
+    os.environ['IMAGE_WORKERS'] = str(args.workers)
+    # Renditions are built in the background and would keep files in use between runs
+    os.environ['RENDITION_WIDTHS'] = ''
+    # The stub has no quota; don't let upstream rate limiting skew the timings
+    # (it shares its host with the Wikipedia API URL, which otherwise gets Wikipedia's limit)
+    os.environ['UPSTREAM_RATE_LIMITS'] = '127.0.0.1=100000:100000'
+    os.environ['UPSTREAM_DEFAULT_RATE_LIMIT'] = '100000:100000'
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark-stub-key')
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    import server
+    server.logger.setLevel('WARNING')
+
+    words = [f"Word {i}" for i in range(args.words)]
+
+    def run_sequential():
+        return [server.search_and_save_image(word) for word in words]
+
+    def run_parallel():
+        return server.resolve_images(words)
+
+    print(f"\nWords per list: {args.words}, stub latency: {args.latency_ms:.0f}ms, workers: {args.workers}")
+    print(f"{'mode':<12}{'median (s)':>12}{'min (s)':>10}{'images':>8}")
+
+    timings = {}
+    try:
+        for mode, runner in (('sequential', run_sequential), ('parallel', run_parallel)):
+            samples = []
+            for _ in range(args.runs):
+                clear_images(server, words)
+                start = time.perf_counter()
+                paths = runner()
+                samples.append(time.perf_counter() - start)
+
+            saved = sum(1 for path in paths if path)
+            timings[mode] = statistics.median(samples)
+            print(f"{mode:<12}{timings[mode]:>12.3f}{min(samples):>10.3f}{saved:>8}")
+
+        print(f"\nSpeedup: {timings['sequential'] / timings['parallel']:.1f}x")
+    finally:
+        stub.stop()
+        shutil.rmtree(images_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for /generate_vocab
+Runs server.py on a local port against stub OpenAI, Wikipedia, Unsplash and
+image host upstreams (see stub_upstreams.py), then measures request latency
+percentiles and throughput for each combination of list size and number of
+concurrent clients. Results can be written as JSON for comparing runs.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from stub_upstreams import StubUpstream
+
+
+def parse_list(value):
+    """Parse a comma separated list of positive integers."""
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Benchmark /generate_vocab against local stub upstreams')
+    parser.add_argument('--sizes', type=parse_list, default=[5, 20], help='List sizes (numWords) to test (default: 5,20)')
+    parser.add_argument('--concurrency', type=parse_list, default=[1, 4, 8],
+                        help='Concurrent clients to test (default: 1,4,8)')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per combination (default: 20)')
+    add_stub_arguments(parser)
+    parser.add_argument('--warm', action='store_true',
+                        help='Measure repeated requests answered from the caches instead of cold ones')
+    parser.add_argument('--json', dest='json_path', help="Write the results as JSON to this file ('-' for stdout)")
+    return parser.parse_args()
+
+
+def add_stub_arguments(parser):
+    """Add the options configuring the stub upstreams and the server under test."""
+    parser.add_argument('--latency-ms', type=float, default=50,
+                        help='Wikipedia/Unsplash/image host latency per request (default: 50)')
+    parser.add_argument('--openai-latency-ms', type=float, default=300,
+                        help='Time before a completion starts streaming (default: 300)')
+    parser.add_argument('--word-delay-ms', type=float, default=30,
+                        help='Time between streamed words (default: 30)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of upstream requests answered with a 503 (default: 0)')
+    parser.add_argument('--miss-rate', type=float, default=0.2,
+                        help='Fraction of words without a Wikipedia image, falling back to Unsplash (default: 0.2)')
+    parser.add_argument('--image-kb', type=float, default=50, help='Size of each image served (default: 50)')
+    parser.add_argument('--no-unsplash', action='store_true', help='Run without the Unsplash fallback')
+    parser.add_argument('--workers', type=int, help='IMAGE_WORKERS (default: the server default)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for injected errors and other random choices (default: 1)')
+
+
+def stub_config(args):
+    """The stub and server options from add_stub_arguments(), for the JSON output."""
+    return {
+        'latency_ms': args.latency_ms,
+        'openai_latency_ms': args.openai_latency_ms,
+        'word_delay_ms': args.word_delay_ms,
+        'error_rate': args.error_rate,
+        'miss_rate': args.miss_rate,
+        'image_kb': args.image_kb,
+        'unsplash': not args.no_unsplash,
+        'python': platform.python_version()
+    }
+
+
+def start_stubbed_server(args):
+    """
+    Start the stub upstreams and server.py (on a local port, pointed at them)
+    as configured by the add_stub_arguments() options.
+    
+    Returns:
+        (the StubUpstream, the imported server module, the HTTP server,
+        the server's base URL, the temporary images directory)
+    """
+    stub = StubUpstream(
+        latency=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        image_bytes=int(args.image_kb * 1024),
+        openai_latency=args.openai_latency_ms / 1000,
+        word_delay=args.word_delay_ms / 1000,
+        miss_rate=args.miss_rate,
+        seed=args.seed
+    )
+    stub_url = stub.start()
+    images_dir = Path(tempfile.mkdtemp(prefix='vocab-bench-'))
+
+    # server.py reads its configuration at import time
+    os.environ['OPENAI_API_KEY'] = 'benchmark-stub-key'
+    os.environ['OPENAI_BASE_URL'] = f"{stub_url}/v1"
+    os.environ['WIKIPEDIA_API_URL'] = f"{stub_url}/w/api.php"
+    os.environ['UNSPLASH_API_URL'] = stub_url
+    os.environ['UNSPLASH_ACCESS_KEY'] = '' if args.no_unsplash else 'benchmark-stub-key'
+    os.environ['VOCAB_IMAGES_DIR'] = str(images_dir)
+    # Inside the images directory, so they are removed with it
+    os.environ['RESOLUTION_CACHE_PATH'] = str(images_dir / '.resolution_cache.sqlite3')
+    os.environ['IMAGE_STORE_DB_PATH'] = str(images_dir / '.index.sqlite3')
+    if args.workers:
+        os.environ['IMAGE_WORKERS'] = str(args.workers)
+    # Renditions are built in the background and would compete with the requests
+    os.environ['RENDITION_WIDTHS'] = ''
+    # Every stub shares one host, which would otherwise get the Unsplash quota
+    os.environ['UPSTREAM_RATE_LIMITS'] = '127.0.0.1=100000:100000'
+    os.environ['UPSTREAM_DEFAULT_RATE_LIMIT'] = '100000:100000'
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    import server
+    from werkzeug.serving import make_server
+    # Injected upstream errors (and per-request logs from the HTTP libraries) would flood the output
+    server.logger.setLevel('CRITICAL')
+    logging.getLogger().setLevel('WARNING')
+    logging.getLogger('werkzeug').setLevel('WARNING')
+
+    http_server = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return stub, server, http_server, f"http://127.0.0.1:{http_server.server_port}", images_dir
+
+
+def percentile(samples, percent):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def post_json(url, body):
+    """POST a JSON body and return (status, parsed response or None)."""
+    request = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, None
+    except OSError:
+        return 0, None
+
+
+def run_level(base_url, themes, num_words, concurrency):
+    """
+    Send one /generate_vocab request per theme from concurrency clients.
+
+    Returns:
+        (wall time, list of (latency, status, response) per request)
+    """
+    def send(theme):
+        start = time.perf_counter()
+        status, response = post_json(f"{base_url}/generate_vocab", {'theme': theme, 'numWords': num_words})
+        return time.perf_counter() - start, status, response
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(send, themes))
+    return time.perf_counter() - start, outcomes
+
+
+def summarize(num_words, concurrency, wall, outcomes, stub):
+    """Build the result record for one combination."""
+    latencies = [latency for latency, status, _ in outcomes if status == 200]
+    responses = [response for _, status, response in outcomes if status == 200 and response]
+    words = sum(response['count'] for response in responses)
+
+    def ms(seconds):
+        return round(seconds * 1000, 1) if seconds is not None else None
+
+    return {
+        'num_words': num_words,
+        'concurrency': concurrency,
+        'requests': len(outcomes),
+        'ok': len(latencies),
+        'errors': len(outcomes) - len(latencies),
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 50)),
+            'p90': ms(percentile(latencies, 90)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(max(latencies)) if latencies else None,
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None
+        },
+        'wall_s': round(wall, 3),
+        'requests_per_s': round(len(latencies) / wall, 2),
+        'words_per_s': round(words / wall, 1),
+        'images_generated': sum(response['imagesGenerated'] for response in responses),
+        'images_failed': sum(response['imagesFailed'] for response in responses),
+        'images_pending': sum(response['imagesPending'] for response in responses),
+        'deadline_exceeded': sum(1 for response in responses if response['deadlineExceeded']),
+        'upstream_requests': dict(stub.request_counts),
+        'upstream_errors_injected': stub.errors_injected
+    }
+
+
+def main():
+    """Run the benchmark and print (and optionally save) the results."""
+    args = parse_args()
+    stub, server, http_server, base_url, images_dir = start_stubbed_server(args)
+
+    config = {
+        'sizes': args.sizes,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        **stub_config(args),
+        'image_workers': server.IMAGE_WORKERS,
+        'warm': args.warm
+    }
+
+    print(f"\nStub latency {args.latency_ms:.0f}ms, OpenAI {args.openai_latency_ms:.0f}ms + "
+          f"{args.word_delay_ms:.0f}ms/word, error rate {args.error_rate:.0%}, "
+          f"images {args.image_kb:.0f} KB, workers {server.IMAGE_WORKERS}, {'warm' if args.warm else 'cold'}")
+    print(f"{'words':>6}{'clients':>8}{'ok':>5}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'req/s':>8}{'words/s':>9}{'img fail':>9}")
+
+    results = []
+    try:
+        for num_words in args.sizes:
+            for concurrency in args.concurrency:
+                # Unique themes make every word (and image) new to the server
+                themes = [f"Bench {num_words}x{concurrency} {i}" for i in range(args.requests)]
+                if args.warm:
+                    run_level(base_url, themes, num_words, concurrency)
+
+                stub.reset_counts()
+                wall, outcomes = run_level(base_url, themes, num_words, concurrency)
+                result = summarize(num_words, concurrency, wall, outcomes, stub)
+                results.append(result)
+
+                latency = result['latency_ms']
+                print(f"{num_words:>6}{concurrency:>8}{result['ok']:>5}{result['errors']:>5}"
+                      f"{latency['p50'] or 0:>9.0f}{latency['p95'] or 0:>9.0f}{latency['p99'] or 0:>9.0f}"
+                      f"{result['requests_per_s']:>8.2f}{result['words_per_s']:>9.1f}{result['images_failed']:>9}")
+    finally:
+        http_server.shutdown()
+        stub.stop()
+        shutil.rmtree(images_dir, ignore_errors=True)
+
+    if args.json_path:
+        output = json.dumps({'config': config, 'results': results}, indent=2)
+        if args.json_path == '-':
+            print(output)
+        else:
+            Path(args.json_path).write_text(output + '\n', encoding='utf-8')
+            print(f"\nResults written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Shared setup for the unit tests (python -m pytest)
+server.py reads its configuration at import time, so before any test module
+imports it the server is pointed at a temporary images directory, with no
+background tasks, renditions or Unsplash key.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Manual scripts that need a running server or the real upstreams
+collect_ignore = ['test_server.py', 'test_free_images.py']
+
+TEST_IMAGES_DIR = Path(tempfile.mkdtemp(prefix='vocab-tests-')) / 'vocab_images'
+
+os.environ['VOCAB_IMAGES_DIR'] = str(TEST_IMAGES_DIR)
+os.environ['RESOLUTION_CACHE_PATH'] = str(TEST_IMAGES_DIR.parent / 'resolution_cache.sqlite3')
+os.environ['IMAGE_STORE_BACKGROUND_TASKS'] = 'false'
+os.environ['MANIFEST_VERIFY_INTERVAL'] = '0'
+os.environ['RENDITION_WIDTHS'] = ''
+os.environ['UNSPLASH_ACCESS_KEY'] = ''
+os.environ.pop('UPSTREAM_CASSETTE_MODE', None)
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def pytest_unconfigure(config):
+    """Remove the temporary images directory."""
+    shutil.rmtree(TEST_IMAGES_DIR.parent, ignore_errors=True)
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the vocabulary server
+Replays a mix of /generate_vocab, /generate, /regenerate_image and
+/vocab_images/* requests at a fixed arrival rate, stepping the rate up to
+find where the server saturates. Requests are sent on schedule whether or
+not earlier ones have finished (as independent users would), and latency
+is measured from each request's scheduled time, so a stalled server shows
+up as queueing delay instead of a lower request rate.
+
+The mix is either synthetic (--mix weights over a pool of classroom themes)
+or replayed from a JSON lines file (--replay) with one request per line:
+{"method": "POST", "path": "/generate_vocab", "body": {...}}
+"""
+
+import argparse
+import json
+import random
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmark_vocab import add_stub_arguments, percentile, start_stubbed_server, stub_config
+
+ENDPOINTS = ('generate_vocab', 'generate', 'regenerate_image', 'image')
+
+THEMES = [
+    'Animals', 'Ocean Animals', 'Farm Animals', 'Food', 'Fruit', 'Vegetables', 'Weather', 'Seasons',
+    'Space', 'Planets', 'Transport', 'Jobs', 'Sports', 'Musical Instruments', 'Clothes', 'Body Parts',
+    'Family', 'School', 'Kitchen', 'Furniture', 'Plants', 'Insects', 'Birds', 'Dinosaurs', 'Emotions',
+    'Shapes', 'Colours', 'Countries', 'Landforms', 'Buildings', 'Tools', 'Holidays'
+]
+
+
+def parse_mix(value):
+    """Parse endpoint weights such as generate_vocab=5,image=20."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name.strip()}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def parse_rates(value):
+    """Parse a comma separated list of request rates."""
+    return [float(item) for item in value.split(',') if item.strip()]
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Open-loop load test for the vocabulary server')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://localhost:3001', help='Server to test (default: http://localhost:3001)')
+    target.add_argument('--local', action='store_true',
+                        help='Start the server in-process against stub upstreams (see benchmark_vocab.py options)')
+    parser.add_argument('--rates', type=parse_rates, default=[1, 2, 4, 8],
+                        help='Requests per second to step through (default: 1,2,4,8)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds at each rate (default: 30)')
+    parser.add_argument('--arrivals', choices=('poisson', 'uniform'), default='poisson',
+                        help='Random (poisson) or evenly spaced arrivals (default: poisson)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('generate_vocab=4,generate=1,regenerate_image=1,image=20'),
+                        help='Synthetic request weights (default: generate_vocab=4,generate=1,regenerate_image=1,image=20)')
+    parser.add_argument('--themes', type=int, default=len(THEMES),
+                        help=f"Distinct themes in the synthetic mix; fewer means more cache hits (default: {len(THEMES)})")
+    parser.add_argument('--num-words', type=int, default=10, help='Words per synthetic vocabulary request (default: 10)')
+    parser.add_argument('--replay', type=Path, help='JSON lines file of requests to send in order (repeated as needed)')
+    parser.add_argument('--save-requests', type=Path, help='Write every request sent as JSON lines, for --replay')
+    parser.add_argument('--timeout', type=float, default=60, help='Client timeout per request in seconds (default: 60)')
+    parser.add_argument('--max-in-flight', type=int, default=256,
+                        help='Requests outstanding at once before new arrivals are dropped (default: 256)')
+    parser.add_argument('--slo-ms', type=float, default=10000,
+                        help='p95 latency above which a rate counts as saturated (default: 10000)')
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='Error rate above which a rate counts as saturated (default: 0.01)')
+    parser.add_argument('--keep-going', action='store_true', help='Run every rate even after saturation')
+    parser.add_argument('--json', dest='json_path', help="Write the results as JSON to this file ('-' for stdout)")
+    stub = parser.add_argument_group('--local options')
+    add_stub_arguments(stub)
+    return parser.parse_args()
+
+
+class SyntheticTraffic:
+    """
+    Generates requests in proportion to the mix weights. Vocabulary requests
+    pick from a pool of themes; image and regeneration requests use words and
+    image URLs from earlier vocabulary responses, as a class loading a list
+    would (and fall back to a vocabulary request until there are some).
+
+    Args:
+        mix: Endpoint name -> weight
+        themes: Number of distinct themes to use
+        num_words: Words per vocabulary request
+        rng: random.Random for repeatable runs
+    """
+
+    def __init__(self, mix, themes, num_words, rng):
+        self.endpoints = list(mix)
+        self.weights = [mix[endpoint] for endpoint in self.endpoints]
+        self.themes = [THEMES[i % len(THEMES)] + (f" {i // len(THEMES) + 1}" if i >= len(THEMES) else '')
+                       for i in range(max(1, themes))]
+        self.num_words = num_words
+        self.rng = rng
+        self.words = []
+        self.image_paths = []
+        self._lock = threading.Lock()
+
+    def next_request(self):
+        """Return the next (endpoint, method, path, body)."""
+        endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+        with self._lock:
+            if endpoint == 'image' and self.image_paths:
+                return endpoint, 'GET', self.rng.choice(self.image_paths), None
+            if endpoint == 'regenerate_image' and self.words:
+                return endpoint, 'POST', '/regenerate_image', {'word': self.rng.choice(self.words)}
+
+        theme = self.rng.choice(self.themes)
+        if endpoint == 'generate':
+            return endpoint, 'POST', '/generate', {'type': 'vocab', 'theme': theme, 'numQuestions': self.num_words}
+        return 'generate_vocab', 'POST', '/generate_vocab', {'theme': theme, 'numWords': self.num_words}
+
+    def observe(self, response):
+        """Collect words and image paths from a vocabulary response."""
+        items = response.get('vocabulary') or response.get('questions') or []
+        with self._lock:
+            for item in items:
+                if item.get('word') and item['word'] not in self.words:
+                    self.words.append(item['word'])
+                image_url = item.get('imageUrl') or item.get('image')
+                if image_url:
+                    path = urllib.parse.urlsplit(image_url).path
+                    if path not in self.image_paths:
+                        self.image_paths.append(path)
+
+
+class ReplayTraffic:
+    """
+    Sends recorded requests in order, starting again at the top when the
+    file runs out.
+
+    Args:
+        path: JSON lines file of {"method", "path", "body"} records
+    """
+
+    def __init__(self, path):
+        self.requests = []
+        for line in path.read_text(encoding='utf-8').splitlines():
+            if line.strip():
+                record = json.loads(line)
+                self.requests.append((endpoint_name(record['path']), record.get('method', 'GET'),
+                                      record['path'], record.get('body')))
+        if not self.requests:
+            raise ValueError(f"No requests in {path}")
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def next_request(self):
+        """Return the next (endpoint, method, path, body)."""
+        with self._lock:
+            request = self.requests[self._next % len(self.requests)]
+            self._next += 1
+        return request
+
+    def observe(self, response):
+        """Recorded requests don't depend on earlier responses."""
+        pass
+
+
+def endpoint_name(path):
+    """Group a request path under one of ENDPOINTS (or 'other')."""
+    path = urllib.parse.urlsplit(path).path
+    if path.startswith('/vocab_images/'):
+        return 'image'
+    name = path.strip('/')
+    return name if name in ENDPOINTS else 'other'
+
+
+def send_request(base_url, method, path, body, timeout):
+    """
+    Send one request.
+
+    Returns:
+        (HTTP status, or 0 if the connection failed or timed out; parsed JSON body or None)
+    """
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(f"{base_url}{path}", data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            content = response.read()
+            if response.headers.get_content_type() == 'application/json':
+                return response.status, json.loads(content)
+            return response.status, None
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, None
+    except (OSError, ValueError):
+        return 0, None
+
+
+def run_stage(base_url, traffic, rate, args, rng, saved):
+    """
+    Send requests at rate per second for args.duration seconds, without
+    waiting for responses, then wait for the stragglers.
+
+    Returns:
+        (list of (endpoint, latency, status) per request sent, number dropped,
+        seconds until the last response)
+    """
+    outcomes = []
+    outcomes_lock = threading.Lock()
+    in_flight = threading.Semaphore(args.max_in_flight)
+    dropped = 0
+
+    def fire(endpoint, method, path, body, scheduled):
+        try:
+            status, response = send_request(base_url, method, path, body, args.timeout)
+            # Measured from the scheduled start, so time spent waiting for a
+            # client thread counts too
+            latency = time.perf_counter() - scheduled
+            if response is not None and status == 200:
+                traffic.observe(response)
+            with outcomes_lock:
+                outcomes.append((endpoint, latency, status))
+        finally:
+            in_flight.release()
+
+    pool = ThreadPoolExecutor(max_workers=args.max_in_flight, thread_name_prefix='load')
+    start = time.perf_counter()
+    scheduled = start
+    while True:
+        scheduled += rng.expovariate(rate) if args.arrivals == 'poisson' else 1 / rate
+        if scheduled - start >= args.duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        endpoint, method, path, body = traffic.next_request()
+        if saved is not None:
+            saved.write(json.dumps({'method': method, 'path': path, 'body': body}) + '\n')
+        if not in_flight.acquire(blocking=False):
+            dropped += 1
+            continue
+        pool.submit(fire, endpoint, method, path, body, scheduled)
+
+    pool.shutdown(wait=True)
+    return outcomes, dropped, time.perf_counter() - start
+
+
+def summarize_stage(rate, duration, elapsed, outcomes, dropped, args):
+    """
+    Build the result record for one rate, with a breakdown per endpoint.
+    The achieved rate counts successful responses over the time until the
+    last one arrived, so a backlog the server can't clear lowers it.
+    """
+    def latency_stats(latencies):
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(max(latencies)) if latencies else None
+        }
+
+    def is_error(status):
+        # 404 from /regenerate_image ("no image found") is a normal answer
+        return status == 0 or status >= 500
+
+    sent = len(outcomes) + dropped
+    errors = sum(1 for _, _, status in outcomes if is_error(status)) + dropped
+    ok_latencies = [latency for _, latency, status in outcomes if not is_error(status)]
+
+    endpoints = {}
+    for name in sorted({endpoint for endpoint, _, _ in outcomes}):
+        selected = [(latency, status) for endpoint, latency, status in outcomes if endpoint == name]
+        statuses = {}
+        for _, status in selected:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        endpoints[name] = {
+            'requests': len(selected),
+            'errors': sum(1 for _, status in selected if is_error(status)),
+            'statuses': statuses,
+            'latency_ms': latency_stats([latency for latency, status in selected if not is_error(status)])
+        }
+
+    result = {
+        'target_rate': rate,
+        'offered_rate': round(sent / duration, 2),
+        'achieved_rate': round(len(ok_latencies) / elapsed, 2),
+        'requests': sent,
+        'errors': errors,
+        'dropped': dropped,
+        'error_rate': round(errors / sent, 4) if sent else 0.0,
+        'latency_ms': latency_stats(ok_latencies),
+        'endpoints': endpoints
+    }
+
+    reasons = []
+    if result['error_rate'] > args.max_error_rate:
+        reasons.append(f"error rate {result['error_rate']:.1%}")
+    if result['latency_ms']['p95'] is not None and result['latency_ms']['p95'] > args.slo_ms:
+        reasons.append(f"p95 {result['latency_ms']['p95']:.0f}ms")
+    if result['achieved_rate'] < 0.9 * result['offered_rate'] * (1 - result['error_rate']):
+        reasons.append(f"throughput {result['achieved_rate']:.2f}/s")
+    result['saturated'] = bool(reasons)
+    result['saturation_reasons'] = reasons
+    return result
+
+
+def main():
+    """Step through the request rates and report where the server saturates."""
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    stub = server = http_server = images_dir = None
+    base_url = args.url.rstrip('/')
+    if args.local:
+        stub, server, http_server, base_url, images_dir = start_stubbed_server(args)
+
+    traffic = ReplayTraffic(args.replay) if args.replay else SyntheticTraffic(args.mix, args.themes, args.num_words, rng)
+    saved = open(args.save_requests, 'w', encoding='utf-8') if args.save_requests else None
+
+    config = {
+        'target': 'local' if args.local else base_url,
+        'rates': args.rates,
+        'duration_s': args.duration,
+        'arrivals': args.arrivals,
+        'traffic': str(args.replay) if args.replay else args.mix,
+        'themes': args.themes,
+        'num_words': args.num_words,
+        'slo_ms': args.slo_ms,
+        'max_error_rate': args.max_error_rate,
+        'max_in_flight': args.max_in_flight
+    }
+    if args.local:
+        config.update(stub_config(args), image_workers=server.IMAGE_WORKERS)
+
+    print(f"\nTarget {config['target']}, {args.duration:.0f}s per rate, {args.arrivals} arrivals")
+    print(f"{'rate':>7}{'achieved':>10}{'sent':>7}{'err':>6}{'drop':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  status")
+
+    results = []
+    try:
+        for rate in args.rates:
+            outcomes, dropped, elapsed = run_stage(base_url, traffic, rate, args, rng, saved)
+            result = summarize_stage(rate, args.duration, elapsed, outcomes, dropped, args)
+            results.append(result)
+
+            latency = result['latency_ms']
+            status = f"saturated ({', '.join(result['saturation_reasons'])})" if result['saturated'] else 'ok'
+            print(f"{rate:>7.2f}{result['achieved_rate']:>10.2f}{result['requests']:>7}{result['errors']:>6}"
+                  f"{result['dropped']:>6}{latency['p50'] or 0:>9.0f}{latency['p95'] or 0:>9.0f}"
+                  f"{latency['p99'] or 0:>9.0f}  {status}")
+
+            if result['saturated'] and not args.keep_going:
+                break
+    except KeyboardInterrupt:
+        print("\nInterrupted")
+    finally:
+        if saved is not None:
+            saved.close()
+        if http_server is not None:
+            http_server.shutdown()
+            stub.stop()
+            shutil.rmtree(images_dir, ignore_errors=True)
+
+    sustained = [result['target_rate'] for result in results if not result['saturated']]
+    saturated = [result['target_rate'] for result in results if result['saturated']]
+    summary = {
+        'max_sustained_rate': max(sustained) if sustained else None,
+        'saturation_rate': min(saturated) if saturated else None
+    }
+
+    if summary['max_sustained_rate'] is not None:
+        print(f"\nHighest rate sustained: {summary['max_sustained_rate']} requests/s")
+    else:
+        print("\nNo rate tested was sustained")
+    if summary['saturation_rate'] is not None:
+        print(f"Saturated at:           {summary['saturation_rate']} requests/s")
+    else:
+        print("No saturation within the rates tested")
+
+    if args.json_path:
+        output = json.dumps({'config': config, 'results': results, 'summary': summary}, indent=2)
+        if args.json_path == '-':
+            print(output)
+        else:
+            Path(args.json_path).write_text(output + '\n', encoding='utf-8')
+            print(f"\nResults written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
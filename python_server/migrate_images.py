@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Migrate vocabulary images to the content-addressed store
+Moves every <word>.png left in the flat VOCAB_IMAGES_DIR layout into
+blobs/<aa>/<bb>/<sha256>.<ext>, maps its filename to the blob (so existing
+vocab_images/<word>.png URLs keep working) and stores identical images once.
+Can run while the server is up (it looks up files moved from under it in the
+SQLite index, and keeps running the evictor and manifest re-scans, which this
+script leaves off), and can be run again.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Migrate flat vocab_images files into the content-addressed store')
+    parser.add_argument('--dry-run', action='store_true', help='List the files that would be migrated without moving them')
+    return parser.parse_args()
+
+
+def main():
+    """Run the migration and print a summary."""
+    args = parse_args()
+
+    # server.py reads its configuration at import time; eviction and re-scans
+    # are left to the server
+    os.environ['IMAGE_STORE_BACKGROUND_TASKS'] = 'false'
+    sys.path.insert(0, str(Path(__file__).parent))
+    import server
+    server.logger.setLevel('WARNING')
+
+    legacy_files = sorted(server.VOCAB_IMAGES_DIR.glob('*.png'))
+    print(f"Images directory: {server.VOCAB_IMAGES_DIR}")
+    print(f"Flat-layout images found: {len(legacy_files)}")
+
+    if args.dry_run:
+        for path in legacy_files:
+            print(f"  would migrate {path.name}")
+        return
+
+    migrated = 0
+    deduplicated = 0
+    bytes_saved = 0
+    skipped = []
+
+    for path in legacy_files:
+        size = path.stat().st_size
+        result = server.image_store.import_file(path)
+        if result is None:
+            skipped.append(path.name)
+            continue
+
+        blob_path, was_duplicate = result
+        migrated += 1
+        if was_duplicate:
+            deduplicated += 1
+            bytes_saved += size
+        else:
+            server.ingest_image(blob_path)
+
+    # Let renditions for the migrated blobs finish before exiting
+    if server.rendition_executor is not None:
+        server.rendition_executor.shutdown(wait=True)
+
+    print(f"Migrated: {migrated}")
+    print(f"Duplicates stored once: {deduplicated} ({bytes_saved / 1024:.1f} KB saved)")
+    if skipped:
+        print(f"Skipped (not recognised as images, left in place): {len(skipped)}")
+        for name in skipped:
+            print(f"  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Resized image renditions for the vocabulary server
+build_renditions() runs in server.py's rendition process pool. It is kept in
+this small module, which needs only Pillow, so unpickling it in a worker
+process doesn't need server.py. Spawned workers still run the main script
+again as __mp_main__ when the server is started with `python server.py`;
+server.py skips its import-time side effects there (IN_WORKER_PROCESS).
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from PIL import Image
+
+
+def build_renditions(source_path: str, widths: List[int], rendition_format: str,
+                     quality: int, tmp_dir: str) -> Dict:
+    """
+    Decode an image once and write resized renditions next to it.
+    Runs in the rendition process pool, so it only relies on its arguments.
+
+    Args:
+        source_path: Path of the downloaded image
+        widths: Rendition widths in pixels (never upscaled past the original)
+        rendition_format: 'webp' or 'avif'
+        quality: Encoder quality (0-100)
+        tmp_dir: Directory for partially written files
+
+    Returns:
+        Metadata with the original width, height and format and the rendition filenames
+    """
+    source = Path(source_path)
+
+    with Image.open(source) as img:
+        original_format = (img.format or '').lower()
+        width, height = img.size
+        img.load()
+
+        if img.mode not in ('RGB', 'RGBA'):
+            has_alpha = img.mode in ('LA', 'PA', 'P') or 'transparency' in img.info
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+
+        renditions = {}
+        for target_width in widths:
+            rendition_width = min(target_width, width)
+            rendition_height = max(1, round(height * rendition_width / width))
+            resized = img if rendition_width == width else img.resize((rendition_width, rendition_height), Image.LANCZOS)
+
+            rendition_path = source.with_name(f"{source.stem}.{target_width}w.{rendition_format}")
+            with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix='.part', delete=False) as f:
+                resized.save(f, format=rendition_format.upper(), quality=quality)
+            os.replace(f.name, rendition_path)
+            renditions[str(target_width)] = rendition_path.name
+
+    metadata = {
+        'width': width,
+        'height': height,
+        'format': original_format,
+        'renditionFormat': rendition_format,
+        'renditions': renditions
+    }
+
+    with tempfile.NamedTemporaryFile('w', dir=tmp_dir, suffix='.part', delete=False) as f:
+        json.dump(metadata, f)
+    os.replace(f.name, source.with_name(f"{source.stem}.meta.json"))
+
+    return metadata
@@ -5,20 +5,46 @@ All images are downloaded and saved locally to eliminate broken links
 """
 
 import os
+import re
+import ssl
+import gzip
 import json
+import base64
+import time
+import uuid
+import queue
+import bisect
+import sqlite3
 import hashlib
+import posixpath
+import tempfile
+import threading
+import http.client
+import multiprocessing
+import itertools
 import urllib.parse
-import urllib.request
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pathlib import Path
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 from openai import OpenAI
 from dotenv import load_dotenv
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
 import logging
 
+# Pillow is optional: without it images are served as downloaded, with no resized renditions
+try:
+    from renditions import build_renditions
+except ImportError:
+    build_renditions = None
+
 # Load environment variables
 load_dotenv()
 
@@ -33,179 +59,3189 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Initialize OpenAI client (for vocabulary generation only)
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Rendition worker processes are started with 'spawn', which runs the main
+# script again in each of them as __mp_main__ when the server is started with
+# `python server.py`. Import-time side effects (creating directories, opening
+# the SQLite stores and the cassette, background threads) are skipped there
+IN_WORKER_PROCESS = __name__ == '__mp_main__'
+
+# `python server.py` runs with the Werkzeug reloader: this process only
+# watches the source and restarts a child process (WERKZEUG_RUN_MAIN=true)
+# that serves requests. The image store and its background tasks are only
+# started in the child
+IN_RELOADER_PARENT = __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
 
 # Configuration
-VOCAB_IMAGES_DIR = Path(__file__).parent / 'vocab_images'
+VOCAB_IMAGES_DIR = Path(os.getenv('VOCAB_IMAGES_DIR', Path(__file__).parent / 'vocab_images'))
 PORT = int(os.getenv('PORT', 3001))
 MAX_WORDS = 50
 
+# Maximum number of words whose images are searched for and downloaded at the same time
+IMAGE_WORKERS = max(1, int(os.getenv('IMAGE_WORKERS', 8)))
+
 # Optional Unsplash API key for fallback (if not set, only Wikimedia will be used)
 UNSPLASH_ACCESS_KEY = os.getenv('UNSPLASH_ACCESS_KEY', '')
 
+# Keep-alive connections kept open per upstream host, and upstream timeouts in seconds
+UPSTREAM_POOL_SIZE = max(1, int(os.getenv('UPSTREAM_POOL_SIZE', IMAGE_WORKERS)))
+UPSTREAM_API_TIMEOUT = float(os.getenv('UPSTREAM_API_TIMEOUT', 10))
+UPSTREAM_DOWNLOAD_TIMEOUT = float(os.getenv('UPSTREAM_DOWNLOAD_TIMEOUT', 30))
+
+# Largest image download accepted (bytes); downloads are streamed to disk in chunks
+MAX_IMAGE_BYTES = int(os.getenv('MAX_IMAGE_BYTES', 10 * 1024 * 1024))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Resized renditions built from each downloaded image (requires Pillow),
+# in a compressed format (webp or avif) by a pool of worker processes
+RENDITION_WIDTHS = sorted({int(width) for width in os.getenv('RENDITION_WIDTHS', '128,256,512').split(',') if width.strip()})
+RENDITION_FORMAT = os.getenv('RENDITION_FORMAT', 'webp').lower()
+RENDITION_QUALITY = int(os.getenv('RENDITION_QUALITY', 80))
+RENDITION_WORKERS = max(1, int(os.getenv('RENDITION_WORKERS', 2)))
+
+IMAGE_MIMETYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'avif': 'image/avif'
+}
+
+# Ask upstream APIs for gzip-compressed JSON responses
+UPSTREAM_GZIP = os.getenv('UPSTREAM_GZIP', 'true').lower() in ('1', 'true', 'yes')
+
+# Persistent word -> image URL resolution cache (SQLite file next to VOCAB_IMAGES_DIR).
+# Words with no image anywhere are remembered for a shorter time.
+RESOLUTION_CACHE_PATH = Path(os.getenv('RESOLUTION_CACHE_PATH', VOCAB_IMAGES_DIR.with_name(f"{VOCAB_IMAGES_DIR.name}.sqlite3")))
+RESOLUTION_CACHE_TTL = int(os.getenv('RESOLUTION_CACHE_TTL', 30 * 24 * 3600))
+RESOLUTION_CACHE_NEGATIVE_TTL = int(os.getenv('RESOLUTION_CACHE_NEGATIVE_TTL', 24 * 3600))
+
+# Generated vocabulary lists are cached (LRU, per normalized theme and word count)
+VOCAB_CACHE_SIZE = int(os.getenv('VOCAB_CACHE_SIZE', 256))
+VOCAB_CACHE_TTL = int(os.getenv('VOCAB_CACHE_TTL', 3600))
+
+# Background vocabulary jobs: worker threads, maximum queued + running jobs,
+# and seconds finished jobs stay available
+JOB_WORKERS = max(1, int(os.getenv('JOB_WORKERS', 2)))
+JOB_MAX_ACTIVE = max(1, int(os.getenv('JOB_MAX_ACTIVE', 20)))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', 3600))
+
+# Time budget in seconds for synchronous vocabulary requests (/generate_vocab,
+# /generate, /regenerate_image), shared by every stage; clients can ask for
+# another with "timeoutMs", up to MAX_REQUEST_DEADLINE. 0 means no default deadline
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 25))
+MAX_REQUEST_DEADLINE = float(os.getenv('MAX_REQUEST_DEADLINE', 120))
+
+# Timeout in seconds for OpenAI calls (shortened to fit a request deadline)
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 60))
+
+# MediaWiki accepts at most 50 titles per query
+WIKIPEDIA_BATCH_SIZE = 50
+
+# Upstream API endpoints (overridable so benchmarks can point at local stub servers)
+WIKIPEDIA_API_URL = os.getenv('WIKIPEDIA_API_URL', 'https://en.wikipedia.org/w/api.php')
+UNSPLASH_API_URL = os.getenv('UNSPLASH_API_URL', 'https://api.unsplash.com').rstrip('/')
+
+# Per-host upstream rate limits as requests per second and burst size. The
+# defaults stay well inside Wikimedia's guidelines and Unsplash's demo quota
+# (50 requests/hour); override with UPSTREAM_RATE_LIMITS, e.g.
+# "api.unsplash.com=1.39:100,upload.wikimedia.org=30:60". Other hosts get
+# UPSTREAM_DEFAULT_RATE_LIMIT. A request that would have to wait longer than
+# UPSTREAM_RATE_LIMIT_MAX_WAIT seconds for its turn fails instead.
+UPSTREAM_RATE_LIMITS = {
+    urllib.parse.urlsplit(WIKIPEDIA_API_URL).hostname: (10.0, 20),
+    'upload.wikimedia.org': (20.0, 40),
+    urllib.parse.urlsplit(UNSPLASH_API_URL).hostname: (50 / 3600, 50),
+    'images.unsplash.com': (20.0, 40)
+}
+for limit in os.getenv('UPSTREAM_RATE_LIMITS', '').split(','):
+    if '=' in limit:
+        host, _, rate_burst = limit.partition('=')
+        rate, _, burst = rate_burst.partition(':')
+        UPSTREAM_RATE_LIMITS[host.strip().lower()] = (float(rate), int(burst or max(1, float(rate))))
+UPSTREAM_DEFAULT_RATE_LIMIT = tuple(float(value) for value in os.getenv('UPSTREAM_DEFAULT_RATE_LIMIT', '20:40').split(':'))
+UPSTREAM_RATE_LIMIT_MAX_WAIT = float(os.getenv('UPSTREAM_RATE_LIMIT_MAX_WAIT', 5))
+
+# Record/replay of upstream traffic, so benchmarks see identical upstream
+# responses on every run. With UPSTREAM_CASSETTE_MODE=record every Wikipedia,
+# Unsplash, image host and OpenAI exchange is appended to the UPSTREAM_CASSETTE
+# file; with replay they are answered from it without touching the network,
+# each after its recorded latency times UPSTREAM_CASSETTE_LATENCY_SCALE
+# (0 = no delay, 0.5 = twice as fast)
+UPSTREAM_CASSETTE_MODE = os.getenv('UPSTREAM_CASSETTE_MODE', '').strip().lower()
+UPSTREAM_CASSETTE = Path(os.getenv('UPSTREAM_CASSETTE', Path(__file__).parent / 'upstream_cassette.jsonl'))
+UPSTREAM_CASSETTE_LATENCY_SCALE = max(0.0, float(os.getenv('UPSTREAM_CASSETTE_LATENCY_SCALE', 1)))
+
+# A Retry-After longer than this is capped; throttling without Retry-After
+# backs off from 1 second, doubling up to the cap
+UPSTREAM_MAX_BACKOFF = 600
+
+# Image source circuit breakers: after CIRCUIT_BREAKER_FAILURES consecutive
+# failed lookups, a source (Wikimedia or Unsplash) is skipped for
+# CIRCUIT_BREAKER_RESET seconds, then one trial lookup decides whether it is back
+CIRCUIT_BREAKER_FAILURES = max(1, int(os.getenv('CIRCUIT_BREAKER_FAILURES', 5)))
+CIRCUIT_BREAKER_RESET = float(os.getenv('CIRCUIT_BREAKER_RESET', 30))
+
+# Hedged lookups (optional): if the preferred source hasn't answered within the
+# IMAGE_HEDGE_PERCENTILE of its recent lookup latencies (at least
+# IMAGE_HEDGE_MIN_DELAY seconds), the fallback source is queried as well and
+# the first image found wins. Costs extra Unsplash requests, so off by default
+IMAGE_HEDGING = os.getenv('IMAGE_HEDGING', 'false').lower() in ('1', 'true', 'yes')
+IMAGE_HEDGE_PERCENTILE = float(os.getenv('IMAGE_HEDGE_PERCENTILE', 95))
+IMAGE_HEDGE_MIN_DELAY = float(os.getenv('IMAGE_HEDGE_MIN_DELAY', 0.2))
+# Hedge delay used until a source has IMAGE_HEDGE_MIN_SAMPLES recorded latencies
+IMAGE_HEDGE_DEFAULT_DELAY = 1.0
+IMAGE_HEDGE_MIN_SAMPLES = 20
+
+# Downloads are written here first and renamed into place once complete
+VOCAB_IMAGES_TMP_DIR = VOCAB_IMAGES_DIR / '.incoming'
+
+# Images are stored by content hash under VOCAB_IMAGES_DIR/blobs; the mapping
+# from each word's filename to its blob lives in this SQLite file, kept outside
+# the served directory
+IMAGE_STORE_DB_PATH = Path(os.getenv('IMAGE_STORE_DB_PATH', VOCAB_IMAGES_DIR.with_name(f"{VOCAB_IMAGES_DIR.name}.index.sqlite3")))
+# Where the index was kept before; moved to IMAGE_STORE_DB_PATH at startup
+LEGACY_IMAGE_STORE_DB_PATH = VOCAB_IMAGES_DIR / '.index.sqlite3'
+
+# Disk budget for stored images and their renditions in bytes (0 = unlimited).
+# When it is exceeded the least recently ('lru') or least frequently ('lfu')
+# used images are evicted until usage is back under IMAGE_EVICTION_TARGET of
+# the budget. The evictor also deletes unreferenced blobs and abandoned
+# partial downloads older than STALE_FILE_SECONDS.
+IMAGE_STORE_MAX_BYTES = int(os.getenv('IMAGE_STORE_MAX_BYTES', 0))
+IMAGE_EVICTION_POLICY = os.getenv('IMAGE_EVICTION_POLICY', 'lru').lower()
+IMAGE_EVICTION_INTERVAL = float(os.getenv('IMAGE_EVICTION_INTERVAL', 60))
+IMAGE_EVICTION_TARGET = 0.9
+STALE_FILE_SECONDS = 3600
+
+# Image URLs carry this many hex digits of the content hash (ocean.<version>.png),
+# and are served with a Cache-Control lifetime of IMMUTABLE_MAX_AGE seconds
+IMAGE_VERSION_LENGTH = 16
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+VERSIONED_IMAGE_NAME = re.compile(rf'^(?P<stem>[^./]+)\.(?P<version>[0-9a-f]{{{IMAGE_VERSION_LENGTH}}})(?P<suffix>\.[a-z]+)$')
+BLOB_NAME = re.compile(r'^[0-9a-f]{64}\.[a-z]+$')
+
+# Small, frequently requested images (up to HOT_IMAGE_MAX_FILE_BYTES each) are
+# kept in memory, up to HOT_IMAGE_CACHE_BYTES in total; larger files are
+# handed to the WSGI server's file wrapper (sendfile), or to the front-end
+# proxy with USE_X_SENDFILE
+HOT_IMAGE_CACHE_BYTES = int(os.getenv('HOT_IMAGE_CACHE_BYTES', 64 * 1024 * 1024))
+HOT_IMAGE_MAX_FILE_BYTES = int(os.getenv('HOT_IMAGE_MAX_FILE_BYTES', 256 * 1024))
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() in ('1', 'true', 'yes')
+
+# Stored images are indexed in memory; seconds between full re-scans of the
+# disk that catch changes made outside the server (0 disables)
+MANIFEST_VERIFY_INTERVAL = float(os.getenv('MANIFEST_VERIFY_INTERVAL', 600))
+
+# Whether this process runs the image store's background tasks (the evictor
+# and the manifest re-scans); maintenance scripts such as migrate_images.py
+# turn them off so they don't compete with a running server's
+IMAGE_STORE_BACKGROUND_TASKS = os.getenv('IMAGE_STORE_BACKGROUND_TASKS', 'true').lower() in ('1', 'true', 'yes')
+
+# Upper bounds in seconds of the latency histogram buckets served on /metrics
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
 # Create vocab_images directory if it doesn't exist
-VOCAB_IMAGES_DIR.mkdir(exist_ok=True)
-logger.info(f"Vocab images directory: {VOCAB_IMAGES_DIR}")
+if not IN_WORKER_PROCESS:
+    VOCAB_IMAGES_DIR.mkdir(exist_ok=True)
+    VOCAB_IMAGES_TMP_DIR.mkdir(exist_ok=True)
+    logger.info(f"Vocab images directory: {VOCAB_IMAGES_DIR}")
 
+# Shared worker pool for image search/download, bounded across all requests
+image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image-worker')
 
-def sanitize_filename(word: str) -> str:
+
+def format_metric_value(value: float) -> str:
+    """Format a sample value for the Prometheus text format."""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
     """
-    Sanitize a word to create a safe filename.
+    Base class for the thread-safe metrics served on /metrics in the
+    Prometheus text format. A metric keeps one value per combination of
+    label values; updates take a short per-metric lock and nothing else.
     
     Args:
-        word: The vocabulary word
+        name: Metric name
+        help_text: Description for the HELP line
+        labelnames: Label names; updates pass the values in the same order
+    """
+    
+    TYPE = 'untyped'
+    
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+    
+    def _label_text(self, values: tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{self._escape(value)}"' for name, value in pairs) + '}'
+    
+    @staticmethod
+    def _escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    
+    def _samples(self, values: tuple, value) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {format_metric_value(value)}"]
+    
+    def render(self) -> List[str]:
+        """The metric's HELP, TYPE and sample lines."""
+        with self._lock:
+            items = [(labels, list(value) if isinstance(value, list) else value)
+                     for labels, value in self._values.items()]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}"]
+        for labels, value in sorted(items, key=lambda item: item[0]):
+            lines.extend(self._samples(labels, value))
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    
+    TYPE = 'counter'
+    
+    def inc(self, *labels, amount: float = 1):
+        """Add amount to the count for the given label values."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    
+    TYPE = 'gauge'
+    
+    def dec(self, *labels, amount: float = 1):
+        """Subtract amount from the value for the given label values."""
+        self.inc(*labels, amount=-amount)
+    
+    def set(self, *labels, value: float):
+        """Set the value for the given label values."""
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values (e.g. latencies) in cumulative buckets.
+    
+    Args:
+        buckets: Upper bounds of the buckets; +Inf is added automatically
+    """
+    
+    TYPE = 'histogram'
+    
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, *labels):
+        """Record one observation for the given label values."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+    
+    def _samples(self, values: tuple, entry: List) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), entry[:-1]):
+            cumulative += count
+            le = format_metric_value(float(bound)) if bound != float('inf') else '+Inf'
+            lines.append(f"{self.name}_bucket{self._label_text(values, (('le', le),))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {format_metric_value(entry[-1])}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    The metrics served on /metrics: metrics updated as things happen, plus
+    collectors that turn other components' stats() into metrics when scraped.
+    """
+    
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+    
+    def _register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+    
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        """Create and register a Counter."""
+        return self._register(Counter(name, help_text, labelnames))
+    
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        """Create and register a Gauge."""
+        return self._register(Gauge(name, help_text, labelnames))
+    
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Histogram:
+        """Create and register a latency Histogram."""
+        return self._register(Histogram(name, help_text, labelnames))
+    
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]):
+        """Register a function building metrics at scrape time."""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                for metric in collector():
+                    lines.extend(metric.render())
+            except Exception as e:
+                logger.error(f"Error collecting metrics from {collector.__name__}: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+stage_duration = metrics.histogram(
+    'vocab_stage_duration_seconds',
+    'Time spent in each pipeline stage (openai, wikimedia_search, wikimedia_batch, unsplash_search, download)',
+    ('stage',)
+)
+stage_errors = metrics.counter('vocab_stage_errors_total', 'Pipeline stage calls that failed', ('stage',))
+download_bytes = metrics.counter('vocab_image_download_bytes_total', 'Image bytes downloaded from upstream', ('source',))
+http_requests = metrics.counter('vocab_http_requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status'))
+http_request_errors = metrics.counter('vocab_http_request_errors_total', 'HTTP requests answered with a 5xx status', ('endpoint',))
+http_request_duration = metrics.histogram('vocab_http_request_duration_seconds',
+                                          'Time to build each HTTP response (streamed bodies excluded)', ('endpoint',))
+http_requests_in_flight = metrics.gauge('vocab_http_requests_in_flight', 'HTTP requests being handled')
+
+
+class StageTimings:
+    """
+    Where the time went in one request, or in one word's image lookup, for
+    Server-Timing headers and the debug "timings" output. Durations of a
+    stage that ran several times (e.g. downloads on parallel workers) are
+    summed. Thread-safe, since a hedged lookup records from two threads.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.source: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stages: Dict[str, List] = {}
+    
+    def add(self, stage: str, seconds: float):
+        """Add a duration to a stage."""
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+    
+    def merge(self, other: 'StageTimings', stages: Iterable[str]):
+        """Add another StageTimings' durations for the given stages."""
+        with other._lock:
+            entries = [(stage, list(other._stages[stage])) for stage in stages if stage in other._stages]
+        with self._lock:
+            for stage, (seconds, count) in entries:
+                entry = self._stages.setdefault(stage, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += count
+    
+    def as_dict(self) -> Dict:
+        """Milliseconds per stage (e.g. downloadMs) plus totalMs, and the image source if set."""
+        with self._lock:
+            timings = {f"{stage}Ms": round(seconds * 1000, 1) for stage, (seconds, _) in self._stages.items()}
+        timings['totalMs'] = round((time.perf_counter() - self.started) * 1000, 1)
+        if self.source is not None:
+            timings['source'] = self.source
+        return timings
+    
+    def server_timing(self) -> str:
+        """Server-Timing header value with every stage and the total so far."""
+        with self._lock:
+            stages = [(stage, seconds, count) for stage, (seconds, count) in self._stages.items()]
+        entries = []
+        for stage, seconds, count in stages:
+            desc = f';desc="{count} calls, summed"' if count > 1 else ''
+            entries.append(f"{stage};dur={seconds * 1000:.1f}{desc}")
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(entries)
+
+
+class UpstreamHTTPError(Exception):
+    """Raised when an upstream server answers with an HTTP error status."""
+    
+    def __init__(self, url: str, status: int, headers: http.client.HTTPMessage):
+        super().__init__(f"HTTP Error {status} from {url}")
+        self.url = url
+        self.status = status
+        self.headers = headers
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget runs out before a stage can start or finish."""
+    
+    def __init__(self):
+        super().__init__('Request deadline exceeded')
+
+
+def deadline_passed(deadline: Optional[float]) -> bool:
+    """Check whether a deadline (a time.monotonic() value, or None for none) has passed."""
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def time_left(deadline: Optional[float], limit: float) -> float:
+    """
+    Get the timeout for the next stage of a request.
+    
+    Args:
+        deadline: time.monotonic() value the request must finish by, or None
+        limit: The stage's own timeout in seconds
         
     Returns:
-        A safe filename string
+        limit, or the time remaining before the deadline if that is shorter
+        
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
     """
-    # Remove special characters and replace spaces with underscores
-    safe_name = "".join(c if c.isalnum() or c in (' ', '-', '_') else '' for c in word)
-    safe_name = safe_name.strip().replace(' ', '_').lower()
-    return safe_name
+    if deadline is None:
+        return limit
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return min(limit, remaining)
 
 
-def get_image_path(word: str) -> Path:
+class UpstreamRateLimited(Exception):
+    """Raised when an upstream's rate limit would delay a request for too long."""
+    
+    def __init__(self, host: str, wait: float):
+        super().__init__(f"Rate limit for {host} would delay the request {wait:.1f}s")
+        self.host = host
+        self.wait = wait
+
+
+class UpstreamRateLimiter:
     """
-    Get the file path for a vocabulary word's image.
+    Token bucket plus adaptive concurrency limit for one upstream host.
+    
+    Requests take a token (refilled at rate per second, up to burst) and a
+    concurrency slot. The concurrency limit adapts AIMD-style: it grows by
+    about one per window of successful requests, and is cut multiplicatively
+    on errors, on 429/503 responses and when latency climbs well above its
+    floor. 429/503 responses also pause the host for Retry-After seconds
+    (or an exponential backoff when the header is missing).
     
     Args:
-        word: The vocabulary word
+        host: Upstream hostname (for logging and monitoring)
+        rate: Tokens added per second
+        burst: Bucket size
+        max_concurrency: Upper bound for the concurrency limit
+    """
+    
+    MIN_CONCURRENCY = 1
+    DECREASE_COOLDOWN = 1.0
+    SLOW_LATENCY_FACTOR = 3.0
+    
+    def __init__(self, host: str, rate: float, burst: int, max_concurrency: int):
+        self.host = host
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self.max_concurrency = max(self.MIN_CONCURRENCY, max_concurrency)
+        self.concurrency_limit = float(self.max_concurrency)
+        self.tokens = float(self.burst)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.backoff = 1.0
+        self.latency_ewma = None
+        self.latency_floor = None
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.rejected = 0
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self, max_wait: float):
+        """
+        Wait for a token and a concurrency slot; call release() when the request is done.
+        
+        Raises:
+            UpstreamRateLimited: If the request can't start within max_wait seconds
+        """
+        deadline = time.monotonic() + max_wait
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                
+                if self.blocked_until > now:
+                    wait = self.blocked_until - now
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+                elif self.in_flight >= int(self.concurrency_limit):
+                    wait = deadline - now
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    self.requests += 1
+                    return
+                
+                # Fail now rather than sleep through a wait that can't finish in time
+                if now + wait > deadline + 0.001 or deadline <= now:
+                    self.rejected += 1
+                    raise UpstreamRateLimited(self.host, wait)
+                self._cond.wait(min(wait, deadline - now))
+    
+    def release(self):
+        """Free the concurrency slot taken by acquire()."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+    
+    def _decrease(self, factor: float, now: float):
+        if now - self._last_decrease < self.DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.concurrency_limit = max(self.MIN_CONCURRENCY, self.concurrency_limit * factor)
+    
+    def record_response(self, status: int, latency: float, retry_after: Optional[str] = None):
+        """Adapt to a response: its status, seconds until the headers arrived, and any Retry-After."""
+        with self._cond:
+            now = time.monotonic()
+            
+            if status in (429, 503):
+                self.throttled += 1
+                pause = parse_retry_after(retry_after)
+                if pause is None:
+                    pause = self.backoff
+                    self.backoff = min(UPSTREAM_MAX_BACKOFF, self.backoff * 2)
+                self.blocked_until = max(self.blocked_until, now + min(pause, UPSTREAM_MAX_BACKOFF))
+                self._decrease(0.5, now)
+                logger.warning(f"{self.host} is throttling us (HTTP {status}); pausing {pause:.1f}s, "
+                               f"concurrency limit {self.concurrency_limit:.1f}")
+                return
+            
+            if status >= 500:
+                self.errors += 1
+                self._decrease(0.5, now)
+                return
+            
+            self.backoff = 1.0
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            # The floor drifts up slowly so it follows lasting changes in the host's speed
+            self.latency_floor = latency if self.latency_floor is None else min(latency, self.latency_floor + 0.01 * (latency - self.latency_floor))
+            
+            if latency > self.SLOW_LATENCY_FACTOR * self.latency_floor and latency > 0.05:
+                self._decrease(0.9, now)
+            else:
+                self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+                self._cond.notify()
+    
+    def record_error(self):
+        """Adapt to a request that failed without a response (timeout, connection error)."""
+        with self._cond:
+            self.errors += 1
+            self._decrease(0.5, time.monotonic())
+    
+    def stats(self) -> Dict:
+        """Current token, concurrency and backoff state plus counters."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(self.tokens, 2),
+                'concurrency_limit': round(self.concurrency_limit, 2),
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self.in_flight,
+                'paused_for': round(max(0.0, self.blocked_until - now), 2),
+                'latency_ewma_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'errors': self.errors,
+                'rejected': self.rejected
+            }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delay in seconds, or an HTTP date).
+    
+    Args:
+        value: The header value
         
     Returns:
-        Path object for the image file
+        Seconds to wait, or None if missing or invalid
     """
-    filename = f"{sanitize_filename(word)}.png"
-    return VOCAB_IMAGES_DIR / filename
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
 
 
-def image_exists(word: str) -> bool:
+class CassetteMiss(ConnectionError):
+    """Raised when a replayed cassette has no recording of a request."""
+    
+    def __init__(self, key: str):
+        super().__init__(f"No recorded upstream response for {key}")
+        self.key = key
+
+
+class UpstreamCassette:
     """
-    Check if an image already exists for a word.
+    Records upstream HTTP exchanges to a JSON lines file, or serves them back.
+    Each line holds one exchange: the request (method, URL and a hash of the
+    body), the response status and headers, the time until the headers
+    arrived, and the body as the pieces that were read with the time each
+    arrived, so replayed streams (OpenAI completions, downloads) keep their
+    original pacing.
+    
+    Identical requests are answered with their recordings in order; once
+    those run out the last one is repeated. Which words share a Wikimedia
+    batch lookup depends on timing, so multi-title MediaWiki queries that
+    weren't recorded as such are answered from the pages in the ones that
+    were. Any other request that was never recorded fails with CassetteMiss,
+    like a connection error.
     
     Args:
-        word: The vocabulary word
+        path: The cassette file (overwritten when recording)
+        mode: 'record' or 'replay'
+        latency_scale: Multiplier for the recorded latencies when replaying
+    """
+    
+    def __init__(self, path: Path, mode: str, latency_scale: float = 1.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode '{mode}' (use record or replay)")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._exchanges: Dict[str, List[Dict]] = {}
+        self._positions: Dict[str, int] = {}
+        self._pages: Optional[Dict[Tuple[str, str], Tuple[Dict, List[Dict], float]]] = None
+        self._file = None
         
-    Returns:
-        True if image exists, False otherwise
+        if mode == 'replay':
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        self._exchanges.setdefault(exchange['key'], []).append(exchange)
+            logger.info(f"Replaying upstream traffic from {path} ({sum(map(len, self._exchanges.values()))} exchanges)")
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, 'w', encoding='utf-8')
+            logger.info(f"Recording upstream traffic to {path}")
+    
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+    
+    @staticmethod
+    def key(method: str, url: str, body: Optional[bytes] = None) -> str:
+        """Identify a request by method, URL and (for POSTs) a hash of the body."""
+        key = f"{method.upper()} {url}"
+        if body:
+            key += f" {hashlib.sha256(body).hexdigest()[:16]}"
+        return key
+    
+    def start_recording(self, method: str, url: str, body: Optional[bytes], status: int,
+                        headers: List[Tuple[str, str]], latency: float) -> 'CassetteRecording':
+        """Begin recording a response whose headers have arrived; its body is added as it is read."""
+        exchange = {
+            'key': self.key(method, url, body),
+            'method': method.upper(),
+            'url': url,
+            'status': status,
+            # Cookies are per-session and not needed for replay
+            'headers': [[name, value] for name, value in headers if name.lower() != 'set-cookie'],
+            'latency': round(latency, 4)
+        }
+        return CassetteRecording(self, exchange)
+    
+    def write(self, exchange: Dict):
+        """Append a finished exchange to the cassette."""
+        with self._lock:
+            self._file.write(json.dumps(exchange) + '\n')
+            self._file.flush()
+            self.recorded += 1
+    
+    def replay(self, method: str, url: str, body: Optional[bytes] = None) -> Dict:
+        """
+        Find the recording for a request and wait for its (scaled) header latency.
+        
+        Returns:
+            The recorded exchange
+            
+        Raises:
+            CassetteMiss: If the request was never recorded
+        """
+        key = self.key(method, url, body)
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if exchanges:
+                position = self._positions.get(key, 0)
+                self._positions[key] = position + 1
+                exchange = exchanges[min(position, len(exchanges) - 1)]
+            else:
+                exchange = self._compose_page_query(key, url) if not body else None
+            
+            if exchange is None:
+                self.misses += 1
+            else:
+                self.replayed += 1
+        
+        if exchange is None:
+            logger.warning(f"Cassette has no recording of {key}")
+            raise CassetteMiss(key)
+        
+        self.sleep(exchange['latency'])
+        return exchange
+    
+    def _index_pages(self) -> Dict[Tuple[str, str], Tuple[Dict, List[Dict], float]]:
+        """Map (API URL, requested title) to its page, title mappings and latency in recorded MediaWiki queries."""
+        index = {}
+        for exchanges in self._exchanges.values():
+            for exchange in exchanges:
+                titles = urllib.parse.parse_qs(urllib.parse.urlsplit(exchange['url']).query).get('titles')
+                if exchange['status'] != 200 or not titles:
+                    continue
+                try:
+                    body = b''.join(base64.b64decode(data) for _, data in exchange['chunks'])
+                    headers = {name.lower(): value for name, value in exchange['headers']}
+                    if headers.get('content-encoding', '').lower() == 'gzip':
+                        body = gzip.decompress(body)
+                    query = json.loads(body).get('query', {})
+                except (OSError, ValueError):
+                    continue
+                
+                mappings = {mapping['from']: mapping for mapping in query.get('normalized', []) + query.get('redirects', [])}
+                pages = {page.get('title'): page for page in query.get('pages', {}).values()}
+                endpoint = exchange['url'].split('?', 1)[0]
+                for title in titles[0].split('|'):
+                    # Follow normalization and redirects to the page, keeping each step
+                    steps = []
+                    current = title
+                    while current in mappings and len(steps) <= len(mappings):
+                        steps.append(mappings[current])
+                        current = mappings[current]['to']
+                    if current in pages:
+                        index.setdefault((endpoint, title), (pages[current], steps, exchange['latency']))
+        return index
+    
+    def _compose_page_query(self, key: str, url: str) -> Optional[Dict]:
+        """Build a MediaWiki query response from recorded pages, or None if a title was never looked up."""
+        titles = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query).get('titles')
+        if not titles:
+            return None
+        if self._pages is None:
+            self._pages = self._index_pages()
+        
+        endpoint = url.split('?', 1)[0]
+        pages = {}
+        mappings = []
+        latency = 0.0
+        for index, title in enumerate(titles[0].split('|')):
+            entry = self._pages.get((endpoint, title))
+            if entry is None:
+                return None
+            page, steps, page_latency = entry
+            page_key = str(page.get('pageid', -(index + 1)))
+            if pages.get(page_key, page) is not page:
+                page_key = str(-(index + 1))
+            pages[page_key] = page
+            mappings.extend(steps)
+            latency = max(latency, page_latency)
+        
+        body = json.dumps({'batchcomplete': '', 'query': {'normalized': mappings, 'pages': pages}}).encode()
+        return {
+            'key': key,
+            'status': 200,
+            'headers': [['Content-Type', 'application/json; charset=utf-8']],
+            'latency': latency,
+            'chunks': [[0.0, base64.b64encode(body).decode()]]
+        }
+    
+    def iter_body(self, exchange: Dict) -> Iterator[bytes]:
+        """Yield a recorded body piece by piece, each at its (scaled) original time."""
+        started = time.monotonic()
+        for offset, data in exchange['chunks']:
+            delay = started + offset * self.latency_scale - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield base64.b64decode(data)
+    
+    def sleep(self, seconds: float):
+        """Wait for a recorded duration, scaled."""
+        if seconds > 0 and self.latency_scale > 0:
+            time.sleep(seconds * self.latency_scale)
+    
+    def stats(self) -> Dict:
+        """Mode, file and exchange counts, for /health."""
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'path': str(self.path),
+                'latency_scale': self.latency_scale,
+                'recorded': self.recorded,
+                'replayed': self.replayed,
+                'misses': self.misses
+            }
+
+
+class CassetteRecording:
+    """
+    One response being recorded: collects the body pieces as they are read
+    and writes the exchange to the cassette when the body ends or the
+    response is closed (a body abandoned part way is recorded as read).
+    """
+    
+    def __init__(self, cassette: UpstreamCassette, exchange: Dict):
+        self._cassette = cassette
+        self._exchange = exchange
+        self._started = time.monotonic()
+        self._chunks: List[List] = []
+        self._finished = False
+    
+    def add(self, data: bytes):
+        """Record a piece of the body."""
+        if data and not self._finished:
+            self._chunks.append([round(time.monotonic() - self._started, 4), base64.b64encode(data).decode()])
+    
+    def finish(self):
+        """Write the exchange (only the first call has an effect)."""
+        if not self._finished:
+            self._finished = True
+            self._cassette.write(dict(self._exchange, chunks=self._chunks))
+
+
+class RecordingHTTPResponse:
+    """Wraps an http.client.HTTPResponse for UpstreamHTTPClient, recording its body as it is read."""
+    
+    def __init__(self, response: http.client.HTTPResponse, recording: CassetteRecording):
+        self._response = response
+        self._recording = recording
+        self.status = response.status
+        self.headers = response.headers
+    
+    @property
+    def will_close(self) -> bool:
+        return self._response.will_close
+    
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._response.getheader(name, default)
+    
+    def read(self, amt: Optional[int] = None) -> bytes:
+        data = self._response.read(amt)
+        self._recording.add(data)
+        if not data or amt is None or self._response.isclosed():
+            self._recording.finish()
+        return data
+    
+    def isclosed(self) -> bool:
+        return self._response.isclosed()
+    
+    def close(self):
+        self._recording.finish()
+        self._response.close()
+
+
+class ReplayedHTTPResponse:
+    """Stands in for an http.client.HTTPResponse, serving a recorded exchange."""
+    
+    will_close = True
+    
+    def __init__(self, cassette: UpstreamCassette, exchange: Dict):
+        self.status = exchange['status']
+        self.headers = http.client.HTTPMessage()
+        for name, value in exchange['headers']:
+            self.headers[name] = value
+        self._body = cassette.iter_body(exchange)
+        self._buffer = b''
+        self._closed = False
+    
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.headers.get(name, default)
+    
+    def read(self, amt: Optional[int] = None) -> bytes:
+        if amt is None:
+            data = self._buffer + b''.join(self._body)
+            self._buffer = b''
+            self._closed = True
+            return data
+        
+        # Like a socket read, return what has "arrived" without waiting for more
+        if not self._buffer:
+            self._buffer = next(self._body, b'')
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        if not data:
+            self._closed = True
+        return data
+    
+    def isclosed(self) -> bool:
+        return self._closed
+    
+    def close(self):
+        self._closed = True
+
+
+# The OpenAI client is built on httpx; it is only needed here to record or
+# replay its traffic
+if UPSTREAM_CASSETTE_MODE:
+    import httpx
+    
+    class CassetteByteStream(httpx.SyncByteStream):
+        """Response body for CassetteTransport: a recorded body being replayed, or a live one being recorded."""
+        
+        def __init__(self, chunks: Iterable[bytes], recording: Optional[CassetteRecording] = None,
+                     stream: Optional[httpx.SyncByteStream] = None):
+            self._chunks = chunks
+            self._recording = recording
+            self._stream = stream
+        
+        def __iter__(self) -> Iterator[bytes]:
+            for chunk in self._chunks:
+                if self._recording is not None:
+                    self._recording.add(chunk)
+                yield chunk
+            if self._recording is not None:
+                self._recording.finish()
+        
+        def close(self):
+            if self._recording is not None:
+                self._recording.finish()
+            if self._stream is not None:
+                self._stream.close()
+    
+    
+    class CassetteTransport(httpx.BaseTransport):
+        """
+        httpx transport for the OpenAI client that records exchanges to an
+        UpstreamCassette, or replays them from it.
+        
+        Args:
+            cassette: The cassette
+            transport: Transport for live requests when recording
+        """
+        
+        def __init__(self, cassette: UpstreamCassette, transport: Optional[httpx.BaseTransport] = None):
+            self.cassette = cassette
+            self._transport = transport or httpx.HTTPTransport()
+        
+        def handle_request(self, request: httpx.Request) -> httpx.Response:
+            body = request.read()
+            
+            if self.cassette.replaying:
+                try:
+                    exchange = self.cassette.replay(request.method, str(request.url), body)
+                except CassetteMiss as e:
+                    raise httpx.ConnectError(str(e), request=request)
+                return httpx.Response(exchange['status'], headers=exchange['headers'],
+                                      stream=CassetteByteStream(self.cassette.iter_body(exchange)), request=request)
+            
+            start = time.monotonic()
+            response = self._transport.handle_request(request)
+            recording = self.cassette.start_recording(request.method, str(request.url), body, response.status_code,
+                                                      response.headers.multi_items(), time.monotonic() - start)
+            return httpx.Response(response.status_code, headers=response.headers,
+                                  stream=CassetteByteStream(response.stream, recording, response.stream),
+                                  request=request, extensions=response.extensions)
+        
+        def close(self):
+            self._transport.close()
+
+
+class UpstreamResponse:
+    """
+    Response from UpstreamHTTPClient.
+    Use as a context manager; the connection goes back to the pool on close
+    if the body was read completely, otherwise it is discarded. Closing also
+    frees the host's rate limiter slot.
     """
-    return get_image_path(word).exists()
+    
+    def __init__(self, client: 'UpstreamHTTPClient', key: tuple, conn: http.client.HTTPConnection,
+                 response: http.client.HTTPResponse, url: str, limiter: Optional[UpstreamRateLimiter] = None):
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._limiter = limiter
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.headers = response.headers
+    
+    def read(self, amt: Optional[int] = None) -> bytes:
+        """Read up to amt bytes of the body (all of it if amt is None)."""
+        return self._response.read(amt)
+    
+    def close(self):
+        """Release the underlying connection."""
+        if self._limiter is not None:
+            self._limiter.release()
+            self._limiter = None
+        
+        if self._conn is None:
+            return
+        
+        if self._response.isclosed() and not self._response.will_close:
+            self._client._release(self._key, self._conn)
+        else:
+            self._response.close()
+            self._conn.close()
+        self._conn = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
 
-def search_wikimedia_image(word: str) -> Optional[str]:
+class UpstreamHTTPClient:
     """
-    Search for a free image on Wikimedia Commons.
+    Thread-safe HTTP client shared by all upstream calls.
+    Keeps up to pool_size idle keep-alive connections per (scheme, host, port),
+    so repeated calls to the same host skip the TCP and TLS handshakes.
+    Every request (and redirect hop) first passes the host's UpstreamRateLimiter.
+    Credentials (Authorization and Cookie headers) are dropped when a redirect
+    leads to another scheme or host.
+    
+    Args:
+        pool_size: Maximum idle connections kept per host
+        max_redirects: How many redirects to follow before giving up
+        rate_limits: (requests per second, burst) per hostname
+        default_rate_limit: (requests per second, burst) for other hosts
+        cassette: Optional UpstreamCassette recording every exchange, or
+            answering them instead of the network
+    """
+    
+    REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+    CREDENTIAL_HEADERS = ('authorization', 'proxy-authorization', 'cookie')
+    
+    def __init__(self, pool_size: int, max_redirects: int = 5,
+                 rate_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 default_rate_limit: Tuple[float, int] = (20.0, 40),
+                 cassette: Optional[UpstreamCassette] = None):
+        self.pool_size = pool_size
+        self.max_redirects = max_redirects
+        self.rate_limits = rate_limits or {}
+        self.default_rate_limit = default_rate_limit
+        self.cassette = cassette
+        self._pools: Dict[tuple, List[http.client.HTTPConnection]] = {}
+        self._limiters: Dict[str, UpstreamRateLimiter] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+    
+    def limiter(self, host: str) -> UpstreamRateLimiter:
+        """Get (creating on first use) the rate limiter for a host."""
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                rate, burst = self.rate_limits.get(host, self.default_rate_limit)
+                limiter = UpstreamRateLimiter(host, rate, int(burst), self.pool_size)
+                self._limiters[host] = limiter
+            return limiter
+    
+    def limiter_stats(self) -> Dict[str, Dict]:
+        """Rate limiter state for every host contacted so far."""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.host: limiter.stats() for limiter in limiters}
+    
+    def _new_connection(self, key: tuple, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+    
+    def _acquire(self, key: tuple, timeout: float):
+        """Take an idle connection for the host, or open a new one. Returns (conn, reused)."""
+        with self._lock:
+            pool = self._pools.get(key)
+            conn = pool.pop() if pool else None
+        
+        if conn is None:
+            return self._new_connection(key, timeout), False
+        
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+    
+    def _release(self, key: tuple, conn: http.client.HTTPConnection):
+        """Return a connection to its host's pool, closing it if the pool is full."""
+        with self._lock:
+            pool = self._pools.setdefault(key, [])
+            if len(pool) < self.pool_size:
+                pool.append(conn)
+                return
+        conn.close()
+    
+    def _send(self, key: tuple, path: str, headers: Dict[str, str], timeout: float):
+        conn, reused = self._acquire(key, timeout)
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn, conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            if not reused:
+                raise
+        except Exception:
+            conn.close()
+            raise
+        
+        # The server closed an idle keep-alive connection; retry once on a fresh one
+        conn = self._new_connection(key, timeout)
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn, conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+    
+    def request(self, url: str, headers: Optional[Dict[str, str]] = None,
+                timeout: float = UPSTREAM_API_TIMEOUT) -> UpstreamResponse:
+        """
+        Send a GET request, following redirects.
+        
+        Args:
+            url: Absolute http(s) URL
+            headers: Extra request headers
+            timeout: Socket timeout in seconds (also caps the wait for the host's rate limiter)
+            
+        Returns:
+            UpstreamResponse for a successful (non-error) status
+            
+        Raises:
+            UpstreamHTTPError: If the final response has a 4xx/5xx status
+        """
+        headers = dict(headers or {})
+        
+        for _ in range(self.max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme not in ('http', 'https'):
+                raise ValueError(f"Unsupported URL scheme: {url}")
+            
+            key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+            path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+            
+            limiter = self.limiter(parts.hostname)
+            limiter.acquire(min(UPSTREAM_RATE_LIMIT_MAX_WAIT, timeout))
+            start = time.monotonic()
+            try:
+                if self.cassette is not None and self.cassette.replaying:
+                    conn, raw_response = None, ReplayedHTTPResponse(self.cassette, self.cassette.replay('GET', url))
+                else:
+                    conn, raw_response = self._send(key, path, headers, timeout)
+                    if self.cassette is not None:
+                        recording = self.cassette.start_recording('GET', url, None, raw_response.status,
+                                                                  raw_response.getheaders(), time.monotonic() - start)
+                        raw_response = RecordingHTTPResponse(raw_response, recording)
+            except Exception:
+                limiter.record_error()
+                limiter.release()
+                raise
+            
+            limiter.record_response(raw_response.status, time.monotonic() - start,
+                                    raw_response.getheader('Retry-After'))
+            response = UpstreamResponse(self, key, conn, raw_response, url, limiter)
+            
+            location = raw_response.getheader('Location')
+            if response.status in self.REDIRECT_STATUSES and location:
+                response.read()
+                response.close()
+                next_url = urllib.parse.urljoin(url, location)
+                next_parts = urllib.parse.urlsplit(next_url)
+                if (next_parts.scheme.lower(), next_parts.hostname) != (scheme, parts.hostname):
+                    # Don't hand credentials meant for this host to another one
+                    headers = {name: value for name, value in headers.items()
+                               if name.lower() not in self.CREDENTIAL_HEADERS}
+                url = next_url
+                continue
+            
+            if response.status >= 400:
+                response.read()
+                response.close()
+                raise UpstreamHTTPError(url, response.status, response.headers)
+            
+            return response
+        
+        raise http.client.HTTPException(f"Too many redirects fetching {url}")
+    
+    def get_json(self, url: str, headers: Optional[Dict[str, str]] = None,
+                 timeout: float = UPSTREAM_API_TIMEOUT):
+        """Send a GET request and decode the JSON body (gzip-compressed if UPSTREAM_GZIP)."""
+        headers = dict(headers or {})
+        if UPSTREAM_GZIP:
+            headers.setdefault('Accept-Encoding', 'gzip')
+        
+        with self.request(url, headers, timeout) as response:
+            body = response.read()
+            if response.headers.get('Content-Encoding', '').lower() == 'gzip':
+                body = gzip.decompress(body)
+        
+        return json.loads(body.decode())
+
+
+# Records or replays upstream traffic (see UPSTREAM_CASSETTE_MODE)
+upstream_cassette = (UpstreamCassette(UPSTREAM_CASSETTE, UPSTREAM_CASSETTE_MODE, UPSTREAM_CASSETTE_LATENCY_SCALE)
+                     if UPSTREAM_CASSETTE_MODE and not IN_WORKER_PROCESS else None)
+
+# Shared pooled client for Wikimedia, Unsplash and image downloads
+upstream_http = UpstreamHTTPClient(pool_size=UPSTREAM_POOL_SIZE, rate_limits=UPSTREAM_RATE_LIMITS,
+                                   default_rate_limit=UPSTREAM_DEFAULT_RATE_LIMIT, cassette=upstream_cassette)
+
+# Initialize OpenAI client (for vocabulary generation only); maintenance
+# scripts that import this module can run without an API key, and so can a
+# replayed cassette
+openai_api_key = os.getenv('OPENAI_API_KEY')
+if upstream_cassette is not None and upstream_cassette.replaying:
+    openai_api_key = openai_api_key or 'cassette-replay'
+if not openai_api_key:
+    openai_client = None
+elif upstream_cassette is not None:
+    openai_client = OpenAI(api_key=openai_api_key,
+                           http_client=httpx.Client(transport=CassetteTransport(upstream_cassette)))
+else:
+    openai_client = OpenAI(api_key=openai_api_key)
+
+
+class ImageResolutionCache:
+    """
+    Persistent cache of which image URL a word resolved to, and from which source.
+    Words that have no image on any source are stored too (with url None) and
+    expire after negative_ttl instead of ttl, so new upstream content is
+    eventually picked up. Safe to use from multiple threads.
+    
+    Args:
+        db_path: SQLite database file
+        ttl: Seconds a found image URL stays valid
+        negative_ttl: Seconds a "no image found" result stays valid
+    """
+    
+    def __init__(self, db_path: Path, ttl: int, negative_ttl: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS image_resolutions ('
+            'word TEXT PRIMARY KEY, url TEXT, source TEXT, resolved_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def _key(word: str) -> str:
+        return word.strip().lower()
+    
+    def _lookup(self, word: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        row = self._conn.execute(
+            'SELECT url, source, resolved_at FROM image_resolutions WHERE word = ?',
+            (self._key(word),)
+        ).fetchone()
+        
+        if row is None:
+            return None
+        
+        url, source, resolved_at = row
+        ttl = self.ttl if url else self.negative_ttl
+        if time.time() - resolved_at > ttl:
+            return None
+        return url, source
+    
+    def get(self, word: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """
+        Look up a word's cached resolution.
+        
+        Returns:
+            (url, source) for a fresh entry, where url is None if the word is
+            known to have no image; None if the word is not cached
+        """
+        with self._lock:
+            entry = self._lookup(word)
+            if entry is None:
+                self.misses += 1
+            elif entry[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+        return entry
+    
+    def contains(self, word: str) -> bool:
+        """Check for a fresh entry without touching the hit/miss counters."""
+        with self._lock:
+            return self._lookup(word) is not None
+    
+    def peek(self, word: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """Like get(), but without touching the hit/miss counters."""
+        with self._lock:
+            return self._lookup(word)
+    
+    def put(self, word: str, url: Optional[str], source: Optional[str]):
+        """Store a resolution (url None records that no image was found)."""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO image_resolutions (word, url, source, resolved_at) VALUES (?, ?, ?, ?)',
+                (self._key(word), url, source, time.time())
+            )
+            self._conn.commit()
+    
+    def delete(self, word: str):
+        """Forget a word's resolution, e.g. when its cached URL stopped working."""
+        with self._lock:
+            self._conn.execute('DELETE FROM image_resolutions WHERE word = ?', (self._key(word),))
+            self._conn.commit()
+    
+    def purge_expired(self) -> int:
+        """Delete expired entries. Returns the number removed."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM image_resolutions WHERE '
+                '(url IS NOT NULL AND resolved_at < ?) OR (url IS NULL AND resolved_at < ?)',
+                (now - self.ttl, now - self.negative_ttl)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and entry count."""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM image_resolutions').fetchone()[0]
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses
+            }
+
+
+# The SQLite-backed stores are only opened in the server process (see IN_WORKER_PROCESS)
+resolution_cache: Optional[ImageResolutionCache] = None
+if not IN_WORKER_PROCESS:
+    resolution_cache = ImageResolutionCache(RESOLUTION_CACHE_PATH, RESOLUTION_CACHE_TTL, RESOLUTION_CACHE_NEGATIVE_TTL)
+    resolution_cache.purge_expired()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+    The first caller runs the function; callers arriving while it is still
+    running wait for it and get the same result (or exception).
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[object, Future] = {}
+    
+    def join(self, key) -> Tuple[Future, bool]:
+        """
+        Register a call for key.
+        
+        Returns:
+            (future, leader): the leader must run the work and call complete();
+            everyone else waits on future
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+    
+    def complete(self, key, result=None, exception: Optional[BaseException] = None):
+        """Publish the leader's outcome for key to the waiting callers."""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is None:
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) unless a call for key is already in flight, then share its outcome."""
+        future, leader = self.join(key)
+        if not leader:
+            return future.result()
+        
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.complete(key, exception=e)
+            raise
+        self.complete(key, result)
+        return result
+    
+    def in_flight(self, key) -> bool:
+        """Check whether a call for key is currently running."""
+        with self._lock:
+            return key in self._calls
+
+
+class VocabularyListCache:
+    """
+    Bounded LRU cache of generated vocabulary lists with a TTL.
+    Keyed on normalized theme and word count; a list cached for more words
+    also serves smaller requests for the same theme by slicing.
+    
+    Args:
+        max_entries: Maximum number of cached lists
+        ttl: Seconds a list stays valid
+    """
+    
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, int], Tuple[float, List[Dict]]]' = OrderedDict()
+    
+    @staticmethod
+    def normalize_theme(theme: str) -> str:
+        """Case- and whitespace-insensitive form of a theme."""
+        return ' '.join(str(theme).lower().split())
+    
+    def get(self, theme: str, num_words: int, record_stats: bool = True) -> Optional[List[Dict]]:
+        """
+        Look up a list for theme with at least num_words words.
+        
+        Args:
+            theme: The requested theme
+            num_words: The requested word count
+            record_stats: If False, don't count this lookup as a hit or miss
+            
+        Returns:
+            A copy of the first num_words items, or None on a miss
+        """
+        theme_key = self.normalize_theme(theme)
+        now = time.time()
+        
+        with self._lock:
+            best_key = None
+            for key, (created, vocab_list) in list(self._entries.items()):
+                if now - created > self.ttl:
+                    del self._entries[key]
+                    continue
+                if key[0] != theme_key or key[1] < num_words:
+                    continue
+                # An exact match is always usable; a larger list only if the
+                # model actually returned enough words to slice from
+                if key[1] != num_words and len(vocab_list) < num_words:
+                    continue
+                if best_key is None or key[1] < best_key[1]:
+                    best_key = key
+            
+            if best_key is None:
+                if record_stats:
+                    self.misses += 1
+                return None
+            
+            if record_stats:
+                self.hits += 1
+            self._entries.move_to_end(best_key)
+            vocab_list = self._entries[best_key][1]
+            return [dict(vocab) for vocab in vocab_list[:num_words]]
+    
+    def put(self, theme: str, num_words: int, vocab_list: List[Dict]):
+        """Store a generated list, evicting the least recently used one if full."""
+        key = (self.normalize_theme(theme), num_words)
+        with self._lock:
+            self._entries[key] = (time.time(), [dict(vocab) for vocab in vocab_list])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and entry count."""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+vocab_list_cache = VocabularyListCache(VOCAB_CACHE_SIZE, VOCAB_CACHE_TTL)
+vocab_list_flight = SingleFlight()
+
+# Concurrent searches/downloads of the same image share one upstream fetch
+image_flight = SingleFlight()
+
+
+class HotImageCache:
+    """
+    LRU cache of small image files' bytes, bounded by total size.
+    Only content-addressed files (blobs and their renditions) are cached;
+    they never change, so entries only leave when evicted or deleted.
+    
+    Args:
+        max_bytes: Total bytes kept in memory
+        max_file_bytes: Largest file that is cached
+    """
+    
+    def __init__(self, max_bytes: int, max_file_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.too_large = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Path, bytes]' = OrderedDict()
+    
+    def get(self, path: Path) -> Optional[bytes]:
+        """Return a file's cached bytes, or None on a miss."""
+        with self._lock:
+            data = self._entries.get(path)
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(path)
+            return data
+    
+    def contains(self, path: Path) -> bool:
+        """Check for a file without touching the hit/miss counters."""
+        with self._lock:
+            return path in self._entries
+    
+    def put(self, path: Path, data: bytes):
+        """Cache a file's bytes, evicting the least recently used files to make room."""
+        if len(data) > self.max_file_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[path] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+    
+    def record_too_large(self):
+        """Count a miss for a file too large to cache, so it doesn't skew the hit ratio."""
+        with self._lock:
+            self.too_large += 1
+    
+    def discard(self, paths: Iterable[Path]):
+        """Drop files that were deleted from disk."""
+        with self._lock:
+            for path in paths:
+                data = self._entries.pop(path, None)
+                if data is not None:
+                    self._bytes -= len(data)
+    
+    def stats(self) -> Dict:
+        """Size, hit/miss counters and the hit ratio of cacheable lookups."""
+        with self._lock:
+            lookups = self.hits + self.misses - self.too_large
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses - self.too_large,
+                'too_large': self.too_large,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+hot_image_cache = HotImageCache(HOT_IMAGE_CACHE_BYTES, HOT_IMAGE_MAX_FILE_BYTES)
+
+
+class SourceUnavailable(Exception):
+    """Raised instead of querying an image source whose circuit breaker is open."""
+    
+    def __init__(self, source: str):
+        super().__init__(f"{source} is unavailable (circuit open)")
+        self.source = source
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one image source, which also keeps the source's
+    recent lookup latencies (used to time hedged lookups).
+    
+    While closed, lookups go through. After failure_threshold consecutive
+    failures the circuit opens and lookups fail immediately with
+    SourceUnavailable for reset_timeout seconds. It then goes half-open: a
+    single trial lookup is let through, and its outcome closes the circuit
+    or opens it again.
+    
+    Args:
+        source: Source name ('wikimedia' or 'unsplash')
+        failure_threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds the circuit stays open before a trial lookup
+    """
+    
+    LATENCY_WINDOW = 200
+    
+    def __init__(self, source: str, failure_threshold: int, reset_timeout: float):
+        self.source = source
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Check whether a lookup may go to the source now (claims the trial when half-open)."""
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = 'half_open'
+                self._trial_running = False
+            
+            if self.state == 'half_open':
+                if self._trial_running:
+                    self.rejected += 1
+                    return False
+                self._trial_running = True
+            return True
+    
+    def record_success(self, latency: Optional[float] = None):
+        """Record a lookup that got an answer (image or not), and how long it took."""
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._trial_running = False
+            if latency is not None:
+                self._latencies.append(latency)
+            if self.state != 'closed':
+                logger.info(f"Image source {self.source} recovered, closing its circuit")
+                self.state = 'closed'
+    
+    def record_failure(self):
+        """Record a failed lookup, opening the circuit if there have been too many."""
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self._trial_running = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.consecutive_failures >= self.failure_threshold):
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                logger.warning(f"Image source {self.source} failed {self.consecutive_failures} times in a row, "
+                               f"skipping it for {self.reset_timeout:.0f}s")
+    
+    def record_skipped(self):
+        """Release the trial of a lookup that never reached the source (e.g. rate limited locally)."""
+        with self._lock:
+            self._trial_running = False
+    
+    def call(self, fn: Callable, *args, track_latency: bool = True, deadline_bound: bool = False):
+        """
+        Run a lookup through the breaker.
+        
+        Args:
+            fn: The lookup; it should raise on failure
+            args: Arguments for fn
+            track_latency: If False, don't add this lookup to the latency window
+                (e.g. batch lookups, which are slower than single ones)
+            deadline_bound: True if the lookup's timeout was shortened to fit a
+                request deadline; timing out then isn't the source's fault
+        
+        Raises:
+            SourceUnavailable: If the circuit is open
+        """
+        if not self.allow():
+            raise SourceUnavailable(self.source)
+        
+        start = time.monotonic()
+        try:
+            result = fn(*args)
+        except UpstreamRateLimited:
+            self.record_skipped()
+            raise
+        except TimeoutError:
+            if deadline_bound:
+                self.record_skipped()
+            else:
+                self.record_failure()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.monotonic() - start if track_latency else None)
+        return result
+    
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        Get a percentile of the recent lookup latencies in seconds, or None
+        until IMAGE_HEDGE_MIN_SAMPLES have been recorded.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < IMAGE_HEDGE_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+    
+    def stats(self) -> Dict:
+        """Circuit state, counters and recent latency percentiles."""
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        with self._lock:
+            state = self.state
+            if state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                state = 'half_open'
+            return {
+                'state': state,
+                'consecutive_failures': self.consecutive_failures,
+                'successes': self.successes,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'opened': self.opened,
+                'latency_p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                'latency_p95_ms': round(p95 * 1000, 1) if p95 is not None else None
+            }
+
+
+source_breakers = {
+    source: CircuitBreaker(source, CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_RESET)
+    for source in ('wikimedia', 'unsplash')
+}
+
+
+class HedgedLookup:
+    """
+    Queries a preferred image source and, if it hasn't answered within a
+    percentile of that source's recent latencies, the fallback source as
+    well, taking the first image found. A slower lookup that loses is left
+    to finish in the background (it still feeds the circuit breakers).
+    Lookups run on their own pool, since callers are usually image workers.
+    
+    Args:
+        percentile: Latency percentile of the preferred source to wait before hedging
+        min_delay: Shortest wait before hedging, in seconds
+        max_workers: Threads for concurrent lookups
+    """
+    
+    def __init__(self, percentile: float, min_delay: float, max_workers: int):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.lookups = 0
+        self.hedged = 0
+        self.fallback_wins = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-lookup')
+    
+    def delay(self, source: str) -> float:
+        """Seconds to wait for a source before starting the fallback."""
+        latency = source_breakers[source].latency_percentile(self.percentile)
+        if latency is None:
+            return IMAGE_HEDGE_DEFAULT_DELAY
+        return min(UPSTREAM_API_TIMEOUT, max(self.min_delay, latency))
+    
+    def run(self, primary: Tuple[str, Callable[[], Optional[str]]],
+            fallback: Tuple[str, Callable[[], Optional[str]]]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Look up an image, hedging the preferred source with the fallback.
+        
+        Args:
+            primary: (source name, lookup) for the preferred source; lookups
+                return an image URL or None and must not raise
+            fallback: (source name, lookup) for the fallback source
+            
+        Returns:
+            (image URL, source name) of the first image found, or (None, None)
+        """
+        primary_source, primary_lookup = primary
+        fallback_source, fallback_lookup = fallback
+        
+        futures = {self._executor.submit(primary_lookup): primary_source}
+        done, _ = wait(futures, timeout=self.delay(primary_source))
+        hedged = not done
+        if hedged:
+            futures[self._executor.submit(fallback_lookup)] = fallback_source
+        
+        with self._lock:
+            self.lookups += 1
+            if hedged:
+                self.hedged += 1
+        
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # If both finished together, prefer the primary's answer
+            for future in sorted(done, key=lambda f: futures[f] != primary_source):
+                image_url = future.result()
+                if image_url:
+                    if futures[future] == fallback_source and hedged:
+                        with self._lock:
+                            self.fallback_wins += 1
+                    return image_url, futures[future]
+        
+        # The preferred source answered in time without an image: try the fallback as usual
+        if not hedged:
+            image_url = fallback_lookup()
+            if image_url:
+                return image_url, fallback_source
+        return None, None
+    
+    def stats(self) -> Dict:
+        """Counts of lookups, hedged lookups and lookups won by the fallback, plus the current delays."""
+        with self._lock:
+            return {
+                'lookups': self.lookups,
+                'hedged': self.hedged,
+                'fallback_wins': self.fallback_wins,
+                'delay_ms': {source: round(self.delay(source) * 1000, 1) for source in source_breakers}
+            }
+
+
+# Only created when hedging is enabled
+hedged_lookup = HedgedLookup(IMAGE_HEDGE_PERCENTILE, IMAGE_HEDGE_MIN_DELAY, IMAGE_WORKERS * 2) if IMAGE_HEDGING else None
+
+
+def sanitize_filename(word: str) -> str:
+    """
+    Sanitize a word to create a safe filename.
+    
+    Args:
+        word: The vocabulary word
+        
+    Returns:
+        A safe filename string
+    """
+    # Remove special characters and replace spaces with underscores
+    safe_name = "".join(c if c.isalnum() or c in (' ', '-', '_') else '' for c in word)
+    safe_name = safe_name.strip().replace(' ', '_').lower()
+    return safe_name
+
+
+def get_image_path(word: str) -> Path:
+    """
+    Get the public path for a vocabulary word's image (vocab_images/<word>.png).
+    The bytes live in the content-addressed store; use image_store.resolve()
+    with the filename to find them.
+    
+    Args:
+        word: The vocabulary word
+        
+    Returns:
+        Path object for the image file
+    """
+    filename = f"{sanitize_filename(word)}.png"
+    return VOCAB_IMAGES_DIR / filename
+
+
+def image_exists(word: str) -> bool:
+    """
+    Check if an image already exists for a word. The check doesn't count as
+    an access to the image (for eviction and hit statistics); resolving or
+    serving it does.
+    
+    Args:
+        word: The vocabulary word
+        
+    Returns:
+        True if image exists, False otherwise
+    """
+    return image_store.manifest.contains(get_image_path(word).name)
+
+
+def get_image_version(image_path: Path) -> Optional[str]:
+    """
+    Get the version of a stored image: the start of its content hash.
+    
+    Args:
+        image_path: Path of the stored image
+        
+    Returns:
+        IMAGE_VERSION_LENGTH hex digits, or None for files in the old flat layout
+    """
+    if not BLOB_NAME.match(image_path.name):
+        return None
+    return image_path.name[:IMAGE_VERSION_LENGTH]
+
+
+def get_image_url_path(image_name: str, image_path: Path) -> str:
+    """
+    Get the versioned relative URL for a stored image, e.g.
+    vocab_images/ocean.3f2a9c0d1b4e5f60.png. The URL changes whenever the
+    image does, so it can be cached forever.
+    
+    Args:
+        image_name: Public filename of the image (e.g. ocean.png)
+        image_path: Path of the stored image
+        
+    Returns:
+        The relative URL (unversioned for files in the old flat layout)
+    """
+    version = get_image_version(image_path)
+    if version is None:
+        return f"vocab_images/{image_name}"
+    
+    name = Path(image_name)
+    return f"vocab_images/{name.stem}.{version}{name.suffix}"
+
+
+def search_wikimedia_image(word: str, raise_errors: bool = False, deadline: Optional[float] = None) -> Optional[str]:
+    """
+    Search for a free image on Wikimedia Commons.
+    
+    Args:
+        word: The vocabulary word to search for
+        raise_errors: If True, re-raise lookup errors instead of returning None
+        deadline: Optional time.monotonic() value the lookup must finish by
+        
+    Returns:
+        URL of the image, or None if not found
+    """
+    started = time.perf_counter()
+    try:
+        # Search Wikipedia for the word
+        search_url = f"{WIKIPEDIA_API_URL}?action=query&format=json&prop=pageimages&titles={urllib.parse.quote(word)}&pithumbsize=1024"
+        timeout = time_left(deadline, UPSTREAM_API_TIMEOUT)
+        
+        data = source_breakers['wikimedia'].call(
+            upstream_http.get_json, search_url, {'User-Agent': 'VocabularyServer/1.0 (Educational Purpose)'}, timeout,
+            deadline_bound=timeout < UPSTREAM_API_TIMEOUT
+        )
+            
+        pages = data.get('query', {}).get('pages', {})
+        
+        for page_id, page_data in pages.items():
+            if 'thumbnail' in page_data:
+                image_url = page_data['thumbnail']['source']
+                logger.info(f"Found Wikimedia image for '{word}': {image_url}")
+                return image_url
+        
+        logger.info(f"No Wikimedia image found for '{word}'")
+        return None
+        
+    except (SourceUnavailable, DeadlineExceeded) as e:
+        logger.info(f"Skipping Wikimedia search for '{word}': {str(e)}")
+        if raise_errors:
+            raise
+        return None
+    except Exception as e:
+        logger.error(f"Error searching Wikimedia for '{word}': {str(e)}")
+        stage_errors.inc('wikimedia_search')
+        if raise_errors:
+            raise
+        return None
+    finally:
+        stage_duration.observe(time.perf_counter() - started, 'wikimedia_search')
+
+
+def search_wikimedia_images(words: List[str], deadline: Optional[float] = None) -> Dict[str, Optional[str]]:
+    """
+    Look up free images for many words at once on Wikimedia Commons.
+    Uses multi-title pageimages queries (up to WIKIPEDIA_BATCH_SIZE titles each)
+    and maps normalized and redirected titles back to the original words.
+    
+    Args:
+        words: The vocabulary words to search for
+        deadline: Optional time.monotonic() value the lookups must finish by
+        
+    Returns:
+        Dict mapping each looked-up word to its image URL (None if Wikimedia has
+        no image). Words whose batch request failed are left out, so callers can
+        fall back to search_wikimedia_image() for them.
+    """
+    # Dedupe, and leave titles MediaWiki can't take in a pipe-separated list to the single lookup
+    unique_words = list(dict.fromkeys(word for word in words if word and '|' not in word))
+    results = {}
+    
+    for start in range(0, len(unique_words), WIKIPEDIA_BATCH_SIZE):
+        batch = unique_words[start:start + WIKIPEDIA_BATCH_SIZE]
+        started = time.perf_counter()
+        
+        try:
+            params = {
+                'action': 'query',
+                'format': 'json',
+                'prop': 'pageimages',
+                'titles': '|'.join(batch),
+                'pithumbsize': 1024,
+                'pilimit': WIKIPEDIA_BATCH_SIZE,
+                'redirects': 1
+            }
+            
+            # Title mappings and thumbnails accumulate over continuation requests
+            title_map = {}
+            thumbnails = {}
+            
+            while True:
+                search_url = f"{WIKIPEDIA_API_URL}?{urllib.parse.urlencode(params)}"
+                timeout = time_left(deadline, UPSTREAM_API_TIMEOUT)
+                
+                data = source_breakers['wikimedia'].call(
+                    upstream_http.get_json, search_url, {'User-Agent': 'VocabularyServer/1.0 (Educational Purpose)'}, timeout,
+                    track_latency=False, deadline_bound=timeout < UPSTREAM_API_TIMEOUT
+                )
+                
+                query = data.get('query', {})
+                
+                for mapping in query.get('normalized', []) + query.get('redirects', []):
+                    title_map[mapping['from']] = mapping['to']
+                
+                for page_data in query.get('pages', {}).values():
+                    if 'thumbnail' in page_data:
+                        thumbnails[page_data.get('title')] = page_data['thumbnail']['source']
+                
+                if 'continue' not in data:
+                    break
+                params.update(data['continue'])
+            
+            for word in batch:
+                # Follow normalization then (possibly chained) redirects to the final page title
+                title = word
+                for _ in range(len(title_map) + 1):
+                    if title not in title_map:
+                        break
+                    title = title_map[title]
+                results[word] = thumbnails.get(title)
+            
+            found = sum(1 for word in batch if results[word])
+            logger.info(f"Wikimedia batch lookup: {found}/{len(batch)} words have images")
+            
+        except (SourceUnavailable, DeadlineExceeded) as e:
+            logger.info(f"Skipping Wikimedia batch lookup for {len(batch)} words: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error in Wikimedia batch lookup for {len(batch)} words: {str(e)}")
+            stage_errors.inc('wikimedia_batch')
+        finally:
+            stage_duration.observe(time.perf_counter() - started, 'wikimedia_batch')
+    
+    return results
+
+
+def search_unsplash_image(word: str, random_page: bool = False, raise_errors: bool = False,
+                          deadline: Optional[float] = None) -> Optional[str]:
+    """
+    Search for a free image on Unsplash (requires API key).
+    
+    Args:
+        word: The vocabulary word to search for
+        random_page: If True, fetch a random page of results (for variety)
+        raise_errors: If True, re-raise lookup errors instead of returning None
+        deadline: Optional time.monotonic() value the lookup must finish by
+        
+    Returns:
+        URL of the image, or None if not found
+    """
+    if not UNSPLASH_ACCESS_KEY:
+        logger.info("Unsplash API key not configured, skipping Unsplash search")
+        return None
+    
+    started = time.perf_counter()
+    try:
+        # If random_page is True, fetch multiple results and pick a random one
+        per_page = 10 if random_page else 1
+        page = 1
+        
+        search_url = f"{UNSPLASH_API_URL}/search/photos?query={urllib.parse.quote(word)}&per_page={per_page}&page={page}&orientation=landscape"
+        timeout = time_left(deadline, UPSTREAM_API_TIMEOUT)
+        
+        data = source_breakers['unsplash'].call(
+            upstream_http.get_json, search_url, {'Authorization': f'Client-ID {UNSPLASH_ACCESS_KEY}'}, timeout,
+            deadline_bound=timeout < UPSTREAM_API_TIMEOUT
+        )
+            
+        results = data.get('results', [])
+        
+        if results and len(results) > 0:
+            # Pick a random result if random_page is True, otherwise take the first
+            # (the same one for a word on every run when recording or replaying,
+            # so the download is in the cassette)
+            import random
+            choose = random.Random(word) if upstream_cassette is not None else random
+            index = choose.randint(0, len(results) - 1) if random_page and len(results) > 1 else 0
+            image_url = results[index]['urls']['regular']
+            logger.info(f"Found Unsplash image for '{word}' (index {index}/{len(results)}): {image_url}")
+            return image_url
+        
+        logger.info(f"No Unsplash image found for '{word}'")
+        return None
+        
+    except (SourceUnavailable, DeadlineExceeded) as e:
+        logger.info(f"Skipping Unsplash search for '{word}': {str(e)}")
+        if raise_errors:
+            raise
+        return None
+    except Exception as e:
+        logger.error(f"Error searching Unsplash for '{word}': {str(e)}")
+        stage_errors.inc('unsplash_search')
+        if raise_errors:
+            raise
+        return None
+    finally:
+        stage_duration.observe(time.perf_counter() - started, 'unsplash_search')
+
+
+def detect_image_format(header: bytes) -> Optional[str]:
+    """
+    Identify an image format from the first bytes of a file.
+    
+    Args:
+        header: At least the first 16 bytes of the file
+        
+    Returns:
+        'png', 'jpeg', 'gif', 'webp' or 'avif', or None if not a recognised image
+    """
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    if header[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'avif'
+    return None
+
+
+def get_image_mimetype(path: Path) -> Optional[str]:
+    """
+    Get the real MIME type of a stored image from its magic bytes
+    (older downloads were saved as .png whatever their format).
+    
+    Args:
+        path: Path of the image file
+        
+    Returns:
+        The MIME type, or None if it can't be determined
+    """
+    try:
+        with open(path, 'rb') as f:
+            return IMAGE_MIMETYPES.get(detect_image_format(f.read(16)))
+    except OSError:
+        return None
+
+
+def get_rendition_path(image_path: Path, width: int) -> Path:
+    """
+    Get the file path of a resized rendition of an image.
+    
+    Args:
+        image_path: Path of the original image
+        width: Rendition width in pixels
+        
+    Returns:
+        Path object for the rendition, e.g. ocean.256w.webp next to ocean.png
+    """
+    return image_path.with_name(f"{image_path.stem}.{width}w.{RENDITION_FORMAT}")
+
+
+def get_image_metadata_path(image_path: Path) -> Path:
+    """
+    Get the path of the JSON file recording an image's original dimensions and renditions.
+    
+    Args:
+        image_path: Path of the original image
+        
+    Returns:
+        Path object for the metadata file, e.g. ocean.meta.json next to ocean.png
+    """
+    return image_path.with_name(f"{image_path.stem}.meta.json")
+
+
+# CPU-bound image decoding/encoding runs in separate processes, off the Flask
+# threads. The pool is started on first use, and with 'spawn' rather than
+# fork: a forked worker would inherit locks held by this process's threads
+# (image workers, SQLite connections) and could deadlock. Spawned workers may
+# still import this module (see IN_WORKER_PROCESS)
+rendition_executor: Optional[ProcessPoolExecutor] = None
+rendition_executor_lock = threading.Lock()
+renditions_lock = threading.Lock()
+renditions_running = set()
+renditions_failed = set()
+
+
+def get_rendition_executor() -> Optional[ProcessPoolExecutor]:
+    """Get the rendition process pool, starting it on first use (None without Pillow or RENDITION_WIDTHS)."""
+    global rendition_executor
+    if build_renditions is None or not RENDITION_WIDTHS:
+        return None
+    with rendition_executor_lock:
+        if rendition_executor is None:
+            rendition_executor = ProcessPoolExecutor(max_workers=RENDITION_WORKERS,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return rendition_executor
+
+
+def schedule_renditions(image_path: Path):
+    """
+    Build renditions for an image in the background (no-op without Pillow).
+    Stored images never change, so a build already running for the same
+    image is enough.
+    
+    Args:
+        image_path: Path of the original image
+    """
+    executor = get_rendition_executor()
+    if executor is None:
+        return
+    
+    with renditions_lock:
+        # Don't retry images that can't be decoded on every request
+        if image_path in renditions_failed:
+            return
+        if image_path in renditions_running:
+            return
+        renditions_running.add(image_path)
+    
+    def on_done(future):
+        with renditions_lock:
+            renditions_running.discard(image_path)
+        
+        if future.exception():
+            with renditions_lock:
+                renditions_failed.add(image_path)
+            logger.error(f"Error building renditions for {image_path.name}: {str(future.exception())}")
+        else:
+            metadata = future.result()
+            image_store.manifest.set_renditions(image_path, metadata['width'], metadata['height'],
+                                                ImageStore.renditions_size(image_path, metadata))
+            image_evictor.wake()
+            logger.info(f"Built {len(metadata['renditions'])} renditions for {image_path.name} ({metadata['width']}x{metadata['height']} {metadata['format']})")
+    
+    try:
+        future = executor.submit(
+            build_renditions, str(image_path), RENDITION_WIDTHS, RENDITION_FORMAT,
+            RENDITION_QUALITY, str(VOCAB_IMAGES_TMP_DIR)
+        )
+    except Exception as e:
+        with renditions_lock:
+            renditions_running.discard(image_path)
+        logger.error(f"Could not schedule renditions for {image_path.name}: {str(e)}")
+        return
+    
+    future.add_done_callback(on_done)
+
+
+def get_rendition_files(image_path: Path) -> List[Path]:
+    """
+    List the renditions and metadata file that may exist for an image.
+    
+    Args:
+        image_path: Path of the original image
+        
+    Returns:
+        Paths of the rendition files and the metadata file
+    """
+    metadata_path = get_image_metadata_path(image_path)
+    names = {get_rendition_path(image_path, width).name for width in RENDITION_WIDTHS}
+    
+    try:
+        with open(metadata_path) as f:
+            names.update(json.load(f).get('renditions', {}).values())
+    except (OSError, ValueError):
+        pass
+    
+    return [image_path.parent / name for name in sorted(names)] + [metadata_path]
+
+
+def remove_renditions(image_path: Path):
+    """
+    Delete an image's renditions and metadata (e.g. before replacing the image).
+    
+    Args:
+        image_path: Path of the original image
+    """
+    for path in get_rendition_files(image_path):
+        path.unlink(missing_ok=True)
+
+
+def read_image_metadata(image_path: Path) -> Optional[Dict]:
+    """
+    Read the metadata written by build_renditions() for an image.
+    
+    Args:
+        image_path: Path of the original image
+    
+    Returns:
+        The metadata, or None if renditions haven't been built
+    """
+    try:
+        with open(get_image_metadata_path(image_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ImageManifest:
+    """
+    In-memory index of the stored images, so existence checks, lookups and
+    counts never touch the disk.
+    Each entry (keyed by public filename) holds the image's path, size
+    (plus the size of its renditions), dimensions (once known), source,
+    created/last-access times and access count.
+    
+    The index is updated incrementally as images are stored; a full rebuild
+    replaces it with a fresh scan, keeping entries that changed while the
+    scan was running.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._names_by_path: Dict[Path, set] = {}
+        self._bytes = 0
+        self._legacy = 0
+        self._changed_during_rebuild: Optional[set] = None
+    
+    def _add(self, entry: Dict):
+        names = self._names_by_path.setdefault(entry['path'], set())
+        if not names:
+            self._bytes += entry['size'] + entry['renditions_size']
+            if entry['source'] == 'legacy':
+                self._legacy += 1
+        names.add(entry['name'])
+        self._entries[entry['name']] = entry
+    
+    def _remove(self, name: str) -> Optional[Dict]:
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return None
+        names = self._names_by_path.get(entry['path'], set())
+        names.discard(name)
+        if not names:
+            self._names_by_path.pop(entry['path'], None)
+            self._bytes -= entry['size'] + entry['renditions_size']
+            if entry['source'] == 'legacy':
+                self._legacy -= 1
+        return entry
+    
+    def put(self, entry: Dict) -> Optional[Path]:
+        """
+        Add or replace the entry for entry['name'].
+        
+        Returns:
+            The path the name used to point at, if no other name uses it any more
+        """
+        with self._lock:
+            previous = self._remove(entry['name'])
+            if previous is not None:
+                entry.setdefault('last_access', previous['last_access'])
+                entry.setdefault('hits', previous['hits'])
+            entry.setdefault('last_access', entry['created_at'])
+            entry.setdefault('hits', 0)
+            self._add(entry)
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild.add(entry['name'])
+            
+            if previous is not None and previous['path'] not in self._names_by_path:
+                return previous['path']
+            return None
+    
+    def remove(self, name: str):
+        """Drop the entry for a filename."""
+        with self._lock:
+            self._remove(name)
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild.add(name)
+    
+    def remove_path(self, path: Path) -> List[str]:
+        """Drop every filename stored as path. Returns the names removed."""
+        with self._lock:
+            names = list(self._names_by_path.get(path, ()))
+            for name in names:
+                self._remove(name)
+                if self._changed_during_rebuild is not None:
+                    self._changed_during_rebuild.add(name)
+            return names
+    
+    def has_path(self, path: Path) -> bool:
+        """Check whether any filename is stored as path."""
+        with self._lock:
+            return path in self._names_by_path
+    
+    def paths(self) -> set:
+        """All stored paths."""
+        with self._lock:
+            return set(self._names_by_path)
+    
+    def files(self) -> List[Dict]:
+        """
+        Per-file totals for eviction: path, bytes on disk (with renditions),
+        latest access and access count across all names stored as the file.
+        """
+        with self._lock:
+            files = []
+            for path, names in self._names_by_path.items():
+                entries = [self._entries[name] for name in names]
+                files.append({
+                    'path': path,
+                    'bytes': entries[0]['size'] + entries[0]['renditions_size'],
+                    'last_access': max(entry['last_access'] for entry in entries),
+                    'hits': sum(entry['hits'] for entry in entries)
+                })
+            return files
+    
+    def get(self, name: str) -> Optional[Dict]:
+        """Return a copy of a filename's entry, or None."""
+        with self._lock:
+            entry = self._entries.get(name)
+            return dict(entry) if entry is not None else None
+    
+    def contains(self, name: str) -> bool:
+        """Check whether a filename is stored, without recording an access."""
+        with self._lock:
+            return name in self._entries
+    
+    def touch(self, name: str) -> Optional[Path]:
+        """Record an access to a filename and return its path, or None if it isn't stored."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            entry['last_access'] = time.time()
+            entry['hits'] += 1
+            return entry['path']
+    
+    def set_renditions(self, path: Path, width: int, height: int, renditions_size: int):
+        """Record an image's dimensions and renditions' size for every filename stored as path."""
+        with self._lock:
+            names = self._names_by_path.get(path, ())
+            for index, name in enumerate(names):
+                entry = self._entries[name]
+                if index == 0:
+                    self._bytes += renditions_size - entry['renditions_size']
+                entry['width'] = width
+                entry['height'] = height
+                entry['renditions_size'] = renditions_size
+    
+    def begin_rebuild(self):
+        """Start tracking changes so the scan in progress doesn't overwrite them."""
+        with self._lock:
+            self._changed_during_rebuild = set()
+    
+    def replace(self, entries: List[Dict]) -> int:
+        """
+        Swap in the entries from a full scan started after begin_rebuild().
+        
+        Returns:
+            Number of filenames whose path or size differed from the old index
+        """
+        with self._lock:
+            changed = self._changed_during_rebuild or set()
+            self._changed_during_rebuild = None
+            old_entries = self._entries
+            scanned = {entry['name']: entry for entry in entries}
+            
+            drift = 0
+            for name in (set(old_entries) | set(scanned)) - changed:
+                old, new = old_entries.get(name), scanned.get(name)
+                if old is None or new is None or (old['path'], old['size']) != (new['path'], new['size']):
+                    drift += 1
+            
+            self._entries = {}
+            self._names_by_path = {}
+            self._bytes = 0
+            self._legacy = 0
+            for name, entry in scanned.items():
+                if name in changed:
+                    continue
+                if name in old_entries:
+                    entry['last_access'] = max(entry['created_at'], old_entries[name]['last_access'])
+                    entry['hits'] = old_entries[name]['hits']
+                else:
+                    entry['last_access'] = entry['created_at']
+                    entry['hits'] = 0
+                self._add(entry)
+            for name in changed:
+                if name in old_entries:
+                    self._add(old_entries[name])
+            
+            return drift
+    
+    def stats(self) -> Dict:
+        """Counts of filenames and distinct files, and their total size."""
+        with self._lock:
+            return {
+                'names': len(self._entries),
+                'blobs': len(self._names_by_path) - self._legacy,
+                'legacy_files': self._legacy,
+                'bytes': self._bytes
+            }
+
+
+class ImageStore:
+    """
+    Content-addressed image storage.
+    Image bytes are stored once, as blobs/<aa>/<bb>/<sha256>.<ext> under the
+    images directory, so words whose images are identical share one file and
+    no directory grows past a few hundred entries. Each word's public
+    filename (e.g. ocean.png) maps to its current blob in an SQLite table.
+    Files left in the old flat layout are still found by name until they are
+    migrated with import_file().
+    
+    Lookups are answered from an in-memory ImageManifest loaded at startup.
+    If a file turns out to be missing, or a periodic re-scan finds the index
+    out of step with the disk, the manifest is rebuilt.
+    
+    Files being written or served are pinned; remove() never deletes a
+    pinned file.
+    
+    Args:
+        root: The images directory
+        db_path: SQLite database file for the filename -> blob mapping
+    """
+    
+    BLOB_EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'gif': 'gif', 'webp': 'webp', 'avif': 'avif'}
+    
+    def __init__(self, root: Path, db_path: Path):
+        self.root = root
+        self.blobs_dir = root / 'blobs'
+        self.manifest = ImageManifest()
+        self.rebuilds = 0
+        self.orphans = set()
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._pins_lock = threading.Lock()
+        self._pins: Dict[Path, int] = {}
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS image_names ('
+                'name TEXT PRIMARY KEY, blob TEXT NOT NULL, stored_at REAL NOT NULL, source TEXT)'
+            )
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(image_names)')]
+            if 'source' not in columns:
+                self._conn.execute('ALTER TABLE image_names ADD COLUMN source TEXT')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS image_names_blob ON image_names (blob)')
+            self._conn.commit()
+    
+    def blob_path(self, digest: str, image_format: str) -> Path:
+        """Path of the blob for a SHA-256 hex digest and detected image format."""
+        return self.blobs_dir / digest[:2] / digest[2:4] / f"{digest}.{self.BLOB_EXTENSIONS[image_format]}"
+    
+    @staticmethod
+    def renditions_size(path: Path, metadata: Optional[Dict]) -> int:
+        """Bytes used by an image's renditions and metadata file."""
+        if metadata is None:
+            return 0
+        
+        size = 0
+        for file_path in [get_image_metadata_path(path)] + [path.with_name(name) for name in metadata.get('renditions', {}).values()]:
+            try:
+                size += file_path.stat().st_size
+            except OSError:
+                pass
+        return size
+    
+    @classmethod
+    def blob_mimetype(cls, path: Path) -> Optional[str]:
+        """MIME type of a blob, from the extension given to it when stored."""
+        extension = path.suffix[1:]
+        return next((IMAGE_MIMETYPES[fmt] for fmt, ext in cls.BLOB_EXTENSIONS.items() if ext == extension), None)
+    
+    def _entry(self, name: str, path: Path, source: Optional[str], created_at: float) -> Dict:
+        """Build a manifest entry from the file on disk (raises OSError if it is missing)."""
+        size = path.stat().st_size
+        metadata = read_image_metadata(path)
+        renditions_size = self.renditions_size(path, metadata)
+        metadata = metadata or {}
+        return {
+            'name': name,
+            'path': path,
+            'size': size,
+            'renditions_size': renditions_size,
+            'width': metadata.get('width'),
+            'height': metadata.get('height'),
+            'source': source,
+            'created_at': created_at
+        }
+    
+    def add(self, tmp_path: Path, digest: str, image_format: str) -> Path:
+        """
+        Move a complete file into the store. If identical bytes are already
+        stored the file is dropped instead.
+        
+        Returns:
+            Path of the blob
+        """
+        blob_path = self.blob_path(digest, image_format)
+        if blob_path.exists():
+            tmp_path.unlink(missing_ok=True)
+        else:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, blob_path)
+        return blob_path
+    
+    def link(self, name: str, blob_path: Path, source: Optional[str] = None):
+        """Point a public filename at a blob, replacing any flat-layout file of that name."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO image_names (name, blob, stored_at, source) VALUES (?, ?, ?, ?)',
+                (name, blob_path.relative_to(self.root).as_posix(), now, source)
+            )
+            self._conn.commit()
+        orphan = self.manifest.put(self._entry(name, blob_path, source, now))
+        if orphan is not None and self.blobs_dir in orphan.parents:
+            with self._pins_lock:
+                self.orphans.add(orphan)
+        
+        legacy_path = self.root / name
+        remove_renditions(legacy_path)
+        legacy_path.unlink(missing_ok=True)
+    
+    def put(self, tmp_path: Path, digest: str, image_format: str, name: str,
+            source: Optional[str] = None) -> Path:
+        """
+        Add a complete file to the store and point a public filename at it,
+        keeping the blob pinned so it can't be evicted in between.
+        
+        Returns:
+            Path of the blob
+        """
+        blob_path = self.blob_path(digest, image_format)
+        self.pin(blob_path)
+        try:
+            self.add(tmp_path, digest, image_format)
+            self.link(name, blob_path, source)
+        finally:
+            self.release(blob_path)
+        return blob_path
+    
+    def take_orphans(self) -> List[Path]:
+        """Return and forget the blobs that lost their last filename since the previous call."""
+        with self._pins_lock:
+            orphans = list(self.orphans)
+            self.orphans.clear()
+        return orphans
+    
+    def resolve(self, name: str) -> Optional[Path]:
+        """
+        Find the image currently stored under a public filename, recording the access.
+        
+        Returns:
+            Path of its blob (or of a not yet migrated flat-layout file), or None
+        """
+        return self.manifest.touch(name)
+    
+    def pin(self, path: Path):
+        """Protect a file from removal until release() is called."""
+        with self._pins_lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+    
+    def release(self, path: Path):
+        """Undo one pin() or acquire()."""
+        with self._pins_lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+    
+    def acquire(self, name: str) -> Optional[Path]:
+        """Like resolve(), but also pin the file (e.g. while it is served)."""
+        with self._pins_lock:
+            path = self.manifest.touch(name)
+            if path is not None:
+                self._pins[path] = self._pins.get(path, 0) + 1
+            return path
+    
+    def find_version(self, version: str) -> Optional[Path]:
+        """Find the blob whose content hash starts with version, even if no filename maps to it now."""
+        shard = self.blobs_dir / version[:2] / version[2:4]
+        for path in shard.glob(f"{version}*"):
+            if BLOB_NAME.match(path.name):
+                return path
+        return None
+    
+    def acquire_version(self, name: str, version: str) -> Optional[Path]:
+        """
+        Like acquire(), for a versioned URL: returns the blob with that version,
+        which after a regeneration may no longer be the one name maps to.
+        """
+        with self._pins_lock:
+            path = self.manifest.touch(name)
+            if path is None or get_image_version(path) != version:
+                path = self.find_version(version)
+            if path is not None:
+                self._pins[path] = self._pins.get(path, 0) + 1
+            return path
+    
+    def _in_use(self, path: Path) -> bool:
+        """Check whether a file is pinned or having renditions built (call with _pins_lock held)."""
+        if path in self._pins:
+            return True
+        with renditions_lock:
+            return path in renditions_running
+    
+    def remove(self, path: Path) -> bool:
+        """
+        Delete a stored file, its renditions and every filename mapped to it.
+        
+        Returns:
+            False if the file is in use and was left alone
+        """
+        with self._pins_lock:
+            if self._in_use(path):
+                return False
+            
+            self.manifest.remove_path(path)
+            try:
+                blob = path.relative_to(self.root).as_posix()
+            except ValueError:
+                blob = None
+            if blob is not None:
+                with self._lock:
+                    self._conn.execute('DELETE FROM image_names WHERE blob = ?', (blob,))
+                    self._conn.commit()
+            
+            files = [path] + get_rendition_files(path)
+            for file_path in files:
+                file_path.unlink(missing_ok=True)
+            hot_image_cache.discard(files)
+            return True
+    
+    def remove_unreferenced(self, paths: List[Path]) -> bool:
+        """
+        Delete files (e.g. a blob and its renditions) that no filename maps to.
+        
+        Returns:
+            False if any of them is referenced or in use, in which case none are deleted
+        """
+        with self._pins_lock:
+            for path in paths:
+                if self._in_use(path) or self.manifest.has_path(path):
+                    return False
+            for path in paths:
+                path.unlink(missing_ok=True)
+            hot_image_cache.discard(paths)
+            return True
+    
+    def import_file(self, path: Path) -> Optional[Tuple[Path, bool]]:
+        """
+        Move a flat-layout image into the store and map its filename to the blob.
+        
+        Returns:
+            (blob path, True if identical bytes were already stored), or None
+            if the file isn't a recognised image (it is left in place)
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            header = f.read(16)
+            digest.update(header)
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        
+        image_format = detect_image_format(header)
+        if image_format is None:
+            return None
+        
+        deduplicated = self.blob_path(digest.hexdigest(), image_format).exists()
+        blob_path = self.put(path, digest.hexdigest(), image_format, path.name, 'migrated')
+        return blob_path, deduplicated
+    
+    def scan(self) -> List[Dict]:
+        """Build manifest entries from the mapping table and the files on disk."""
+        with self._lock:
+            rows = self._conn.execute('SELECT name, blob, stored_at, source FROM image_names').fetchall()
+        
+        entries = {}
+        for name, blob, stored_at, source in rows:
+            try:
+                entries[name] = self._entry(name, self.root / blob, source, stored_at)
+            except OSError:
+                continue
+        
+        # Files from the flat layout, unless a blob has already replaced them
+        for path in self.root.glob('*.png'):
+            if path.name in entries:
+                continue
+            try:
+                entries[path.name] = self._entry(path.name, path, 'legacy', path.stat().st_mtime)
+            except OSError:
+                continue
+        
+        return list(entries.values())
     
-    Args:
-        word: The vocabulary word to search for
+    def load(self):
+        """Fill the manifest from disk at startup."""
+        with self._rebuild_lock:
+            self.manifest.begin_rebuild()
+            self.manifest.replace(self.scan())
+        logger.info(f"Image manifest loaded: {self.manifest.stats()['names']} images")
+    
+    def rebuild(self) -> int:
+        """
+        Reload the manifest from disk.
         
-    Returns:
-        URL of the image, or None if not found
-    """
-    try:
-        # Search Wikipedia for the word
-        search_url = f"https://en.wikipedia.org/w/api.php?action=query&format=json&prop=pageimages&titles={urllib.parse.quote(word)}&pithumbsize=1024"
+        Returns:
+            Number of entries that were out of step with the disk
+        """
+        with self._rebuild_lock:
+            self.manifest.begin_rebuild()
+            drift = self.manifest.replace(self.scan())
+            self.rebuilds += 1
+        if drift:
+            logger.warning(f"Image manifest was out of step with disk ({drift} entries), rebuilt it")
+        return drift
+    
+    def rebuild_in_background(self):
+        """Start a rebuild() in a background thread, unless one is already running."""
+        if not self._rebuild_lock.locked():
+            threading.Thread(target=self.rebuild, name='manifest-rebuild', daemon=True).start()
+    
+    def report_missing(self, name: str):
+        """Handle a manifest entry whose file has disappeared by rebuilding in the background."""
+        logger.warning(f"Image {name} is in the manifest but missing on disk")
+        self.rebuild_in_background()
+    
+    def reload(self, name: str) -> Optional[Path]:
+        """
+        Re-read one filename's mapping from the SQLite index into the manifest,
+        for images another process (e.g. migrate_images.py) has stored or moved
+        since the manifest was loaded. If the mapping had changed, the rest of
+        the manifest is rebuilt in the background. The access isn't recorded.
         
-        req = urllib.request.Request(search_url)
-        req.add_header('User-Agent', 'VocabularyServer/1.0 (Educational Purpose)')
+        Returns:
+            Path of the image now stored under name, or None
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT blob, stored_at, source FROM image_names WHERE name = ?',
+                                     (name,)).fetchone()
+        previous = self.manifest.get(name)
         
-        with urllib.request.urlopen(req, timeout=10) as response:
-            data = json.loads(response.read().decode())
-            
-        pages = data.get('query', {}).get('pages', {})
+        entry = None
+        if row is not None:
+            blob, stored_at, source = row
+            try:
+                entry = self._entry(name, self.root / blob, source, stored_at)
+            except OSError:
+                entry = None
         
-        for page_id, page_data in pages.items():
-            if 'thumbnail' in page_data:
-                image_url = page_data['thumbnail']['source']
-                logger.info(f"Found Wikimedia image for '{word}': {image_url}")
-                return image_url
+        if entry is None:
+            if previous is not None:
+                self.manifest.remove(name)
+                self.rebuild_in_background()
+            return None
         
-        logger.info(f"No Wikimedia image found for '{word}'")
-        return None
+        if previous is None or previous['path'] != entry['path']:
+            orphan = self.manifest.put(entry)
+            if orphan is not None and self.blobs_dir in orphan.parents:
+                with self._pins_lock:
+                    self.orphans.add(orphan)
+            logger.info(f"Image {name} was stored by another process, reloaded it from the index")
+            self.rebuild_in_background()
+        return entry['path']
+    
+    def verify_periodically(self, interval: float):
+        """Rebuild the manifest every interval seconds to catch changes made outside the server."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.rebuild()
+                except Exception as e:
+                    logger.error(f"Error verifying image manifest: {str(e)}")
         
-    except Exception as e:
-        logger.error(f"Error searching Wikimedia for '{word}': {str(e)}")
-        return None
+        threading.Thread(target=run, name='manifest-verify', daemon=True).start()
+    
+    def stats(self) -> Dict:
+        """Manifest counts plus how often it has been rebuilt."""
+        stats = self.manifest.stats()
+        stats['rebuilds'] = self.rebuilds
+        return stats
 
 
-def search_unsplash_image(word: str, random_page: bool = False) -> Optional[str]:
+image_store: Optional[ImageStore] = None
+if not IN_WORKER_PROCESS and not IN_RELOADER_PARENT:
+    if LEGACY_IMAGE_STORE_DB_PATH.exists() and not IMAGE_STORE_DB_PATH.exists():
+        logger.info(f"Moving image store index {LEGACY_IMAGE_STORE_DB_PATH} to {IMAGE_STORE_DB_PATH}")
+        os.replace(LEGACY_IMAGE_STORE_DB_PATH, IMAGE_STORE_DB_PATH)
+    image_store = ImageStore(VOCAB_IMAGES_DIR, IMAGE_STORE_DB_PATH)
+    image_store.load()
+    if IMAGE_STORE_BACKGROUND_TASKS and MANIFEST_VERIFY_INTERVAL > 0:
+        image_store.verify_periodically(MANIFEST_VERIFY_INTERVAL)
+
+
+class ImageEvictor:
     """
-    Search for a free image on Unsplash (requires API key).
+    Background thread keeping the image store within its disk budget.
+    Each pass deletes abandoned partial files in the download directory,
+    blobs no filename maps to any more, and - while usage is over budget -
+    the least recently or least frequently used images. Files that are being
+    written, served or having renditions built are skipped.
     
     Args:
-        word: The vocabulary word to search for
-        random_page: If True, fetch a random page of results (for variety)
-        
-    Returns:
-        URL of the image, or None if not found
+        store: The image store
+        max_bytes: Disk budget in bytes (0 = unlimited)
+        policy: 'lru' or 'lfu'
+        interval: Seconds between passes
     """
-    if not UNSPLASH_ACCESS_KEY:
-        logger.info("Unsplash API key not configured, skipping Unsplash search")
-        return None
     
-    try:
-        # If random_page is True, fetch multiple results and pick a random one
-        per_page = 10 if random_page else 1
-        page = 1
-        
-        search_url = f"https://api.unsplash.com/search/photos?query={urllib.parse.quote(word)}&per_page={per_page}&page={page}&orientation=landscape"
+    def __init__(self, store: ImageStore, max_bytes: int, policy: str, interval: float):
+        if policy not in ('lru', 'lfu'):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.store = store
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.interval = interval
+        self.runs = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.skipped_in_use = 0
+        self.orphans_removed = 0
+        self.partials_removed = 0
+        self.last_run = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._swept_blobs = False
+    
+    def start(self):
+        """Run passes in a daemon thread, every interval seconds or when woken."""
+        def run():
+            while True:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Error evicting images: {str(e)}")
         
-        req = urllib.request.Request(search_url)
-        req.add_header('Authorization', f'Client-ID {UNSPLASH_ACCESS_KEY}')
+        threading.Thread(target=run, name='image-evictor', daemon=True).start()
+    
+    def over_budget(self) -> bool:
+        """Check whether stored images use more than the disk budget."""
+        return bool(self.max_bytes) and self.store.manifest.stats()['bytes'] > self.max_bytes
+    
+    def wake(self):
+        """Start a pass now if the store is over budget (called after storing an image)."""
+        if self.over_budget():
+            self._wake.set()
+    
+    def run_once(self):
+        """Run one cleanup and eviction pass."""
+        with self._lock:
+            self.remove_partials()
+            self.remove_orphans()
+            if not self._swept_blobs:
+                self.sweep_blobs()
+                self._swept_blobs = True
+            self.evict()
+            self.runs += 1
+            self.last_run = datetime.now().isoformat()
+    
+    def remove_partials(self):
+        """Delete temporary files left in the download directory by crashed writers."""
+        cutoff = time.time() - STALE_FILE_SECONDS
+        for path in VOCAB_IMAGES_TMP_DIR.glob('*.part'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    self.partials_removed += 1
+            except OSError:
+                continue
+    
+    def remove_orphans(self):
+        """Delete blobs whose last filename was pointed at a different image."""
+        for path in self.store.take_orphans():
+            if self.store.remove_unreferenced([path] + get_rendition_files(path)):
+                self.orphans_removed += 1
+    
+    def sweep_blobs(self):
+        """Delete blobs on disk that nothing maps to (e.g. left over from before a restart)."""
+        referenced = self.store.manifest.paths()
+        cutoff = time.time() - STALE_FILE_SECONDS
         
-        with urllib.request.urlopen(req, timeout=10) as response:
-            data = json.loads(response.read().decode())
+        for shard in self.store.blobs_dir.glob('*/*'):
+            # A blob and its renditions all start with the blob's 64-character digest
+            groups: Dict[str, List[Path]] = {}
+            for path in shard.iterdir():
+                groups.setdefault(path.name[:64], []).append(path)
             
-        results = data.get('results', [])
+            for paths in groups.values():
+                if any(path in referenced for path in paths):
+                    continue
+                try:
+                    if any(path.stat().st_mtime > cutoff for path in paths):
+                        continue
+                except OSError:
+                    continue
+                if self.store.remove_unreferenced(paths):
+                    self.orphans_removed += 1
+    
+    def evict(self):
+        """Delete the least valuable images until usage is under the target."""
+        if not self.over_budget():
+            return
         
-        if results and len(results) > 0:
-            # Pick a random result if random_page is True, otherwise take the first
-            import random
-            index = random.randint(0, len(results) - 1) if random_page and len(results) > 1 else 0
-            image_url = results[index]['urls']['regular']
-            logger.info(f"Found Unsplash image for '{word}' (index {index}/{len(results)}): {image_url}")
-            return image_url
+        used = self.store.manifest.stats()['bytes']
+        target = self.max_bytes * IMAGE_EVICTION_TARGET
+        if self.policy == 'lfu':
+            files = sorted(self.store.manifest.files(), key=lambda f: (f['hits'], f['last_access']))
+        else:
+            files = sorted(self.store.manifest.files(), key=lambda f: f['last_access'])
         
-        logger.info(f"No Unsplash image found for '{word}'")
-        return None
+        evicted = 0
+        for file in files:
+            if used <= target:
+                break
+            if self.store.remove(file['path']):
+                used -= file['bytes']
+                evicted += 1
+                self.evicted_files += 1
+                self.evicted_bytes += file['bytes']
+            else:
+                self.skipped_in_use += 1
         
-    except Exception as e:
-        logger.error(f"Error searching Unsplash for '{word}': {str(e)}")
-        return None
+        logger.info(f"Evicted {evicted} images ({self.policy}); store now uses {used} of {self.max_bytes} bytes")
+    
+    def stats(self) -> Dict:
+        """Budget, usage and eviction counters."""
+        return {
+            'max_bytes': self.max_bytes,
+            'used_bytes': self.store.manifest.stats()['bytes'],
+            'policy': self.policy,
+            'runs': self.runs,
+            'last_run': self.last_run,
+            'evicted_files': self.evicted_files,
+            'evicted_bytes': self.evicted_bytes,
+            'skipped_in_use': self.skipped_in_use,
+            'orphans_removed': self.orphans_removed,
+            'partials_removed': self.partials_removed
+        }
+
+
+image_evictor = ImageEvictor(image_store, IMAGE_STORE_MAX_BYTES, IMAGE_EVICTION_POLICY, IMAGE_EVICTION_INTERVAL)
+if IMAGE_STORE_BACKGROUND_TASKS and not IN_WORKER_PROCESS and not IN_RELOADER_PARENT:
+    image_evictor.start()
 
 
-def download_image(url: str, save_path: Path) -> bool:
+def ingest_image(image_path: Path):
+    """
+    Prepare a newly stored image for serving: build its renditions in the
+    background, unless the same blob already has them.
+    
+    Args:
+        image_path: Path of the stored image
+    """
+    if not get_image_metadata_path(image_path).exists():
+        schedule_renditions(image_path)
+    image_evictor.wake()
+
+
+def download_image(url: str, image_name: str, source: Optional[str] = None,
+                   deadline: Optional[float] = None) -> Optional[Path]:
     """
     Download an image from a URL and save it locally.
+    The body is streamed to a temporary file in chunks (never more than
+    MAX_IMAGE_BYTES) while it is hashed, then moved into the image store, so
+    memory use stays flat and readers never see a partially written file.
+    Responses that aren't images, such as HTML error pages, are rejected.
     
     Args:
         url: The URL of the image to download
-        save_path: Path where to save the image
+        image_name: Public filename to store the image under (e.g. ocean.png)
+        source: Where the URL came from ('wikimedia' or 'unsplash')
+        deadline: Optional time.monotonic() value the download must finish by
         
     Returns:
-        True if successful, False otherwise
+        Path of the stored blob, or None if failed
     """
+    tmp_path = None
+    size = 0
+    started = time.perf_counter()
     try:
         logger.info(f"Downloading image from: {url}")
         
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Vocabulary Server)')
-        
-        with urllib.request.urlopen(req, timeout=30) as response:
-            image_data = response.read()
+        with upstream_http.request(url, {'User-Agent': 'Mozilla/5.0 (Vocabulary Server)'},
+                                   timeout=time_left(deadline, UPSTREAM_DOWNLOAD_TIMEOUT)) as response:
+            # Reject obvious non-images and oversized files before reading the body
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type and not content_type.startswith('image/'):
+                raise ValueError(f"Not an image (Content-Type: {content_type})")
+            
+            content_length = response.headers.get('Content-Length', '')
+            if content_length.isdigit() and int(content_length) > MAX_IMAGE_BYTES:
+                raise ValueError(f"Image too large ({content_length} bytes, limit {MAX_IMAGE_BYTES})")
             
-        with open(save_path, 'wb') as f:
-            f.write(image_data)
+            with tempfile.NamedTemporaryFile(dir=VOCAB_IMAGES_TMP_DIR, prefix=f"{Path(image_name).stem}.",
+                                             suffix='.part', delete=False) as f:
+                tmp_path = Path(f.name)
+                header = b''
+                digest = hashlib.sha256()
+                
+                while True:
+                    chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    
+                    size += len(chunk)
+                    if size > MAX_IMAGE_BYTES:
+                        raise ValueError(f"Image too large (over {MAX_IMAGE_BYTES} bytes)")
+                    # The socket timeout applies per read, so check the overall budget too
+                    if deadline_passed(deadline):
+                        raise DeadlineExceeded()
+                    
+                    if len(header) < 16:
+                        header += chunk[:16 - len(header)]
+                    digest.update(chunk)
+                    f.write(chunk)
+        
+        image_format = detect_image_format(header)
+        if image_format is None:
+            raise ValueError("Downloaded file is not a recognised image format")
+        
+        blob_path = image_store.put(tmp_path, digest.hexdigest(), image_format, image_name, source)
+        tmp_path = None
             
-        logger.info(f"Successfully downloaded and saved image to {save_path}")
-        return True
+        logger.info(f"Successfully downloaded and saved image {image_name} as {blob_path.name}")
+        return blob_path
         
     except Exception as e:
         logger.error(f"Error downloading image from {url}: {str(e)}")
-        return False
+        stage_errors.inc('download')
+        return None
+    finally:
+        stage_duration.observe(time.perf_counter() - started, 'download')
+        download_bytes.inc(source or 'unknown', amount=size)
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
 
 
-def search_and_save_image(word: str, force_regenerate: bool = False) -> Optional[str]:
+def search_and_save_image(word: str, force_regenerate: bool = False,
+                          wikimedia_urls: Optional[Dict[str, Optional[str]]] = None,
+                          deadline: Optional[float] = None, timings: Optional[StageTimings] = None) -> Optional[str]:
     """
     Search for a free image online and save it locally.
     Tries Wikimedia Commons first, then Unsplash as fallback.
@@ -213,46 +3249,161 @@ def search_and_save_image(word: str, force_regenerate: bool = False) -> Optional
     Args:
         word: The vocabulary word to find an image for
         force_regenerate: If True, re-download even if image exists
+        wikimedia_urls: Optional results of search_wikimedia_images(); words found
+            in it are not looked up on Wikimedia again
+        deadline: Optional time.monotonic() value to give up by; each lookup
+            and the download only get the time that is left
+        timings: Optional StageTimings receiving the lookup and download
+            durations and where the image came from ('store', 'cache',
+            'wikimedia', 'unsplash', or 'shared' when another request's fetch
+            was joined)
         
     Returns:
-        Relative path to the saved image, or None if failed
+        Relative, versioned path to the saved image (see get_image_url_path()),
+        or None if failed
     """
     image_path = get_image_path(word)
     
     # Check if image already exists and we're not forcing regeneration
-    if image_path.exists() and not force_regenerate:
+    stored_path = image_store.resolve(image_path.name) if not force_regenerate else None
+    if stored_path is not None:
         logger.info(f"Image already exists for '{word}', skipping download")
-        return f"vocab_images/{image_path.name}"
+        if timings is not None:
+            timings.source = 'store'
+        return get_image_url_path(image_path.name, stored_path)
+    
+    # If another request is already fetching this image, wait for it instead of fetching again
+    image_url_path = image_flight.do((image_path.name, force_regenerate), find_and_save_image,
+                                     word, image_path, force_regenerate, wikimedia_urls, deadline, timings)
+    
+    # Only the request that ran the fetch recorded a source
+    if timings is not None and timings.source is None and image_url_path:
+        timings.source = 'shared'
+    return image_url_path
+
+
+def find_and_save_image(word: str, image_path: Path, force_regenerate: bool,
+                        wikimedia_urls: Optional[Dict[str, Optional[str]]],
+                        deadline: Optional[float] = None, timings: Optional[StageTimings] = None) -> Optional[str]:
+    """
+    Resolve an image URL for a word (cache, then Wikimedia/Unsplash) and download it.
+    Called by search_and_save_image() for the one request fetching a given image.
+    
+    Args:
+        word: The vocabulary word to find an image for
+        image_path: Public path of the word's image; the download is stored under its filename
+        force_regenerate: If True, skip the resolution cache and prefer Unsplash
+        wikimedia_urls: Optional results of search_wikimedia_images()
+        deadline: Optional time.monotonic() value to give up by
+        timings: Optional StageTimings for the lookup and download durations
+        
+    Returns:
+        Relative, versioned path to the saved image, or None if failed
+    """
+    if timings is None:
+        timings = StageTimings()
+    
+    # Queued behind other work until the request's time ran out
+    if deadline_passed(deadline):
+        logger.info(f"Request deadline passed before the image search for '{word}' started")
+        return None
+    
+    # A previous search may already know the URL, or that there is no image
+    if not force_regenerate:
+        cached = resolution_cache.get(word)
+        if cached is not None:
+            cached_url, cached_source = cached
+            if cached_url is None:
+                logger.info(f"Cached: no free image for '{word}', skipping search")
+                timings.source = 'cache'
+                return None
+            
+            logger.info(f"Using cached {cached_source} image URL for '{word}'")
+            started = time.perf_counter()
+            blob_path = download_image(cached_url, image_path.name, cached_source, deadline)
+            timings.add('download', time.perf_counter() - started)
+            if blob_path:
+                timings.source = 'cache'
+                ingest_image(blob_path)
+                return get_image_url_path(image_path.name, blob_path)
+            
+            # Running out of time says nothing about the cached URL
+            if deadline_passed(deadline):
+                return None
+            
+            # The cached URL stopped working; search again
+            resolution_cache.delete(word)
+    
+    # Set when a lookup errored, so "not found" isn't cached for a transient failure
+    lookup_failed = False
+    
+    def find_image(source, search, *args):
+        nonlocal lookup_failed
+        started = time.perf_counter()
+        try:
+            return search(word, *args, raise_errors=True, deadline=deadline)
+        except Exception:
+            lookup_failed = True
+            return None
+        finally:
+            timings.add(source, time.perf_counter() - started)
+    
+    def find_wikimedia_image():
+        if wikimedia_urls is not None and word in wikimedia_urls:
+            return wikimedia_urls[word]
+        return find_image('wikimedia', search_wikimedia_image)
     
     try:
         logger.info(f"Searching for free image for word: '{word}' (force_regenerate={force_regenerate})")
         
         # When regenerating, prefer Unsplash with randomization for variety
-        # Otherwise, try Wikimedia first (free, no API key needed)
-        if force_regenerate:
+        # Otherwise, try Wikimedia first (free, no API key needed).
+        # With hedging, the other source is also queried if the preferred one is slow
+        answered_by_batch = not force_regenerate and wikimedia_urls is not None and word in wikimedia_urls
+        if hedged_lookup is not None and UNSPLASH_ACCESS_KEY and not answered_by_batch:
+            unsplash = ('unsplash', lambda: find_image('unsplash', search_unsplash_image, force_regenerate))
+            wikimedia = ('wikimedia', find_wikimedia_image)
+            if force_regenerate:
+                image_url, source = hedged_lookup.run(unsplash, wikimedia)
+            else:
+                image_url, source = hedged_lookup.run(wikimedia, unsplash)
+        elif force_regenerate:
             logger.info(f"Force regenerate: trying Unsplash with random selection for '{word}'")
-            image_url = search_unsplash_image(word, random_page=True)
+            image_url = find_image('unsplash', search_unsplash_image, True)
+            source = 'unsplash'
             
             # If Unsplash fails, fall back to Wikimedia
             if not image_url:
                 logger.info(f"Unsplash failed, trying Wikimedia for '{word}'")
-                image_url = search_wikimedia_image(word)
+                image_url = find_wikimedia_image()
+                source = 'wikimedia'
         else:
             # Normal flow: Wikimedia first, then Unsplash
-            image_url = search_wikimedia_image(word)
+            image_url = find_wikimedia_image()
+            source = 'wikimedia'
             
             if not image_url:
                 logger.info(f"Trying Unsplash fallback for '{word}'")
-                image_url = search_unsplash_image(word, random_page=False)
+                image_url = find_image('unsplash', search_unsplash_image, False)
+                source = 'unsplash'
         
         # If we found an image URL, download it
         if image_url:
-            if download_image(image_url, image_path):
-                return f"vocab_images/{image_path.name}"
+            resolution_cache.put(word, image_url, source)
+            
+            started = time.perf_counter()
+            blob_path = download_image(image_url, image_path.name, source, deadline)
+            timings.add('download', time.perf_counter() - started)
+            if blob_path:
+                timings.source = source
+                ingest_image(blob_path)
+                return get_image_url_path(image_path.name, blob_path)
             else:
                 logger.error(f"Failed to download image for '{word}'")
                 return None
         else:
+            if not lookup_failed:
+                resolution_cache.put(word, None, None)
             logger.warning(f"No free image found for '{word}'")
             return None
         
@@ -261,17 +3412,602 @@ def search_and_save_image(word: str, force_regenerate: bool = False) -> Optional
         return None
 
 
-def generate_vocabulary_list(theme: str, num_words: int) -> List[Dict]:
+class ImageBatchResolver:
     """
-    Generate a vocabulary list using OpenAI.
+    Resolves images for words that may arrive over time (e.g. from a streamed
+    completion) on the shared image worker pool.
+    Words missing locally are looked up on Wikimedia in batches: a lookup starts
+    as soon as the first word arrives, and words arriving while it is in flight
+    are grouped into the next one. Downloads (and Unsplash fallbacks for misses)
+    then run in parallel, and each finished word is put on the results queue as
+    ('image', image name, relative image path or None).
+    
+    Args:
+        results: Queue receiving one tuple per unique image name
+        force_regenerate: If True, re-download even if images exist
+        deadline: Optional time.monotonic() value lookups must finish by; it
+            applies to words submitted while it is set
+        timings: Optional StageTimings for the request, receiving the
+            Wikimedia batch lookup durations; each word's own lookups are
+            recorded in word_timings (keyed by image name)
+    """
+    
+    def __init__(self, results: queue.Queue, force_regenerate: bool = False, deadline: Optional[float] = None,
+                 timings: Optional[StageTimings] = None):
+        self.results = results
+        self.force_regenerate = force_regenerate
+        self.deadline = deadline
+        self.timings = timings if timings is not None else StageTimings()
+        self.word_timings: Dict[str, StageTimings] = {}
+        self.submitted = 0
+        self._lock = threading.Lock()
+        self._words: Dict[str, str] = {}
+        self._pending: List[Tuple[str, str]] = []
+        self._batch_running = False
+    
+    def add(self, words: List[str]) -> List[str]:
+        """
+        Start resolving images for words.
+        
+        Returns:
+            The image name of each word; words mapping to the same file share
+            one name and are only fetched once
+        """
+        names = []
+        with self._lock:
+            for word in words:
+                name = get_image_path(word).name
+                names.append(name)
+                if name in self._words:
+                    continue
+                self._words[name] = word
+                self.word_timings[name] = StageTimings()
+                self.submitted += 1
+                
+                # Regeneration prefers Unsplash, and words already on disk or in
+                # the resolution cache don't need a Wikimedia lookup
+                if self.force_regenerate or image_exists(word) or resolution_cache.contains(word):
+                    self._submit(name, word, None)
+                else:
+                    self._pending.append((name, word))
+            
+            if self._pending and not self._batch_running:
+                self._start_batch()
+        return names
+    
+    def retry(self, name: str):
+        """Resolve an image name's word again; its result is put on the queue like any other."""
+        with self._lock:
+            self.submitted += 1
+            self._submit(name, self._words[name], None)
+    
+    def _start_batch(self):
+        batch, self._pending = self._pending, []
+        self._batch_running = True
+        image_executor.submit(self._run_batch, batch)
+    
+    def _run_batch(self, batch: List[Tuple[str, str]]):
+        wikimedia_urls = None
+        started = time.perf_counter()
+        try:
+            wikimedia_urls = search_wikimedia_images([word for _, word in batch], self.deadline)
+        except Exception as e:
+            logger.error(f"Error in Wikimedia batch lookup: {str(e)}")
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings.add('wikimediaBatch', elapsed)
+            for name, word in batch:
+                self.word_timings[name].add('wikimediaBatch', elapsed)
+            for name, word in batch:
+                self._submit(name, word, wikimedia_urls)
+            with self._lock:
+                if self._pending:
+                    self._start_batch()
+                else:
+                    self._batch_running = False
+    
+    def _submit(self, name: str, word: str, wikimedia_urls: Optional[Dict[str, Optional[str]]]):
+        future = image_executor.submit(self._resolve, name, word, wikimedia_urls, self.deadline, time.perf_counter())
+        future.add_done_callback(
+            lambda f: self.results.put(('image', name, None if f.exception() else f.result()))
+        )
+    
+    def _resolve(self, name: str, word: str, wikimedia_urls: Optional[Dict[str, Optional[str]]],
+                 deadline: Optional[float], submitted_at: float) -> Optional[str]:
+        timings = self.word_timings[name]
+        timings.add('queued', time.perf_counter() - submitted_at)
+        return search_and_save_image(word, self.force_regenerate, wikimedia_urls, deadline, timings)
+
+
+def iter_resolved_images(words: List[str], force_regenerate: bool = False) -> Iterator[Tuple[int, Optional[str]]]:
+    """
+    Search for and download images for several words concurrently.
+    Wikimedia is queried for all missing words in one batch up front, then the
+    downloads (and Unsplash fallbacks for misses) are spread over the shared
+    image worker pool (IMAGE_WORKERS threads).
+    
+    Args:
+        words: The vocabulary words to find images for
+        force_regenerate: If True, re-download even if images exist
+        
+    Yields:
+        (index into words, relative image path or None) as each image finishes
+    """
+    results = queue.Queue()
+    resolver = ImageBatchResolver(results, force_regenerate)
+    
+    indices = {}
+    for index, name in enumerate(resolver.add(words)):
+        indices.setdefault(name, []).append(index)
+    
+    for _ in range(resolver.submitted):
+        _, name, image_path = results.get()
+        for index in indices[name]:
+            yield index, image_path
+
+
+def resolve_images(words: List[str], force_regenerate: bool = False) -> List[Optional[str]]:
+    """
+    Search for and download images for several words concurrently.
+    
+    Args:
+        words: The vocabulary words to find images for
+        force_regenerate: If True, re-download even if images exist
+        
+    Returns:
+        Relative image paths in the same order as words (None where no image was saved)
+    """
+    image_paths = [None] * len(words)
+    for index, image_path in iter_resolved_images(words, force_regenerate):
+        image_paths[index] = image_path
+    return image_paths
+
+
+def new_vocab_item(word: str, definition: str) -> Dict:
+    """
+    Create a vocabulary item for a response, without an image yet.
+    
+    Args:
+        word: The vocabulary word
+        definition: The word's definition
+        
+    Returns:
+        Vocabulary item dictionary
+    """
+    # Generate unique ID
+    vocab_id = hashlib.md5(f"{word}{datetime.now().isoformat()}".encode()).hexdigest()[:8]
+    
+    return {
+        'id': vocab_id,
+        'type': 'vocab',
+        'word': word,
+        'definition': definition,
+        'image': '',
+        'imageUrl': '',  # Also include imageUrl for frontend compatibility
+        'imageGenerated': False
+    }
+
+
+def iter_vocab_events(vocab_items: Iterable[Dict], force_regenerate: bool = False,
+                      deadline: Optional[float] = None, timings: Optional[StageTimings] = None,
+                      debug: bool = False) -> Iterator[Dict]:
+    """
+    Build vocabulary items and resolve their images while the word list is
+    still being generated: each word's image search starts as soon as the word
+    arrives, overlapping with generation of the rest of the list.
+    
+    If the deadline passes first, the events end early with the words received
+    so far; items whose images hadn't resolved keep imageGenerated false, and
+    the rest of the work finishes in the background (see fill_in_vocab_images())
+    so a repeated request is answered from the caches.
+    
+    Args:
+        vocab_items: Word/definition dictionaries, e.g. from iter_vocabulary_list()
+        force_regenerate: If True, re-download even if images exist
+        deadline: Optional time.monotonic() value to stop waiting at
+        timings: Optional StageTimings for the request, receiving firstWord,
+            vocabulary (time until the list was complete), images (time from
+            the first word to the last image) and the summed per-stage
+            durations of the image lookups
+        debug: If True, resolved items carry their own "timings" and the
+            summary carries the request's
+        
+    Yields:
+        Progress events: a 'word' event per item as it arrives, one 'vocabulary'
+        event with every item once the list is complete (or the deadline
+        passed), an 'image' event per item as its image resolves (or fails),
+        and a final 'summary' event with the counts
+        
+    Raises:
+        DeadlineExceeded: If the deadline passed before any word arrived
+    """
+    if timings is None:
+        timings = StageTimings()
+    started = time.perf_counter()
+    first_word_at = None
+    last_image_at = None
+    
+    events = queue.Queue()
+    resolver = ImageBatchResolver(events, force_regenerate, deadline, timings)
+    
+    # Read the word list on its own thread so image results can be reported
+    # while the completion is still streaming. If our consumer goes away the
+    # reader still finishes, so the list gets cached for the next request.
+    def read_vocabulary():
+        try:
+            for vocab in vocab_items:
+                events.put(('word', vocab, None))
+            events.put(('done', None, None))
+        except Exception as e:
+            events.put(('error', e, None))
+    
+    threading.Thread(target=read_vocabulary, name='vocab-reader', daemon=True).start()
+    
+    items = []
+    indices = {}
+    resolved = {}
+    words_done = False
+    images_received = 0
+    images_generated = 0
+    images_failed = 0
+    deadline_exceeded = False
+    
+    while not words_done or images_received < resolver.submitted:
+        try:
+            kind, value, image_path = events.get(timeout=max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+        except queue.Empty:
+            deadline_exceeded = True
+            break
+        
+        if kind == 'error':
+            raise value
+        
+        if kind == 'done':
+            words_done = True
+            timings.add('vocabulary', time.perf_counter() - started)
+            yield {'event': 'vocabulary', 'vocabulary': [dict(item) for item in items], 'count': len(items)}
+            continue
+        
+        if kind == 'word':
+            if not value.get('word', ''):
+                logger.warning("Skipping vocabulary item with no word")
+                continue
+            
+            if first_word_at is None:
+                first_word_at = time.perf_counter()
+                timings.add('firstWord', first_word_at - started)
+            
+            index = len(items)
+            items.append(new_vocab_item(value['word'], value.get('definition', '')))
+            name = resolver.add([value['word']])[0]
+            indices.setdefault(name, []).append(index)
+            yield {'event': 'word', 'index': index, 'item': dict(items[index])}
+            
+            # A repeated word whose image already finished
+            if name not in resolved:
+                continue
+            finished = [index]
+            image_path = resolved[name]
+        else:
+            images_received += 1
+            last_image_at = time.perf_counter()
+            name = value
+            resolved[name] = image_path
+            finished = indices[name]
+            timings.merge(resolver.word_timings[name], ('wikimedia', 'unsplash', 'download'))
+        
+        for index in finished:
+            item = items[index]
+            if debug:
+                item['timings'] = resolver.word_timings[name].as_dict()
+            if image_path:
+                images_generated += 1
+                # Convert relative path to full URL
+                image_url = f"http://localhost:{PORT}/{image_path}"
+                item.update({'image': image_url, 'imageUrl': image_url, 'imageGenerated': True})
+            else:
+                images_failed += 1
+            
+            yield {'event': 'image', 'index': index, 'item': dict(item)}
+    
+    images_pending = 0
+    if deadline_exceeded:
+        images_pending = sum(len(indices[name]) for name in indices if name not in resolved)
+        logger.warning(f"Request deadline exceeded with {len(items)} words ({images_pending} images pending"
+                       f"{', list incomplete' if not words_done else ''}); finishing in the background")
+        fill_in_vocab_images(events, resolver, words_done, images_received)
+        
+        if not items:
+            raise DeadlineExceeded()
+        if not words_done:
+            yield {'event': 'vocabulary', 'vocabulary': [dict(item) for item in items], 'count': len(items)}
+    
+    if last_image_at is not None:
+        timings.add('images', last_image_at - first_word_at)
+    
+    logger.info(f"Vocabulary generation complete: {len(items)} words, {images_generated} images generated, {images_failed} images failed")
+    
+    summary = {
+        'event': 'summary',
+        'success': True,
+        'count': len(items),
+        'imagesGenerated': images_generated,
+        'imagesFailed': images_failed,
+        'imagesPending': images_pending,
+        'deadlineExceeded': deadline_exceeded
+    }
+    if debug:
+        summary['timings'] = timings.as_dict()
+    yield summary
+
+
+def fill_in_vocab_images(events: queue.Queue, resolver: ImageBatchResolver, words_done: bool, images_received: int):
+    """
+    Carry on with a vocabulary request whose deadline passed, on a background
+    thread: words still arriving get their images resolved and stored, and
+    images that came back empty after the deadline are tried once more
+    without one. The word list is cached by its reader as usual.
+    
+    Args:
+        events: The request's event queue
+        resolver: The request's ImageBatchResolver
+        words_done: Whether the word list had finished
+        images_received: Image results already consumed from the queue
+    """
+    resolver.deadline = None
+    
+    def run():
+        nonlocal words_done, images_received
+        retried = set()
+        stored = 0
+        
+        try:
+            while not words_done or images_received < resolver.submitted:
+                kind, value, image_path = events.get()
+                
+                if kind == 'error':
+                    break
+                if kind == 'done':
+                    words_done = True
+                elif kind == 'word':
+                    if value.get('word', ''):
+                        resolver.add([value['word']])
+                else:
+                    images_received += 1
+                    if image_path:
+                        stored += 1
+                    elif value not in retried:
+                        retried.add(value)
+                        resolver.retry(value)
+        except RuntimeError:
+            # The image worker pool has shut down because the process is exiting
+            return
+        
+        logger.info(f"Background fill-in finished: {stored} images stored, {len(retried)} retried")
+    
+    threading.Thread(target=run, name='vocab-fill-in', daemon=True).start()
+
+
+class VocabularyStreamParser:
+    """
+    Incremental parser for a streamed JSON array of vocabulary objects.
+    Feed it completion text as it arrives; every object is returned as soon
+    as its closing brace is seen. Text before the array (such as a markdown
+    code fence) and after it is ignored, and a trailing object cut off by the
+    token limit is dropped instead of failing the whole list.
+    """
+    
+    def __init__(self):
+        self.items_parsed = 0
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._seen_text = False
+        self._current: List[str] = []
+    
+    def feed(self, text: str) -> List[Dict]:
+        """
+        Parse the next chunk of completion text.
+        
+        Returns:
+            Objects completed by this chunk
+        
+        Raises:
+            ValueError: If the response turns out to be an object rather than an array
+        """
+        items = []
+        
+        for char in text:
+            if self._finished:
+                break
+            
+            if not char.isspace():
+                self._seen_text = True
+            
+            if not self._started:
+                if char == '[':
+                    self._started = True
+                    self._depth = 1
+                elif char == '{':
+                    raise ValueError('Response is not an array')
+                continue
+            
+            if self._depth >= 2:
+                self._current.append(char)
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 1 and char == '{':
+                    self._current = [char]
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 1 and char == '}':
+                    item = self._parse_current()
+                    if item is not None:
+                        items.append(item)
+                elif self._depth == 0:
+                    self._finished = True
+        
+        return items
+    
+    def _parse_current(self) -> Optional[Dict]:
+        text = ''.join(self._current)
+        self._current = []
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping unparseable vocabulary item: {e}")
+            return None
+        if not isinstance(item, dict):
+            return None
+        self.items_parsed += 1
+        return item
+    
+    def finish(self):
+        """
+        Signal the end of the completion.
+        
+        Raises:
+            ValueError: If the completion was empty or contained no JSON array
+        """
+        if not self._seen_text:
+            raise ValueError('Empty response from OpenAI')
+        if not self._started:
+            raise ValueError('Invalid JSON response from AI')
+        if not self._finished:
+            logger.warning(f"Vocabulary response was truncated; keeping {self.items_parsed} complete words")
+
+
+def generate_vocabulary_list(theme: str, num_words: int, use_cache: bool = True,
+                             deadline: Optional[float] = None) -> List[Dict]:
+    """
+    Get a vocabulary list for a theme, from the cache when possible.
+    Concurrent identical requests share a single OpenAI completion.
     
     Args:
         theme: The theme for vocabulary words
         num_words: Number of words to generate
+        use_cache: If False, always ask OpenAI for a fresh list (for variety)
+        deadline: Optional time.monotonic() value bounding the OpenAI call
         
     Returns:
         List of vocabulary dictionaries
     """
+    return list(iter_vocabulary_list(theme, num_words, use_cache, deadline))
+
+
+def iter_vocabulary_list(theme: str, num_words: int, use_cache: bool = True,
+                         deadline: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Get a vocabulary list for a theme word by word.
+    Cached lists are returned immediately; otherwise words are yielded as the
+    OpenAI completion streams in. Concurrent identical requests share a single
+    completion (callers joining an in-flight one get the words once it finishes).
+    A shared completion runs with the full OPENAI_TIMEOUT, whatever the
+    deadline of the request that started it; each caller only stops waiting
+    at its own deadline.
+    
+    Args:
+        theme: The theme for vocabulary words
+        num_words: Number of words to generate
+        use_cache: If False, always ask OpenAI for a fresh list (for variety);
+            the completion isn't shared then, and the deadline bounds it
+        deadline: Optional time.monotonic() value to stop waiting at
+        
+    Yields:
+        Vocabulary dictionaries
+        
+    Raises:
+        DeadlineExceeded: If the deadline passed while waiting for an
+            in-flight completion started by another request
+    """
+    if use_cache:
+        cached = vocab_list_cache.get(theme, num_words)
+        if cached is not None:
+            logger.info(f"Using cached vocabulary list for theme '{theme}' ({num_words} words)")
+            yield from cached
+            return
+    
+    key = (VocabularyListCache.normalize_theme(theme), num_words)
+    
+    if use_cache:
+        future, leader = vocab_list_flight.join(key)
+        if not leader:
+            logger.info(f"Waiting for in-flight vocabulary list for theme '{theme}' ({num_words} words)")
+            try:
+                vocab_list = future.result(timeout=max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+            except FutureTimeoutError:
+                raise DeadlineExceeded()
+            for vocab in vocab_list:
+                yield dict(vocab)
+            return
+        
+        # Another request may have filled the cache just before we became the leader
+        cached = vocab_list_cache.get(theme, num_words, record_stats=False)
+        if cached is not None:
+            vocab_list_flight.complete(key, cached)
+            yield from cached
+            return
+    
+    vocab_list = []
+    # Other requests may be waiting for this completion, so only an unshared
+    # one is cut short by our deadline
+    words = stream_vocabulary_list(theme, num_words, None if use_cache else deadline)
+    try:
+        for vocab in words:
+            vocab_list.append(vocab)
+            yield dict(vocab)
+    except GeneratorExit:
+        # Our caller stopped early; finish the list anyway for the cache and any waiters
+        try:
+            vocab_list.extend(words)
+        except Exception as e:
+            if use_cache:
+                vocab_list_flight.complete(key, exception=e)
+            raise GeneratorExit
+        vocab_list_cache.put(theme, num_words, vocab_list)
+        if use_cache:
+            vocab_list_flight.complete(key, vocab_list)
+        raise
+    except BaseException as e:
+        if use_cache:
+            vocab_list_flight.complete(key, exception=e)
+        raise
+    
+    vocab_list_cache.put(theme, num_words, vocab_list)
+    if use_cache:
+        vocab_list_flight.complete(key, vocab_list)
+
+
+def stream_vocabulary_list(theme: str, num_words: int, deadline: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Generate a vocabulary list using OpenAI.
+    The completion is streamed and parsed incrementally, so each word is
+    yielded as soon as its JSON object is complete.
+    
+    Args:
+        theme: The theme for vocabulary words
+        num_words: Number of words to generate
+        deadline: Optional time.monotonic() value; the OpenAI timeout is cut to
+            the time left (it bounds the connection and each read, so a
+            completion that is streaming keeps going for the cache)
+        
+    Yields:
+        Vocabulary dictionaries
+    """
     system_prompt = """You are an expert vocabulary educator. Generate vocabulary words with clear, concise definitions.
 
 Return ONLY a valid JSON array of vocabulary objects. Each object should have:
@@ -294,10 +4030,14 @@ Example format:
   }}
 ]"""
 
+    started = time.perf_counter()
     try:
         logger.info(f"Generating {num_words} vocabulary words for theme: '{theme}'")
         
-        completion = openai_client.chat.completions.create(
+        if openai_client is None:
+            raise ValueError('OPENAI_API_KEY is not configured')
+        
+        stream = openai_client.chat.completions.create(
             model='gpt-4o-mini',
             messages=[
                 {'role': 'system', 'content': system_prompt},
@@ -305,45 +4045,639 @@ Example format:
             ],
             temperature=0.7,
             max_tokens=2000,
+            stream=True,
+            timeout=time_left(deadline, OPENAI_TIMEOUT),
         )
         
-        response_text = completion.choices[0].message.content.strip()
-        
-        if not response_text:
-            raise ValueError('Empty response from OpenAI')
+        # Parse the JSON array incrementally as tokens arrive
+        parser = VocabularyStreamParser()
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield from parser.feed(text)
         
-        # Parse JSON response
-        vocab_list = json.loads(response_text)
+        parser.finish()
         
-        if not isinstance(vocab_list, list):
-            raise ValueError('Response is not an array')
+        if parser.items_parsed == 0:
+            raise ValueError('Empty response from OpenAI')
         
-        logger.info(f"Successfully generated {len(vocab_list)} vocabulary words")
-        return vocab_list
+        logger.info(f"Successfully generated {parser.items_parsed} vocabulary words")
         
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse OpenAI response: {e}")
-        raise ValueError('Invalid JSON response from AI')
     except Exception as e:
         logger.error(f"Error generating vocabulary: {str(e)}")
+        stage_errors.inc('openai')
         raise
+    finally:
+        stage_duration.observe(time.perf_counter() - started, 'openai')
+
+
+class VocabJobStore:
+    """
+    Runs vocabulary generations in the background for the job API.
+    Jobs run on their own worker pool (not Flask request threads), at most
+    max_active jobs may be queued or running at once, and finished jobs are
+    kept for retention seconds so clients can collect the results.
+    
+    Args:
+        workers: Number of jobs processed at the same time
+        max_active: Maximum queued + running jobs
+        retention: Seconds a finished job stays available
+    """
+    
+    def __init__(self, workers: int, max_active: int, retention: int):
+        self.max_active = max_active
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vocab-job')
+    
+    def _purge_expired(self):
+        # Caller holds the lock
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, finished in self._finished_at.items() if finished < cutoff]:
+            del self._jobs[job_id]
+            del self._finished_at[job_id]
+    
+    def _active_count(self) -> int:
+        return len(self._jobs) - len(self._finished_at)
+    
+    @staticmethod
+    def _snapshot(job: Dict) -> Dict:
+        snapshot = dict(job)
+        snapshot['progress'] = dict(job['progress'])
+        snapshot['vocabulary'] = [dict(item) for item in job['vocabulary']]
+        return snapshot
+    
+    def submit(self, theme: str, num_words: int, force_regenerate: bool = False,
+               use_cache: bool = True) -> Optional[Dict]:
+        """
+        Queue a vocabulary generation.
+        
+        Returns:
+            Snapshot of the new job, or None if too many jobs are already active
+        """
+        with self._lock:
+            self._purge_expired()
+            if self._active_count() >= self.max_active:
+                return None
+            
+            job_id = uuid.uuid4().hex
+            job = {
+                'id': job_id,
+                'status': 'queued',
+                'theme': theme,
+                'numWords': num_words,
+                'createdAt': datetime.now().isoformat(),
+                'startedAt': None,
+                'finishedAt': None,
+                'progress': {'wordsGenerated': 0, 'imagesResolved': 0, 'listComplete': False},
+                'vocabulary': [],
+                'count': 0,
+                'imagesGenerated': 0,
+                'imagesFailed': 0,
+                'error': None
+            }
+            self._jobs[job_id] = job
+            snapshot = self._snapshot(job)
+        
+        self._executor.submit(self._run, job_id, theme, num_words, force_regenerate, use_cache)
+        return snapshot
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a snapshot of a job, or None if it doesn't exist or has expired."""
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+    
+    def _run(self, job_id: str, theme: str, num_words: int, force_regenerate: bool, use_cache: bool):
+        with self._lock:
+            job = self._jobs[job_id]
+            job['status'] = 'running'
+            job['startedAt'] = datetime.now().isoformat()
+        
+        logger.info(f"Job {job_id} started: theme='{theme}', numWords={num_words}")
+        
+        try:
+            vocab_items = iter_vocabulary_list(theme, num_words, use_cache=use_cache)
+            for event in iter_vocab_events(vocab_items, force_regenerate):
+                with self._lock:
+                    if event['event'] == 'word':
+                        job['vocabulary'].append(event['item'])
+                        job['progress']['wordsGenerated'] += 1
+                    elif event['event'] == 'vocabulary':
+                        job['progress']['listComplete'] = True
+                    elif event['event'] == 'image':
+                        job['vocabulary'][event['index']] = event['item']
+                        job['progress']['imagesResolved'] += 1
+                        job['imagesGenerated'] += 1 if event['item']['imageGenerated'] else 0
+                        job['imagesFailed'] += 0 if event['item']['imageGenerated'] else 1
+                    elif event['event'] == 'summary':
+                        job['count'] = event['count']
+            
+            status, error = 'completed', None
+            logger.info(f"Job {job_id} completed")
+        except ValueError as e:
+            status, error = 'failed', str(e)
+            logger.error(f"Job {job_id} failed: {error}")
+        except Exception as e:
+            status, error = 'failed', 'Failed to generate vocabulary. Please try again.'
+            logger.error(f"Job {job_id} failed: {str(e)}")
+        
+        with self._lock:
+            job['status'] = status
+            job['error'] = error
+            job['count'] = len(job['vocabulary'])
+            job['finishedAt'] = datetime.now().isoformat()
+            self._finished_at[job_id] = time.time()
+    
+    def stats(self) -> Dict:
+        """Counts of active and retained jobs."""
+        with self._lock:
+            self._purge_expired()
+            return {'active': self._active_count(), 'finished': len(self._finished_at)}
+
+
+vocab_jobs = VocabJobStore(JOB_WORKERS, JOB_MAX_ACTIVE, JOB_RETENTION_SECONDS)
+
+
+def validate_vocab_request(data: Optional[Dict]) -> Optional[str]:
+    """
+    Validate a /generate_vocab style request body.
+    
+    Args:
+        data: The parsed JSON body
+        
+    Returns:
+        An error message, or None if the request is valid
+    """
+    if not data:
+        return 'No JSON data provided'
+    
+    if not data.get('theme'):
+        return 'Missing required field: theme'
+    
+    num_words = data.get('numWords')
+    
+    if not num_words:
+        return 'Missing required field: numWords'
+    
+    if not isinstance(num_words, int) or num_words < 1 or num_words > MAX_WORDS:
+        return f'numWords must be between 1 and {MAX_WORDS}'
+    
+    timeout_ms = data.get('timeoutMs')
+    if timeout_ms is not None and (isinstance(timeout_ms, bool) or not isinstance(timeout_ms, (int, float)) or timeout_ms <= 0):
+        return 'timeoutMs must be a positive number of milliseconds'
+    
+    return None
+
+
+def get_request_deadline(data: Optional[Dict], use_default: bool = True) -> Optional[float]:
+    """
+    Work out when a synchronous request must be answered by: the client's
+    "timeoutMs" if it sent a valid one (capped at MAX_REQUEST_DEADLINE),
+    otherwise REQUEST_DEADLINE seconds from now.
+    
+    Args:
+        data: The parsed JSON body
+        use_default: If False, only a client's "timeoutMs" sets a deadline
+        
+    Returns:
+        A time.monotonic() value, or None if the request has no deadline
+    """
+    timeout_ms = (data or {}).get('timeoutMs')
+    if isinstance(timeout_ms, (int, float)) and not isinstance(timeout_ms, bool) and timeout_ms > 0:
+        return time.monotonic() + min(timeout_ms / 1000, MAX_REQUEST_DEADLINE)
+    if use_default and REQUEST_DEADLINE > 0:
+        return time.monotonic() + REQUEST_DEADLINE
+    return None
+
+
+def timing_headers(timings: StageTimings) -> Dict[str, str]:
+    """
+    Response headers exposing a request's stage durations to the browser's
+    devtools (Timing-Allow-Origin lets the frontend, served from another
+    origin, read them too).
+    
+    Args:
+        timings: The request's StageTimings
+        
+    Returns:
+        Server-Timing and Timing-Allow-Origin headers
+    """
+    return {'Server-Timing': timings.server_timing(), 'Timing-Allow-Origin': '*'}
+
+
+STREAM_MIMETYPES = ('application/x-ndjson', 'text/event-stream')
+
+
+def get_stream_mimetype() -> Optional[str]:
+    """
+    Check whether the client asked for a streamed response.
+    
+    Returns:
+        The streaming mimetype preferred by the Accept header, or None for plain JSON
+    """
+    best = request.accept_mimetypes.best_match(('application/json',) + STREAM_MIMETYPES)
+    return best if best in STREAM_MIMETYPES else None
+
+
+def format_stream_event(event: Dict, mimetype: str) -> str:
+    """
+    Serialize a progress event for a streamed response.
+    
+    Args:
+        event: Event dictionary with an 'event' name
+        mimetype: 'application/x-ndjson' or 'text/event-stream'
+        
+    Returns:
+        The event as an NDJSON line or a server-sent event
+    """
+    if mimetype == 'text/event-stream':
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + '\n'
+
+
+def stream_events(events: Iterator[Dict], mimetype: str, error_message: str) -> Iterator[str]:
+    """
+    Serialize progress events for a streamed response.
+    The HTTP status is already sent once streaming starts, so failures are
+    reported as a final 'error' event instead.
+    """
+    try:
+        for event in events:
+            yield format_stream_event(event, mimetype)
+    except Exception as e:
+        logger.error(f"Error while streaming response: {str(e)}")
+        yield format_stream_event({'event': 'error', 'error': error_message}, mimetype)
+
+
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight and note when it started."""
+    g.request_started = time.perf_counter()
+    http_requests_in_flight.inc()
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    """Count the request by endpoint and status, and record how long it took."""
+    endpoint = request.endpoint or 'unmatched'
+    http_requests.inc(endpoint, request.method, str(response.status_code))
+    if response.status_code >= 500:
+        http_request_errors.inc(endpoint)
+    
+    started = g.get('request_started')
+    if started is not None:
+        http_request_duration.observe(time.perf_counter() - started, endpoint)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error):
+    """Take the request out of the in-flight count."""
+    if g.pop('request_started', None) is not None:
+        http_requests_in_flight.dec()
+
+
+def collect_cache_metrics() -> List[Metric]:
+    """Hit/miss counters and sizes of the resolution, vocabulary list and hot image caches."""
+    hits = Counter('vocab_cache_hits_total', 'Cache lookups answered from the cache', ('cache',))
+    misses = Counter('vocab_cache_misses_total', 'Cache lookups that missed', ('cache',))
+    entries = Gauge('vocab_cache_entries', 'Entries in each cache', ('cache',))
+    
+    resolution = resolution_cache.stats()
+    hits.inc('resolution', amount=resolution['hits'] + resolution['negative_hits'])
+    misses.inc('resolution', amount=resolution['misses'])
+    entries.set('resolution', value=resolution['entries'])
+    
+    vocabulary = vocab_list_cache.stats()
+    hits.inc('vocabulary', amount=vocabulary['hits'])
+    misses.inc('vocabulary', amount=vocabulary['misses'])
+    entries.set('vocabulary', value=vocabulary['entries'])
+    
+    hot = hot_image_cache.stats()
+    hits.inc('hot_image', amount=hot['hits'])
+    misses.inc('hot_image', amount=hot['misses'])
+    entries.set('hot_image', value=hot['entries'])
+    hot_bytes = Gauge('vocab_hot_image_cache_bytes', 'Bytes held by the in-memory image cache')
+    hot_bytes.set(value=hot['bytes'])
+    
+    return [hits, misses, entries, hot_bytes]
+
+
+def collect_image_store_metrics() -> List[Metric]:
+    """Stored image counts and sizes, manifest rebuilds and eviction counters."""
+    store = image_store.stats()
+    eviction = image_evictor.stats()
+    
+    images = Gauge('vocab_image_store_images', 'Word filenames with a stored image')
+    images.set(value=store['names'])
+    blobs = Gauge('vocab_image_store_blobs', 'Distinct stored image files')
+    blobs.set(value=store['blobs'])
+    used = Gauge('vocab_image_store_bytes', 'Bytes used by stored images and their renditions')
+    used.set(value=store['bytes'])
+    budget = Gauge('vocab_image_store_max_bytes', 'Disk budget for stored images (0 = unlimited)')
+    budget.set(value=eviction['max_bytes'])
+    rebuilds = Counter('vocab_image_manifest_rebuilds_total', 'Full rebuilds of the in-memory image manifest')
+    rebuilds.inc(amount=store['rebuilds'])
+    
+    removed = Counter('vocab_image_files_removed_total', 'Files removed by the background evictor', ('reason',))
+    removed.inc('evicted', amount=eviction['evicted_files'])
+    removed.inc('orphan', amount=eviction['orphans_removed'])
+    removed.inc('partial', amount=eviction['partials_removed'])
+    evicted_bytes = Counter('vocab_image_evicted_bytes_total', 'Bytes freed by evicting images over budget')
+    evicted_bytes.inc(amount=eviction['evicted_bytes'])
+    
+    jobs = Gauge('vocab_jobs_active', 'Vocabulary jobs queued or running')
+    jobs.set(value=vocab_jobs.stats()['active'])
+    
+    return [images, blobs, used, budget, rebuilds, removed, evicted_bytes, jobs]
+
+
+def collect_upstream_metrics() -> List[Metric]:
+    """Rate limiter state per upstream host, circuit breakers and hedging counters."""
+    requests_total = Counter('vocab_upstream_requests_total', 'Requests sent to each upstream host', ('host',))
+    throttled = Counter('vocab_upstream_throttled_total', 'HTTP 429/503 responses from each upstream host', ('host',))
+    errors = Counter('vocab_upstream_errors_total', 'Failed requests (5xx or no response) per upstream host', ('host',))
+    rejected = Counter('vocab_upstream_rate_limited_total', 'Requests refused by the local rate limiter', ('host',))
+    in_flight = Gauge('vocab_upstream_in_flight', 'Requests in progress per upstream host', ('host',))
+    concurrency = Gauge('vocab_upstream_concurrency_limit', 'Adaptive concurrency limit per upstream host', ('host',))
+    
+    for host, limiter in upstream_http.limiter_stats().items():
+        requests_total.inc(host, amount=limiter['requests'])
+        throttled.inc(host, amount=limiter['throttled'])
+        errors.inc(host, amount=limiter['errors'])
+        rejected.inc(host, amount=limiter['rejected'])
+        in_flight.set(host, value=limiter['in_flight'])
+        concurrency.set(host, value=limiter['concurrency_limit'])
+    
+    circuit_open = Gauge('vocab_image_source_circuit_open', 'Whether an image source is being skipped (1 = open)', ('source',))
+    source_failures = Counter('vocab_image_source_failures_total', 'Failed lookups per image source', ('source',))
+    for source, breaker in source_breakers.items():
+        breaker_stats = breaker.stats()
+        circuit_open.set(source, value=1 if breaker_stats['state'] == 'open' else 0)
+        source_failures.inc(source, amount=breaker_stats['failures'])
+    
+    collected = [requests_total, throttled, errors, rejected, in_flight, concurrency, circuit_open, source_failures]
+    
+    if hedged_lookup is not None:
+        hedging = hedged_lookup.stats()
+        hedges = Counter('vocab_hedged_lookups_total', 'Image lookups by whether the fallback source was also queried', ('hedged',))
+        hedges.inc('false', amount=hedging['lookups'] - hedging['hedged'])
+        hedges.inc('true', amount=hedging['hedged'])
+        wins = Counter('vocab_hedged_fallback_wins_total', 'Hedged lookups answered first by the fallback source')
+        wins.inc(amount=hedging['fallback_wins'])
+        collected.extend([hedges, wins])
+    
+    return collected
+
+
+metrics.add_collector(collect_cache_metrics)
+metrics.add_collector(collect_image_store_metrics)
+metrics.add_collector(collect_upstream_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics (text exposition format)."""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
+    image_store_stats = image_store.stats()
     return jsonify({
         'status': 'OK',
         'message': 'Vocabulary Generator Server is running',
         'images_directory': str(VOCAB_IMAGES_DIR),
-        'images_count': len(list(VOCAB_IMAGES_DIR.glob('*.png')))
+        'images_count': image_store_stats['names'],
+        'image_store': image_store_stats,
+        'eviction': image_evictor.stats(),
+        'hot_image_cache': hot_image_cache.stats(),
+        'upstreams': upstream_http.limiter_stats(),
+        'image_sources': {source: breaker.stats() for source, breaker in source_breakers.items()},
+        'hedging': hedged_lookup.stats() if hedged_lookup is not None else None,
+        'cassette': upstream_cassette.stats() if upstream_cassette is not None else None,
+        'resolution_cache': resolution_cache.stats(),
+        'vocabulary_cache': vocab_list_cache.stats(),
+        'jobs': vocab_jobs.stats()
     })
 
 
+def choose_rendition_width() -> Optional[int]:
+    """
+    Pick the rendition width for an image request.
+    An explicit ?w= (or ?width=) selects the smallest rendition at least that
+    wide; otherwise clients that explicitly accept the rendition format get
+    the largest rendition.
+    
+    Returns:
+        One of RENDITION_WIDTHS, or None to serve the original
+    """
+    if not RENDITION_WIDTHS:
+        return None
+    
+    requested = request.args.get('w', type=int) or request.args.get('width', type=int)
+    if requested:
+        return next((width for width in RENDITION_WIDTHS if width >= requested), RENDITION_WIDTHS[-1])
+    
+    rendition_mimetype = IMAGE_MIMETYPES.get(RENDITION_FORMAT)
+    if any(mimetype == rendition_mimetype and quality > 0 for mimetype, quality in request.accept_mimetypes):
+        return RENDITION_WIDTHS[-1]
+    
+    return None
+
+
 @app.route('/vocab_images/<path:filename>', methods=['GET'])
 def serve_image(filename):
-    """Serve vocabulary images."""
-    return send_from_directory(VOCAB_IMAGES_DIR, filename)
+    """
+    Serve vocabulary images.
+    
+    Query parameters:
+        w (or width): Serve the smallest resized rendition at least this wide
+    
+    Without ?w=, clients whose Accept header lists the rendition format
+    (image/webp by default) get the largest rendition. The original is served
+    while renditions are still being built.
+    
+    Versioned URLs (ocean.<version>.png, as returned by the generate and
+    regenerate endpoints) are cacheable forever; plain ocean.png URLs follow
+    regenerations and must be revalidated.
+    """
+    # Never expose in-progress downloads or other dot-files, however the path
+    # is spelled (blobs/../.incoming/...)
+    filename = posixpath.normpath(filename)
+    if any(part.startswith('.') for part in filename.split('/')):
+        return jsonify({'error': 'Image not found'}), 404
+    
+    # Word filenames (ocean.png, or versioned ocean.<version>.png, which always
+    # means the same bytes) are looked up in the image store; other paths
+    # (blobs and their renditions) are served as they are
+    versioned = VERSIONED_IMAGE_NAME.match(filename)
+    if versioned:
+        image_path = image_store.acquire_version(versioned['stem'] + versioned['suffix'], versioned['version'])
+        if image_path is None:
+            return jsonify({'error': 'Image not found'}), 404
+    else:
+        image_path = image_store.acquire(filename)
+    
+    if image_path is None:
+        file_path = safe_join(str(VOCAB_IMAGES_DIR), filename)
+        if file_path is not None and os.path.isfile(file_path):
+            response = send_from_directory(VOCAB_IMAGES_DIR, filename, mimetype=get_image_mimetype(Path(file_path)))
+            set_image_cache_headers(response, immutable=filename.startswith('blobs/'))
+            return response
+        
+        # Perhaps stored by another process since the manifest was loaded
+        image_path = reacquire_image(filename)
+        if image_path is None:
+            return jsonify({'error': 'Image not found'}), 404
+    
+    # The image stays pinned (safe from eviction) until the response is sent
+    response = send_pinned_image(image_path)
+    if response is None and not versioned:
+        # Moved (e.g. by migrate_images.py) or deleted behind the manifest's back
+        image_path = reacquire_image(filename)
+        response = send_pinned_image(image_path) if image_path is not None else None
+    if response is None:
+        image_store.report_missing(filename)
+        return jsonify({'error': 'Image not found'}), 404
+    
+    set_image_cache_headers(response, immutable=bool(versioned))
+    response.call_on_close(lambda: image_store.release(image_path))
+    return response
+
+
+def reacquire_image(filename: str) -> Optional[Path]:
+    """
+    Look a filename up in the image store's SQLite index, for when the
+    manifest doesn't know it or points at a file that is gone, and pin the
+    image it maps to.
+    
+    Args:
+        filename: Public filename (e.g. ocean.png)
+        
+    Returns:
+        Path of the pinned image, or None
+    """
+    image_path = image_store.reload(filename)
+    if image_path is not None:
+        image_store.pin(image_path)
+    return image_path
+
+
+def send_pinned_image(image_path: Path) -> Optional[Response]:
+    """
+    Send a stored image pinned by acquire(), releasing the pin if it can't be sent.
+    
+    Returns:
+        The response, or None if the file is missing
+    """
+    try:
+        return send_stored_image(image_path)
+    except NotFound:
+        image_store.release(image_path)
+        return None
+    except Exception:
+        image_store.release(image_path)
+        raise
+
+
+def set_image_cache_headers(response: Response, immutable: bool):
+    """
+    Set Cache-Control for an image response.
+    Content-addressed URLs never change, so browsers may keep them forever;
+    other URLs must be revalidated (cheaply, with the ETag) on every use.
+    
+    Args:
+        response: The image response
+        immutable: True if the URL always serves the same bytes
+    """
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = None
+
+
+def send_stored_image(image_path: Path) -> Response:
+    """
+    Send a stored image, or the rendition of it chosen by choose_rendition_width().
+    Blobs get a strong ETag derived from their content hash.
+    
+    Args:
+        image_path: Path of the original image
+        
+    Returns:
+        The file response (raises NotFound if the image is missing)
+    """
+    digest = image_path.stem if BLOB_NAME.match(image_path.name) else None
+    
+    width = choose_rendition_width()
+    if width is not None:
+        rendition_path = get_rendition_path(image_path, width)
+        if hot_image_cache.contains(rendition_path) or rendition_path.exists():
+            response = send_image_file(rendition_path, IMAGE_MIMETYPES.get(RENDITION_FORMAT),
+                                       f"{digest}.{width}w.{RENDITION_FORMAT}" if digest else None)
+            response.vary.add('Accept')
+            return response
+        
+        # Older images (or a build still in progress): build renditions for next time
+        if not get_image_metadata_path(image_path).exists():
+            schedule_renditions(image_path)
+    
+    if digest:
+        response = send_image_file(image_path, ImageStore.blob_mimetype(image_path), digest)
+    else:
+        response = send_image_file(image_path, get_image_mimetype(image_path), None)
+    if RENDITION_WIDTHS:
+        response.vary.add('Accept')
+    return response
+
+
+def send_image_file(path: Path, mimetype: Optional[str], etag: Optional[str]) -> Response:
+    """
+    Send an image file, answering If-None-Match (304) and Range (206) requests.
+    Small content-addressed files are sent from hot_image_cache; everything
+    else goes through send_file, which passes the open file to the WSGI
+    server's wsgi.file_wrapper (sendfile where supported) or, with
+    USE_X_SENDFILE, leaves the transfer to the front-end proxy.
+    
+    Args:
+        path: Path of the file
+        mimetype: Its MIME type
+        etag: Strong ETag for content-addressed files, or None to derive one
+            from the file's modification time (such files aren't cached)
+        
+    Returns:
+        The response (raises NotFound if the file is missing)
+    """
+    data = hot_image_cache.get(path) if etag else None
+    
+    try:
+        if data is None and etag:
+            if path.stat().st_size <= hot_image_cache.max_file_bytes:
+                data = path.read_bytes()
+                hot_image_cache.put(path, data)
+            else:
+                hot_image_cache.record_too_large()
+        
+        if data is None:
+            return send_file(path, mimetype=mimetype, etag=etag or True, conditional=True)
+    except FileNotFoundError:
+        raise NotFound()
+    
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(etag)
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
 
 
 @app.route('/generate_vocab', methods=['POST'])
@@ -355,7 +4689,10 @@ def generate_vocab():
     {
         "theme": "Nature",
         "numWords": 10,
-        "forceRegenerate": false  // Optional: regenerate existing images
+        "forceRegenerate": false,  // Optional: regenerate existing images
+        "freshVocabulary": false,  // Optional: skip the vocabulary list cache
+        "timeoutMs": 10000,        // Optional: time budget (defaults to REQUEST_DEADLINE)
+        "debug": false             // Optional: add per-item and overall "timings"
     }
     
     Response:
@@ -373,92 +4710,172 @@ def generate_vocab():
         ],
         "count": 10,
         "imagesGenerated": 8,
-        "imagesFailed": 2
+        "imagesFailed": 2,
+        "imagesPending": 0,
+        "deadlineExceeded": false
     }
+    
+    If the time budget runs out, the words generated so far are returned at
+    once; images still being fetched are left out (imageGenerated false,
+    counted in imagesPending) and stored in the background for next time.
+    
+    The Server-Timing header breaks the time down by stage (see
+    StageTimings). With "debug": true each item also has a "timings" object,
+    e.g. {"source": "wikimedia", "queuedMs": 0.1, "wikimediaBatchMs": 240.3,
+    "downloadMs": 88.0, "totalMs": 330.2}, and the response has the overall
+    "timings".
+    
+    Streaming: with "Accept: application/x-ndjson" (one JSON object per line)
+    or "Accept: text/event-stream" (server-sent events), the response streams
+    a "word" event as each word is generated, a "vocabulary" event once the
+    word list is complete, an "image" event per word as its image resolves,
+    and a final "summary" event with the counts. Headers go out before the
+    images are fetched, so a streamed response's Server-Timing only covers
+    the time to the first word; the full breakdown is in the summary event
+    when debugging.
     """
     try:
         data = request.get_json()
         
         # Validate input
-        if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
+        error = validate_vocab_request(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        theme = data.get('theme')
-        num_words = data.get('numWords')
+        theme = data['theme']
+        num_words = data['numWords']
         force_regenerate = data.get('forceRegenerate', False)
-        
-        if not theme:
-            return jsonify({'error': 'Missing required field: theme'}), 400
-        
-        if not num_words:
-            return jsonify({'error': 'Missing required field: numWords'}), 400
-        
-        if not isinstance(num_words, int) or num_words < 1 or num_words > MAX_WORDS:
-            return jsonify({'error': f'numWords must be between 1 and {MAX_WORDS}'}), 400
+        fresh_vocabulary = data.get('freshVocabulary', False)
+        debug = data.get('debug', False)
+        deadline = get_request_deadline(data)
+        timings = StageTimings()
         
         logger.info(f"Generating vocabulary list: theme='{theme}', numWords={num_words}, forceRegenerate={force_regenerate}")
         
-        # Generate vocabulary list
-        vocab_list = generate_vocabulary_list(theme, num_words)
+        # Generate the vocabulary list; images are fetched as words arrive
+        vocab_items = iter_vocabulary_list(theme, num_words, use_cache=not fresh_vocabulary, deadline=deadline)
+        events = iter_vocab_events(vocab_items, force_regenerate, deadline, timings, debug)
         
-        # Generate images for each word
-        results = []
-        images_generated = 0
-        images_failed = 0
-        
-        for vocab in vocab_list:
-            word = vocab.get('word', '')
-            definition = vocab.get('definition', '')
-            
-            if not word:
-                logger.warning("Skipping vocabulary item with no word")
-                continue
-            
-            # Generate unique ID
-            vocab_id = hashlib.md5(f"{word}{datetime.now().isoformat()}".encode()).hexdigest()[:8]
-            
-            # Search and download free image
-            image_path = search_and_save_image(word, force_regenerate)
-            
-            if image_path:
-                images_generated += 1
-                image_generated = True
-                # Convert relative path to full URL
-                image_url = f"http://localhost:{PORT}/{image_path}"
-            else:
-                images_failed += 1
-                image_generated = False
-                # Use placeholder or empty string
-                image_url = ""
-            
-            results.append({
-                'id': vocab_id,
-                'type': 'vocab',
-                'word': word,
-                'definition': definition,
-                'image': image_url,
-                'imageUrl': image_url,  # Also include imageUrl for frontend compatibility
-                'imageGenerated': image_generated
-            })
+        stream_mimetype = get_stream_mimetype()
+        if stream_mimetype:
+            # Wait for the first word so generation errors still get a proper status code
+            events = itertools.chain([next(events)], events)
+            return Response(
+                stream_events(events, stream_mimetype, 'Failed to generate vocabulary. Please try again.'),
+                mimetype=stream_mimetype,
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+                         **timing_headers(timings)}
+            )
         
-        logger.info(f"Vocabulary generation complete: {len(results)} words, {images_generated} images generated, {images_failed} images failed")
+        # Fetch all images in parallel and collect the final state of every item
+        results = []
+        summary = {}
+        for event in events:
+            if event['event'] == 'word':
+                results.append(event['item'])
+            elif event['event'] == 'image':
+                results[event['index']] = event['item']
+            elif event['event'] == 'summary':
+                summary = event
         
-        return jsonify({
+        response = {
             'success': True,
             'vocabulary': results,
-            'count': len(results),
-            'imagesGenerated': images_generated,
-            'imagesFailed': images_failed
-        })
+            'count': summary['count'],
+            'imagesGenerated': summary['imagesGenerated'],
+            'imagesFailed': summary['imagesFailed'],
+            'imagesPending': summary['imagesPending'],
+            'deadlineExceeded': summary['deadlineExceeded']
+        }
+        if debug:
+            response['timings'] = summary['timings']
+        return jsonify(response), timing_headers(timings)
         
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         return jsonify({'error': str(e)}), 400
+    except DeadlineExceeded:
+        logger.error("Deadline exceeded before any vocabulary was generated")
+        return jsonify({'error': 'Timed out generating vocabulary. Please try again.'}), 504
     except Exception as e:
         logger.error(f"Error in generate_vocab endpoint: {str(e)}")
         return jsonify({'error': 'Failed to generate vocabulary. Please try again.'}), 500
 
 
+@app.route('/jobs/generate_vocab', methods=['POST'])
+def create_vocab_job():
+    """
+    Start a vocabulary generation in the background.
+    Takes the same request body as /generate_vocab and returns immediately;
+    poll GET /jobs/<jobId> for progress and results.
+    
+    Response (202):
+    {
+        "success": true,
+        "jobId": "4f9c...",
+        "status": "queued",
+        "statusUrl": "/jobs/4f9c..."
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        error = validate_vocab_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        job = vocab_jobs.submit(
+            data['theme'],
+            data['numWords'],
+            force_regenerate=data.get('forceRegenerate', False),
+            use_cache=not data.get('freshVocabulary', False)
+        )
+        
+        if job is None:
+            logger.warning("Rejecting vocabulary job: too many jobs in progress")
+            response = jsonify({'error': 'Too many vocabulary jobs in progress. Please try again shortly.'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        
+        logger.info(f"Queued vocabulary job {job['id']}: theme='{data['theme']}', numWords={data['numWords']}")
+        
+        return jsonify({
+            'success': True,
+            'jobId': job['id'],
+            'status': job['status'],
+            'statusUrl': f"/jobs/{job['id']}"
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error in create_vocab_job endpoint: {str(e)}")
+        return jsonify({'error': 'Failed to start vocabulary job. Please try again.'}), 500
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_vocab_job(job_id):
+    """
+    Get a vocabulary job's status, progress and (partial) results.
+    
+    Response:
+    {
+        "id": "4f9c...",
+        "status": "running",          // queued, running, completed or failed
+        "progress": {"wordsGenerated": 10, "imagesResolved": 6, "listComplete": true},
+        "vocabulary": [...],          // items generated so far
+        "count": 10,
+        "imagesGenerated": 5,
+        "imagesFailed": 1,
+        "error": null
+    }
+    """
+    job = vocab_jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    
+    return jsonify(job)
+
+
 @app.route('/generate', methods=['POST'])
 def generate_questions():
     """
@@ -481,43 +4898,40 @@ def generate_questions():
             if not theme or not num_questions:
                 return jsonify({'error': 'Missing required fields: theme and numQuestions'}), 400
             
-            # Call generate_vocab internally
-            vocab_list = generate_vocabulary_list(theme, num_questions)
+            if not isinstance(num_questions, int) or num_questions < 1 or num_questions > MAX_WORDS:
+                return jsonify({'error': f'numQuestions must be between 1 and {MAX_WORDS}'}), 400
+            
+            # Generate the list and search/download free images as words arrive.
+            # The response has no way to say images were left out, so only
+            # clients that ask for a time budget get one
+            deadline = get_request_deadline(data, use_default=False)
+            timings = StageTimings()
+            vocab_items = iter_vocabulary_list(theme, num_questions,
+                                               use_cache=not data.get('freshVocabulary', False), deadline=deadline)
             
             results = []
-            for vocab in vocab_list:
-                word = vocab.get('word', '')
-                definition = vocab.get('definition', '')
-                
-                if not word:
-                    continue
-                
-                vocab_id = hashlib.md5(f"{word}{datetime.now().isoformat()}".encode()).hexdigest()[:8]
-                
-                # Search and download free image
-                image_path = search_and_save_image(word, False)
-                
-                # Convert relative path to full URL
-                image_url = f"http://localhost:{PORT}/{image_path}" if image_path else ''
-                
-                results.append({
-                    'id': vocab_id,
-                    'type': 'vocab',
-                    'word': word,
-                    'definition': definition,
-                    'image': image_url,
-                    'imageUrl': image_url  # Also include imageUrl for frontend compatibility
-                })
+            for event in iter_vocab_events(vocab_items, False, deadline, timings, data.get('debug', False)):
+                if event['event'] == 'word':
+                    results.append(event['item'])
+                elif event['event'] == 'image':
+                    results[event['index']] = event['item']
+            
+            # This endpoint's items never had an imageGenerated flag
+            for item in results:
+                del item['imageGenerated']
             
             return jsonify({
                 'success': True,
                 'questions': results,
                 'count': len(results)
-            })
+            }), timing_headers(timings)
         
         # For non-vocab types, return error (or implement other types)
         return jsonify({'error': 'Only vocab type is supported in Python server. Use Node.js server for other types.'}), 400
         
+    except DeadlineExceeded:
+        logger.error("Deadline exceeded before any questions were generated")
+        return jsonify({'error': 'Timed out generating questions. Please try again.'}), 504
     except Exception as e:
         logger.error(f"Error in generate endpoint: {str(e)}")
         return jsonify({'error': 'Failed to generate questions. Please try again.'}), 500
@@ -530,7 +4944,8 @@ def regenerate_image():
     
     Request body:
     {
-        "word": "Ocean"
+        "word": "Ocean",
+        "debug": false    // Optional: add "timings" to the response
     }
     
     Response:
@@ -540,6 +4955,8 @@ def regenerate_image():
         "image": "vocab_images/ocean.png",
         "imageGenerated": true
     }
+    
+    The Server-Timing header breaks the time down by stage.
     """
     try:
         data = request.get_json()
@@ -556,30 +4973,41 @@ def regenerate_image():
         logger.info(f"Regenerating image for word: '{word}'")
         
         # Force regenerate the image (will download a new one)
-        image_path = search_and_save_image(word, force_regenerate=True)
+        deadline = get_request_deadline(data)
+        timings = StageTimings()
+        image_path = search_and_save_image(word, force_regenerate=True, deadline=deadline, timings=timings)
         
         if image_path:
             # Convert relative path to full URL
             image_url = f"http://localhost:{PORT}/{image_path}"
             logger.info(f"Successfully regenerated image for '{word}': {image_url}")
             
-            return jsonify({
+            response = {
                 'success': True,
                 'word': word,
                 'image': image_url,
                 'imageUrl': image_url,
                 'imageGenerated': True
-            })
+            }
+            status = 200
+        elif deadline_passed(deadline):
+            logger.warning(f"Deadline exceeded finding a new image for '{word}'")
+            return jsonify({'error': 'Timed out finding a new image. Please try again.'}), 504, timing_headers(timings)
         else:
             logger.warning(f"Failed to find/download new image for '{word}'")
-            return jsonify({
+            response = {
                 'success': False,
                 'word': word,
                 'image': '',
                 'imageUrl': '',
                 'imageGenerated': False,
                 'error': 'No image found for this word'
-            }), 404
+            }
+            status = 404
+        
+        if data.get('debug', False):
+            response['timings'] = timings.as_dict()
+        return jsonify(response), status, timing_headers(timings)
         
     except Exception as e:
         logger.error(f"Error in regenerate_image endpoint: {str(e)}")
@@ -601,7 +5029,7 @@ def internal_error(e):
 
 if __name__ == '__main__':
     # Check for API key
-    if not os.getenv('OPENAI_API_KEY'):
+    if openai_client is None:
         logger.error("OPENAI_API_KEY not found in environment variables!")
         logger.error("Please create a .env file with your OpenAI API key")
         exit(1)
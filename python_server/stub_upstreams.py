@@ -0,0 +1,319 @@
+"""
+Local stub upstream servers for offline benchmarking
+Stands in for the OpenAI chat completions API, the Wikipedia pageimages
+API, Unsplash search and the image host so server.py can be measured
+without touching the internet
+"""
+
+import json
+import random
+import re
+import struct
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Smallest valid PNG (1x1 transparent pixel)
+STUB_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000b49444154789c6360000200000500017a5eab3f0000'
+    '000049454e44ae426082'
+)
+
+# Matches the user prompt built by stream_vocabulary_list()
+VOCAB_PROMPT = re.compile(r'Generate (\d+) vocabulary words about "(.*?)"')
+
+
+def padded_png(size: int, label: str) -> bytes:
+    """
+    A valid PNG of about size bytes: STUB_PNG with a tEXt chunk of filler
+    inserted before IEND. The label goes into the chunk so every image has
+    different bytes (the image store would share one file otherwise).
+    """
+    text = b'Comment\0' + label.encode()
+    text += b'.' * max(0, size - len(STUB_PNG) - 12 - len(text))
+    chunk = struct.pack('>I', len(text)) + b'tEXt' + text + struct.pack('>I', zlib.crc32(b'tEXt' + text))
+    return STUB_PNG[:-12] + chunk + STUB_PNG[-12:]
+
+
+class StubUpstreamHandler(BaseHTTPRequestHandler):
+    """Request handler serving fake OpenAI, Wikipedia, Unsplash and image responses."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        """Keep benchmark output clean."""
+        pass
+
+    def send_body(self, status, body, content_type):
+        """Send a complete response with a Content-Length header."""
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_body(self):
+        """Answer with a 503, as an overloaded upstream would."""
+        self.send_body(503, b'{"error": {"message": "stub upstream failure", "type": "server_error"}}',
+                       'application/json')
+
+    def do_GET(self):
+        """Route GET requests to the matching fake upstream."""
+        stub = self.server.stub
+        parsed = urllib.parse.urlparse(self.path)
+        kind = stub.record_request(self.path)
+
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.should_fail():
+            self.send_error_body()
+            return
+
+        if kind == 'wikipedia':
+            self.handle_wikipedia(urllib.parse.parse_qs(parsed.query))
+        elif kind == 'unsplash':
+            self.handle_unsplash(urllib.parse.parse_qs(parsed.query))
+        elif kind == 'image':
+            if stub.image_bytes:
+                self.send_body(200, padded_png(stub.image_bytes, parsed.path), 'image/png')
+            else:
+                self.send_body(200, STUB_PNG, 'image/png')
+        else:
+            self.send_body(404, b'{"error": "not found"}', 'application/json')
+
+    def do_POST(self):
+        """Route POST requests (only the OpenAI chat completions API)."""
+        stub = self.server.stub
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        kind = stub.record_request(self.path)
+
+        if stub.openai_latency:
+            time.sleep(stub.openai_latency)
+        if kind != 'openai':
+            self.send_body(404, b'{"error": "not found"}', 'application/json')
+        elif stub.should_fail():
+            self.send_error_body()
+        else:
+            self.handle_chat_completion(body)
+
+    def handle_wikipedia(self, params):
+        """Answer an action=query&prop=pageimages lookup for one or more titles."""
+        stub = self.server.stub
+        titles = params.get('titles', [''])[0].split('|')
+        pages = {}
+        normalized = []
+
+        for index, title in enumerate(titles):
+            # Mimic MediaWiki title normalization (first letter upper-cased)
+            page_title = title[:1].upper() + title[1:]
+            if page_title != title:
+                normalized.append({'from': title, 'to': page_title})
+
+            if stub.is_missing(title):
+                pages[str(-(index + 1))] = {'ns': 0, 'title': page_title, 'missing': ''}
+                continue
+
+            image_name = urllib.parse.quote(page_title.replace(' ', '_'))
+            pages[str(index + 1)] = {
+                'pageid': index + 1,
+                'ns': 0,
+                'title': page_title,
+                'thumbnail': {
+                    'source': f"{stub.base_url}/images/{image_name}.png",
+                    'width': 1,
+                    'height': 1
+                }
+            }
+
+        query = {'pages': pages}
+        if normalized:
+            query['normalized'] = normalized
+
+        body = json.dumps({'batchcomplete': '', 'query': query}).encode()
+        self.send_body(200, body, 'application/json')
+
+    def handle_unsplash(self, params):
+        """Answer a /search/photos query with per_page results (none for missing words)."""
+        stub = self.server.stub
+        query = params.get('query', [''])[0]
+        per_page = int(params.get('per_page', ['1'])[0])
+        results = []
+
+        if not query.lower().startswith(stub.missing_prefix):
+            for index in range(per_page):
+                image_name = urllib.parse.quote(f"{query}-{index}".replace(' ', '_'))
+                results.append({
+                    'id': f"stub-{index}",
+                    'urls': {'regular': f"{stub.base_url}/images/unsplash/{image_name}.png"}
+                })
+
+        body = json.dumps({'total': len(results), 'total_pages': 1, 'results': results}).encode()
+        self.send_body(200, body, 'application/json')
+
+    def handle_chat_completion(self, request):
+        """
+        Answer a chat completion with a JSON array of made-up vocabulary for
+        the theme in the prompt, streamed one word at a time if asked for.
+        """
+        stub = self.server.stub
+        prompt = request['messages'][-1]['content']
+        match = VOCAB_PROMPT.search(prompt)
+        num_words, theme = (int(match.group(1)), match.group(2)) if match else (1, 'Stub')
+
+        # One completion chunk per word, written the way the model formats it
+        pieces = ['[\n']
+        for index in range(num_words):
+            vocab = {'word': f"{theme} {index + 1}", 'definition': stub.definition(theme, index)}
+            separator = ',\n' if index < num_words - 1 else '\n'
+            pieces.append('  ' + json.dumps(vocab) + separator)
+        pieces.append(']')
+
+        completion = {
+            'id': 'chatcmpl-stub',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub')
+        }
+
+        if not request.get('stream'):
+            body = dict(completion, object='chat.completion', choices=[{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(pieces)},
+                'finish_reason': 'stop'
+            }])
+            self.send_body(200, json.dumps(body).encode(), 'application/json')
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send_event(data):
+            event = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(event):x}\r\n".encode() + event + b'\r\n')
+            self.wfile.flush()
+
+        for index, piece in enumerate(pieces):
+            if index and stub.word_delay:
+                time.sleep(stub.word_delay)
+            delta = {'role': 'assistant', 'content': piece} if index == 0 else {'content': piece}
+            send_event(json.dumps(dict(completion, object='chat.completion.chunk', choices=[
+                {'index': 0, 'delta': delta, 'finish_reason': None}
+            ])))
+        send_event(json.dumps(dict(completion, object='chat.completion.chunk', choices=[
+            {'index': 0, 'delta': {}, 'finish_reason': 'stop'}
+        ])))
+        send_event('[DONE]')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class StubUpstream:
+    """
+    A threaded local HTTP server impersonating the upstreams: point
+    WIKIPEDIA_API_URL at <base_url>/w/api.php, UNSPLASH_API_URL at base_url
+    and OPENAI_BASE_URL at <base_url>/v1.
+
+    Args:
+        latency: Seconds to wait before answering each Wikipedia, Unsplash or image request
+        missing_prefix: Titles starting with this prefix have no page image
+            (or Unsplash results)
+        error_rate: Fraction of requests (0-1) answered with a 503
+        image_bytes: Size of the images served (0 = a 1x1 PNG of 70 bytes)
+        openai_latency: Seconds before a chat completion starts
+        word_delay: Seconds between the words of a streamed completion
+        miss_rate: Fraction of titles (0-1, chosen by hash, so the same ones
+            every run) without a Wikipedia page image
+        definition_chars: Length of each generated definition
+        seed: Seed for the injected errors, for repeatable runs
+    """
+
+    def __init__(self, latency: float = 0.0, missing_prefix: str = 'missing', error_rate: float = 0.0,
+                 image_bytes: int = 0, openai_latency: float = 0.0, word_delay: float = 0.0,
+                 miss_rate: float = 0.0, definition_chars: int = 80, seed=None):
+        self.latency = latency
+        self.missing_prefix = missing_prefix
+        self.error_rate = error_rate
+        self.image_bytes = image_bytes
+        self.openai_latency = openai_latency
+        self.word_delay = word_delay
+        self.miss_rate = miss_rate
+        self.definition_chars = definition_chars
+        self.request_count = 0
+        self.request_counts = {}
+        self.errors_injected = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.base_url = ''
+
+    @staticmethod
+    def request_kind(path: str) -> str:
+        """Which upstream a request path belongs to: openai, wikipedia, unsplash, image or other."""
+        path = urllib.parse.urlparse(path).path
+        if path.startswith('/v1/chat/completions'):
+            return 'openai'
+        if path == '/w/api.php':
+            return 'wikipedia'
+        if path == '/search/photos':
+            return 'unsplash'
+        if path.startswith('/images/'):
+            return 'image'
+        return 'other'
+
+    def record_request(self, path: str) -> str:
+        """Count a request made against the stub and return its kind."""
+        kind = self.request_kind(path)
+        with self._lock:
+            self.request_count += 1
+            self.request_counts[kind] = self.request_counts.get(kind, 0) + 1
+        return kind
+
+    def should_fail(self) -> bool:
+        """Decide whether to inject an error into the current request."""
+        if not self.error_rate:
+            return False
+        with self._lock:
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors_injected += 1
+        return fail
+
+    def is_missing(self, title: str) -> bool:
+        """Whether a title has no page image."""
+        if title.lower().startswith(self.missing_prefix):
+            return True
+        return self.miss_rate > 0 and zlib.crc32(title.lower().encode()) % 1000 < self.miss_rate * 1000
+
+    def definition(self, theme: str, index: int) -> str:
+        """A made-up definition of definition_chars characters."""
+        text = f"Definition {index + 1} of a word about {theme}. "
+        return (text * (self.definition_chars // len(text) + 1))[:self.definition_chars].strip()
+
+    def reset_counts(self):
+        """Zero the request and injected error counters."""
+        with self._lock:
+            self.request_count = 0
+            self.request_counts = {}
+            self.errors_injected = 0
+
+    def start(self) -> str:
+        """Start serving on a free local port and return the base URL."""
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), StubUpstreamHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Shut the server down."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
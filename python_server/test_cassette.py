@@ -0,0 +1,160 @@
+"""
+Tests for recording and replaying upstream traffic (UpstreamCassette)
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import server
+from server import CassetteMiss, UpstreamCassette, UpstreamHTTPClient
+from stub_upstreams import StubUpstream
+
+API_URL = 'https://en.wikipedia.org/w/api.php?action=query&titles=Ocean'
+CHAT_URL = 'https://api.openai.com/v1/chat/completions'
+
+
+def record(cassette, method, url, body, *chunks, status=200):
+    """Record one exchange whose body arrives as the given chunks."""
+    recording = cassette.start_recording(method, url, body, status, [('Content-Type', 'application/json')], 0.01)
+    for chunk in chunks:
+        recording.add(chunk)
+    recording.finish()
+
+
+def replay_body(cassette, method, url, body=None):
+    """Replay a request and return its status and whole body."""
+    exchange = cassette.replay(method, url, body)
+    return exchange['status'], b''.join(cassette.iter_body(exchange))
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    return tmp_path / 'cassette.jsonl'
+
+
+def test_key_uses_method_url_and_body_hash():
+    assert UpstreamCassette.key('get', API_URL) == f"GET {API_URL}"
+    assert UpstreamCassette.key('POST', CHAT_URL, b'{"a": 1}') == UpstreamCassette.key('post', CHAT_URL, b'{"a": 1}')
+    assert UpstreamCassette.key('POST', CHAT_URL, b'{"a": 1}') != UpstreamCassette.key('POST', CHAT_URL, b'{"a": 2}')
+    assert UpstreamCassette.key('GET', API_URL) != UpstreamCassette.key('POST', API_URL)
+    assert UpstreamCassette.key('GET', API_URL) != UpstreamCassette.key('GET', API_URL + '&redirects=1')
+
+
+def test_replay_matches_method_url_and_body(cassette_path):
+    recorder = UpstreamCassette(cassette_path, 'record')
+    record(recorder, 'POST', CHAT_URL, b'{"theme": "Ocean"}', b'ocean')
+    record(recorder, 'POST', CHAT_URL, b'{"theme": "Space"}', b'space')
+    record(recorder, 'GET', CHAT_URL, None, b'get')
+
+    cassette = UpstreamCassette(cassette_path, 'replay', latency_scale=0)
+    assert replay_body(cassette, 'POST', CHAT_URL, b'{"theme": "Space"}') == (200, b'space')
+    assert replay_body(cassette, 'POST', CHAT_URL, b'{"theme": "Ocean"}') == (200, b'ocean')
+    assert replay_body(cassette, 'GET', CHAT_URL) == (200, b'get')
+    with pytest.raises(CassetteMiss):
+        cassette.replay('POST', CHAT_URL, b'{"theme": "Farm"}')
+
+
+def test_repeated_requests_replay_in_recorded_order(cassette_path):
+    recorder = UpstreamCassette(cassette_path, 'record')
+    record(recorder, 'GET', API_URL, None, b'first', status=503)
+    record(recorder, 'GET', API_URL, None, b'second')
+
+    cassette = UpstreamCassette(cassette_path, 'replay', latency_scale=0)
+    assert replay_body(cassette, 'GET', API_URL) == (503, b'first')
+    assert replay_body(cassette, 'GET', API_URL) == (200, b'second')
+    # Once the recordings run out the last one is repeated
+    assert replay_body(cassette, 'GET', API_URL) == (200, b'second')
+    assert cassette.stats()['replayed'] == 3
+
+
+def test_unrecorded_request_raises_cassette_miss(cassette_path):
+    recorder = UpstreamCassette(cassette_path, 'record')
+    record(recorder, 'GET', API_URL, None, b'{}')
+
+    cassette = UpstreamCassette(cassette_path, 'replay', latency_scale=0)
+    with pytest.raises(CassetteMiss) as excinfo:
+        cassette.replay('GET', 'https://api.unsplash.com/search/photos?query=Ocean')
+    assert isinstance(excinfo.value, ConnectionError)
+    assert cassette.stats()['misses'] == 1
+
+    # The shared upstream client fails the same way, without touching the network
+    client = UpstreamHTTPClient(pool_size=1, cassette=cassette)
+    with pytest.raises(CassetteMiss):
+        client.request('https://upload.wikimedia.org/never-recorded.png')
+    with client.request(API_URL) as response:
+        assert response.read() == b'{}'
+
+
+def test_replay_keeps_the_body_chunks(cassette_path):
+    recorder = UpstreamCassette(cassette_path, 'record')
+    record(recorder, 'GET', API_URL, None, b'data: one\n\n', b'data: two\n\n')
+
+    cassette = UpstreamCassette(cassette_path, 'replay', latency_scale=0)
+    assert list(cassette.iter_body(cassette.replay('GET', API_URL))) == [b'data: one\n\n', b'data: two\n\n']
+
+
+def test_composes_batches_from_recorded_pages(cassette_path):
+    endpoint = 'https://en.wikipedia.org/w/api.php'
+    recorder = UpstreamCassette(cassette_path, 'record')
+    for page_id, title in ((1, 'Ocean'), (2, 'Whale')):
+        body = {'query': {'pages': {str(page_id): {'pageid': page_id, 'title': title}}}}
+        record(recorder, 'GET', f"{endpoint}?action=query&titles={title}", None, json.dumps(body).encode())
+
+    cassette = UpstreamCassette(cassette_path, 'replay', latency_scale=0)
+    status, body = replay_body(cassette, 'GET', f"{endpoint}?action=query&titles=Ocean%7CWhale")
+    assert status == 200
+    assert {page['title'] for page in json.loads(body)['query']['pages'].values()} == {'Ocean', 'Whale'}
+    with pytest.raises(CassetteMiss):
+        cassette.replay('GET', f"{endpoint}?action=query&titles=Ocean%7CSquid")
+
+
+# Run in a fresh interpreter: server.py sets up the OpenAI client's cassette
+# transport at import time
+ROUND_TRIP_SCRIPT = """
+import json, server
+words = [item['word'] for item in server.stream_vocabulary_list('Tides', 4)]
+print(json.dumps({'words': words, 'cassette': server.upstream_cassette.stats()}))
+"""
+
+
+def run_with_cassette(tmp_path, mode, **env):
+    """Stream a vocabulary list in a server.py process with the cassette in the given mode."""
+    env = dict({key: value for key, value in os.environ.items() if key != 'OPENAI_API_KEY'},
+               UPSTREAM_CASSETTE_MODE=mode, UPSTREAM_CASSETTE=str(tmp_path / 'cassette.jsonl'),
+               UPSTREAM_CASSETTE_LATENCY_SCALE='0', VOCAB_IMAGES_DIR=str(tmp_path / f"images-{mode}"),
+               RESOLUTION_CACHE_PATH=str(tmp_path / f"resolution-{mode}.sqlite3"), **env)
+    result = subprocess.run([sys.executable, '-c', ROUND_TRIP_SCRIPT], cwd=Path(server.__file__).parent,
+                            env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_openai_stream_round_trip(tmp_path):
+    pytest.importorskip('httpx')
+    stub = StubUpstream(latency=0, openai_latency=0, word_delay=0.01)
+    base_url = stub.start()
+    try:
+        recorded = run_with_cassette(tmp_path, 'record', OPENAI_API_KEY='test-key',
+                                     OPENAI_BASE_URL=f"{base_url}/v1")
+    finally:
+        stub.stop()
+
+    assert recorded['words'] == ['Tides 1', 'Tides 2', 'Tides 3', 'Tides 4']
+    assert recorded['cassette']['recorded'] == 1
+
+    # The completion was recorded as it streamed, one piece per word or more
+    exchange = json.loads((tmp_path / 'cassette.jsonl').read_text().splitlines()[0])
+    assert exchange['method'] == 'POST' and exchange['url'].endswith('/v1/chat/completions')
+    assert len(exchange['chunks']) > 4
+
+    # Replayed with the stub gone and no API key
+    replayed = run_with_cassette(tmp_path, 'replay', OPENAI_BASE_URL=f"{base_url}/v1")
+
+    assert replayed['words'] == recorded['words']
+    assert replayed['cassette']['replayed'] == 1
+    assert replayed['cassette']['misses'] == 0
@@ -0,0 +1,187 @@
+"""
+Tests for keeping the image store within its disk budget (ImageEvictor)
+"""
+
+import hashlib
+import os
+import time
+
+import pytest
+
+import server
+from server import ImageEvictor, ImageStore
+
+IMAGE_BYTES = 1000
+PNG_HEADER = b'\x89PNG\r\n\x1a\n'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(tmp_path, tmp_path / 'index.sqlite3')
+
+
+def store_image(store, name, fill=None):
+    """Store IMAGE_BYTES of PNG-looking data under a filename and return the blob path."""
+    data = PNG_HEADER + (fill or name).encode().ljust(IMAGE_BYTES - len(PNG_HEADER), b'.')
+    tmp_path = store.root / f".{name}.part"
+    tmp_path.write_bytes(data)
+    return store.put(tmp_path, hashlib.sha256(data).hexdigest(), 'png', name)
+
+
+def set_usage(store, name, last_access, hits=0):
+    """Pretend a filename was last used at last_access, hits times."""
+    with store.manifest._lock:
+        entry = store.manifest._entries[name]
+        entry['last_access'] = last_access
+        entry['hits'] = hits
+
+
+def stored_names(store):
+    return {name for name in ('a.png', 'b.png', 'c.png') if store.manifest.get(name)}
+
+
+def test_lru_evicts_the_least_recently_used(store):
+    paths = {name: store_image(store, name) for name in ('a.png', 'b.png', 'c.png')}
+    now = time.time()
+    set_usage(store, 'a.png', now - 10, hits=1)
+    set_usage(store, 'b.png', now - 300, hits=50)
+    set_usage(store, 'c.png', now - 20, hits=1)
+
+    evictor = ImageEvictor(store, max_bytes=int(2.5 * IMAGE_BYTES), policy='lru', interval=60)
+    evictor.evict()
+
+    assert stored_names(store) == {'a.png', 'c.png'}
+    assert not paths['b.png'].exists()
+    assert evictor.evicted_files == 1
+    assert evictor.evicted_bytes == IMAGE_BYTES
+
+
+def test_lfu_evicts_the_least_frequently_used(store):
+    for name in ('a.png', 'b.png', 'c.png'):
+        store_image(store, name)
+    now = time.time()
+    set_usage(store, 'a.png', now - 300, hits=5)
+    set_usage(store, 'b.png', now - 10, hits=1)
+    set_usage(store, 'c.png', now - 20, hits=3)
+
+    evictor = ImageEvictor(store, max_bytes=int(2.5 * IMAGE_BYTES), policy='lfu', interval=60)
+    evictor.evict()
+
+    assert stored_names(store) == {'a.png', 'c.png'}
+
+
+def test_evicts_down_to_the_target(store):
+    for name in ('a.png', 'b.png', 'c.png'):
+        store_image(store, name)
+
+    evictor = ImageEvictor(store, max_bytes=int(1.5 * IMAGE_BYTES), policy='lru', interval=60)
+    assert evictor.over_budget()
+    evictor.evict()
+
+    assert len(stored_names(store)) == 1
+    assert not evictor.over_budget()
+
+
+def test_does_nothing_within_budget_or_unlimited(store):
+    for name in ('a.png', 'b.png', 'c.png'):
+        store_image(store, name)
+
+    for max_bytes in (0, 10 * IMAGE_BYTES):
+        evictor = ImageEvictor(store, max_bytes=max_bytes, policy='lru', interval=60)
+        evictor.evict()
+        assert evictor.evicted_files == 0
+    assert len(stored_names(store)) == 3
+
+
+def test_skips_pinned_files(store):
+    paths = {name: store_image(store, name) for name in ('a.png', 'b.png', 'c.png')}
+    now = time.time()
+    set_usage(store, 'a.png', now - 300)
+    set_usage(store, 'b.png', now - 200)
+    set_usage(store, 'c.png', now - 10)
+    store.pin(paths['a.png'])
+
+    evictor = ImageEvictor(store, max_bytes=int(2.5 * IMAGE_BYTES), policy='lru', interval=60)
+    evictor.evict()
+
+    assert stored_names(store) == {'a.png', 'c.png'}
+    assert paths['a.png'].exists()
+    assert evictor.skipped_in_use == 1
+
+    store.release(paths['a.png'])
+    evictor.max_bytes = int(1.5 * IMAGE_BYTES)
+    evictor.evict()
+    assert stored_names(store) == {'c.png'}
+
+
+def test_shared_blob_is_evicted_with_all_its_names(store):
+    shared = store_image(store, 'a.png', fill='same')
+    assert store_image(store, 'b.png', fill='same') == shared
+    store_image(store, 'c.png')
+    now = time.time()
+    set_usage(store, 'a.png', now - 300)
+    set_usage(store, 'b.png', now - 250)
+    set_usage(store, 'c.png', now - 10)
+
+    evictor = ImageEvictor(store, max_bytes=int(1.5 * IMAGE_BYTES), policy='lru', interval=60)
+    evictor.evict()
+
+    assert stored_names(store) == {'c.png'}
+    assert not shared.exists()
+
+
+def test_removes_orphaned_blobs(store):
+    old_blob = store_image(store, 'a.png', fill='first version')
+    new_blob = store_image(store, 'a.png', fill='second version')
+
+    evictor = ImageEvictor(store, max_bytes=0, policy='lru', interval=60)
+    evictor.remove_orphans()
+
+    assert not old_blob.exists()
+    assert new_blob.exists()
+    assert evictor.orphans_removed == 1
+
+
+def test_sweeps_stale_unreferenced_blobs(store):
+    referenced = store_image(store, 'a.png')
+    stale = store_image(store, 'b.png')
+    recent = store_image(store, 'c.png')
+    # Forget the mappings, as if the blobs were left over from before a restart
+    store.manifest.remove_path(stale)
+    store.manifest.remove_path(recent)
+    old = time.time() - server.STALE_FILE_SECONDS - 60
+    os.utime(stale, (old, old))
+    os.utime(referenced, (old, old))
+
+    evictor = ImageEvictor(store, max_bytes=0, policy='lru', interval=60)
+    evictor.sweep_blobs()
+
+    assert not stale.exists()
+    assert referenced.exists()
+    # Could still be being written
+    assert recent.exists()
+    assert evictor.orphans_removed == 1
+
+
+def test_removes_stale_partial_downloads(store):
+    stale = server.VOCAB_IMAGES_TMP_DIR / 'crashed.part'
+    fresh = server.VOCAB_IMAGES_TMP_DIR / 'downloading.part'
+    stale.write_bytes(b'partial')
+    fresh.write_bytes(b'partial')
+    old = time.time() - server.STALE_FILE_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    try:
+        evictor = ImageEvictor(store, max_bytes=0, policy='lru', interval=60)
+        evictor.remove_partials()
+
+        assert not stale.exists()
+        assert fresh.exists()
+        assert evictor.partials_removed == 1
+    finally:
+        fresh.unlink(missing_ok=True)
+
+
+def test_rejects_unknown_policy(store):
+    with pytest.raises(ValueError):
+        ImageEvictor(store, max_bytes=0, policy='fifo', interval=60)
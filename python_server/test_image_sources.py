@@ -0,0 +1,162 @@
+"""
+Tests for image source circuit breakers (CircuitBreaker) and hedged lookups (HedgedLookup)
+"""
+
+import time
+
+import pytest
+
+import server
+from server import CircuitBreaker, HedgedLookup, SourceUnavailable, UpstreamRateLimited
+
+
+def fail():
+    raise ConnectionError('source is down')
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('wikimedia', failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.opened == 1
+
+
+def test_open_circuit_rejects_without_calling_the_source():
+    breaker = CircuitBreaker('wikimedia', failure_threshold=2, reset_timeout=60)
+    open_breaker(breaker)
+
+    calls = []
+    with pytest.raises(SourceUnavailable):
+        breaker.call(calls.append, 'lookup')
+    assert calls == []
+    assert breaker.rejected == 1
+    assert breaker.stats()['state'] == 'open'
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success():
+    breaker = CircuitBreaker('unsplash', failure_threshold=2, reset_timeout=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+    assert breaker.stats()['state'] == 'half_open'
+
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # Only one trial at a time
+    assert not breaker.allow()
+
+    breaker.record_success(0.1)
+    assert breaker.state == 'closed'
+    assert breaker.consecutive_failures == 0
+    assert breaker.allow()
+
+
+def test_failed_trial_opens_the_circuit_again():
+    breaker = CircuitBreaker('unsplash', failure_threshold=2, reset_timeout=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == 'open'
+    assert breaker.opened == 2
+    assert not breaker.allow()
+
+
+def test_lookups_that_never_reached_the_source_release_the_trial():
+    breaker = CircuitBreaker('unsplash', failure_threshold=2, reset_timeout=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    def rate_limited():
+        raise UpstreamRateLimited('api.unsplash.com', 5)
+
+    def deadline_timeout():
+        raise TimeoutError()
+
+    with pytest.raises(UpstreamRateLimited):
+        breaker.call(rate_limited)
+    assert breaker.state == 'half_open'
+    with pytest.raises(TimeoutError):
+        breaker.call(deadline_timeout, deadline_bound=True)
+    assert breaker.state == 'half_open'
+    assert breaker.failures == 2
+    assert breaker.call(lambda: 'image') == 'image'
+    assert breaker.state == 'closed'
+
+
+def test_latency_percentile_needs_enough_samples():
+    breaker = CircuitBreaker('wikimedia', failure_threshold=5, reset_timeout=30)
+    for _ in range(server.IMAGE_HEDGE_MIN_SAMPLES - 1):
+        breaker.record_success(0.1)
+    assert breaker.latency_percentile(95) is None
+
+    breaker.record_success(1.0)
+    assert breaker.latency_percentile(50) == 0.1
+    assert breaker.latency_percentile(95) == 1.0
+
+
+def lookup(result, delay=0.0, calls=None, name=None):
+    """A fake source lookup returning result after delay seconds."""
+    def run():
+        if calls is not None:
+            calls.append(name)
+        time.sleep(delay)
+        return result
+    return run
+
+
+@pytest.fixture
+def hedge(monkeypatch):
+    hedge = HedgedLookup(percentile=95, min_delay=0.05, max_workers=4)
+    monkeypatch.setattr(hedge, 'delay', lambda source: 0.05)
+    return hedge
+
+
+def test_fast_primary_is_not_hedged(hedge):
+    calls = []
+    result = hedge.run(('wikimedia', lookup('wiki.png', calls=calls, name='wikimedia')),
+                       ('unsplash', lookup('unsplash.png', calls=calls, name='unsplash')))
+    assert result == ('wiki.png', 'wikimedia')
+    assert calls == ['wikimedia']
+    assert hedge.stats()['hedged'] == 0
+
+
+def test_first_image_wins_when_hedged(hedge):
+    start = time.monotonic()
+    result = hedge.run(('wikimedia', lookup('wiki.png', delay=1.0)), ('unsplash', lookup('unsplash.png')))
+    assert result == ('unsplash.png', 'unsplash')
+    assert time.monotonic() - start < 0.5
+    stats = hedge.stats()
+    assert (stats['lookups'], stats['hedged'], stats['fallback_wins']) == (1, 1, 1)
+
+
+def test_slow_primary_still_wins_if_the_fallback_has_no_image(hedge):
+    result = hedge.run(('wikimedia', lookup('wiki.png', delay=0.2)), ('unsplash', lookup(None)))
+    assert result == ('wiki.png', 'wikimedia')
+    assert hedge.stats()['fallback_wins'] == 0
+
+
+def test_falls_back_when_the_primary_answers_without_an_image(hedge):
+    calls = []
+    result = hedge.run(('wikimedia', lookup(None, calls=calls, name='wikimedia')),
+                       ('unsplash', lookup('unsplash.png', calls=calls, name='unsplash')))
+    assert result == ('unsplash.png', 'unsplash')
+    assert calls == ['wikimedia', 'unsplash']
+    assert hedge.stats()['hedged'] == 0
+
+
+def test_no_image_from_either_source(hedge):
+    assert hedge.run(('wikimedia', lookup(None, delay=0.1)), ('unsplash', lookup(None))) == (None, None)
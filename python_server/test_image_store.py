@@ -0,0 +1,51 @@
+"""
+Tests for how image lookups are counted in the image manifest
+"""
+
+import hashlib
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def stored_word():
+    """Store an image for a word in the server's image store, removing it afterwards."""
+    word = 'Coral Reef'
+    name = server.get_image_path(word).name
+    data = b'\x89PNG\r\n\x1a\n' + b'coral reef'.ljust(500, b'.')
+    tmp_path = server.VOCAB_IMAGES_TMP_DIR / f"{name}.part"
+    tmp_path.write_bytes(data)
+    blob_path = server.image_store.put(tmp_path, hashlib.sha256(data).hexdigest(), 'png', name)
+    yield word, name
+    server.image_store.remove(blob_path)
+
+
+def hits(name):
+    return server.image_store.manifest.get(name)['hits']
+
+
+def test_existence_check_is_not_an_access(stored_word):
+    word, name = stored_word
+    assert server.image_exists(word)
+    assert not server.image_exists('Sea Cucumber')
+    assert hits(name) == 0
+
+
+def test_resolving_a_stored_image_counts_one_access(stored_word):
+    word, name = stored_word
+    [image_path] = server.resolve_images([word])
+    assert image_path.startswith(f"vocab_images/{name[:-len('.png')]}.")
+    assert hits(name) == 1
+
+    assert server.search_and_save_image(word) == image_path
+    assert hits(name) == 2
+
+
+def test_serving_an_image_counts_one_access(stored_word):
+    _, name = stored_word
+    response = server.app.test_client().get(f"/vocab_images/{name}")
+    assert response.status_code == 200
+    response.close()
+    assert hits(name) == 1
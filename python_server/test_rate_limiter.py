@@ -0,0 +1,125 @@
+"""
+Tests for per-host upstream rate limiting (UpstreamRateLimiter)
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from server import UpstreamRateLimited, UpstreamRateLimiter, parse_retry_after
+
+
+def make_limiter(rate=1000.0, burst=1000, max_concurrency=8):
+    limiter = UpstreamRateLimiter('upstream.test', rate, burst, max_concurrency)
+    # Let every decrease apply, instead of one per second
+    limiter.DECREASE_COOLDOWN = 0
+    return limiter
+
+
+def test_retry_after_pauses_the_host():
+    limiter = make_limiter()
+    limiter.record_response(429, 0.05, '30')
+
+    assert limiter.throttled == 1
+    assert 29 < limiter.stats()['paused_for'] <= 30
+    start = time.monotonic()
+    with pytest.raises(UpstreamRateLimited) as excinfo:
+        limiter.acquire(max_wait=5)
+    # Rejected straight away rather than after waiting max_wait
+    assert time.monotonic() - start < 1
+    assert excinfo.value.wait > 29
+
+
+def test_throttling_without_retry_after_backs_off_exponentially():
+    limiter = make_limiter()
+    limiter.backoff = 0.1
+    limiter.record_response(503, 0.05)
+    assert limiter.backoff == pytest.approx(0.2)
+
+    start = time.monotonic()
+    limiter.acquire(max_wait=2)
+    assert time.monotonic() - start >= 0.09
+    limiter.release()
+
+    # A success resets the backoff
+    limiter.record_response(200, 0.05)
+    assert limiter.backoff == 1.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 55 < parse_retry_after(later) <= 60
+
+
+def test_concurrency_limit_halves_and_recovers():
+    limiter = make_limiter(max_concurrency=8)
+    limiter.record_response(503, 0.05, '0')
+    assert limiter.concurrency_limit == 4
+    limiter.record_error()
+    assert limiter.concurrency_limit == 2
+    limiter.record_response(500, 0.05)
+    assert limiter.concurrency_limit == 1
+    # Never below one request at a time
+    limiter.record_error()
+    assert limiter.concurrency_limit == 1
+
+    # Additive increase: about one more slot per window of successes
+    for _ in range(3):
+        limiter.record_response(200, 0.05)
+    assert 2 < limiter.concurrency_limit < 3
+    for _ in range(100):
+        limiter.record_response(200, 0.05)
+    assert limiter.concurrency_limit == 8
+
+
+def test_slow_responses_shrink_the_limit():
+    limiter = make_limiter(max_concurrency=10)
+    limiter.record_response(200, 0.1)
+    limiter.record_response(200, 1.0)
+    assert limiter.concurrency_limit == pytest.approx(9)
+
+
+def test_rejects_when_token_wait_exceeds_max_wait():
+    limiter = make_limiter(rate=1, burst=1)
+    limiter.acquire(max_wait=0)
+    limiter.release()
+
+    start = time.monotonic()
+    with pytest.raises(UpstreamRateLimited):
+        limiter.acquire(max_wait=0.2)
+    assert time.monotonic() - start < 0.1
+    assert limiter.rejected == 1
+
+
+def test_waits_for_tokens_within_max_wait():
+    limiter = make_limiter(rate=20, burst=1)
+    limiter.acquire(max_wait=0)
+    limiter.release()
+
+    start = time.monotonic()
+    limiter.acquire(max_wait=1)
+    assert time.monotonic() - start >= 0.04
+    assert limiter.requests == 2
+
+
+def test_rejects_when_no_slot_frees_up_within_max_wait():
+    limiter = make_limiter(max_concurrency=1)
+    limiter.acquire(max_wait=0)
+    with pytest.raises(UpstreamRateLimited):
+        limiter.acquire(max_wait=0.05)
+    assert limiter.rejected == 1
+
+
+def test_released_slot_wakes_a_waiting_request():
+    limiter = make_limiter(max_concurrency=1)
+    limiter.acquire(max_wait=0)
+    threading.Timer(0.05, limiter.release).start()
+
+    limiter.acquire(max_wait=2)
+    assert limiter.in_flight == 1
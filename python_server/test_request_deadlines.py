@@ -0,0 +1,105 @@
+"""
+Tests for request deadlines, and how they apply to vocabulary completions
+shared between concurrent requests (iter_vocabulary_list)
+"""
+
+import threading
+import time
+
+import pytest
+
+import server
+from server import DeadlineExceeded
+
+OCEAN = {'word': 'Ocean', 'definition': 'A very large expanse of sea.'}
+WHALE = {'word': 'Whale', 'definition': 'A very large marine mammal.'}
+
+
+class FakeCompletion:
+    """
+    Stands in for stream_vocabulary_list(): yields OCEAN, then WHALE once
+    released. Like the OpenAI client, it times out if given a deadline that
+    passes first.
+    """
+
+    def __init__(self):
+        self.deadlines = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, theme, num_words, deadline=None):
+        self.deadlines.append(deadline)
+        self.started.set()
+        yield OCEAN
+        if not self.release.wait(None if deadline is None else max(0.0, deadline - time.monotonic())):
+            raise TimeoutError('Request timed out.')
+        yield WHALE
+
+
+@pytest.fixture
+def completion(monkeypatch):
+    fake = FakeCompletion()
+    monkeypatch.setattr(server, 'stream_vocabulary_list', fake)
+    yield fake
+    fake.release.set()
+
+
+def in_background(fn, *args, **kwargs):
+    """Run fn on a thread; returns the thread and a dict receiving its 'result' or 'error'."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = fn(*args, **kwargs)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def vocabulary(theme, deadline=None, use_cache=True):
+    return list(server.iter_vocabulary_list(theme, 2, use_cache=use_cache, deadline=deadline))
+
+
+def test_shared_completion_outlives_the_leaders_deadline(completion):
+    leader, leader_outcome = in_background(vocabulary, 'Deep Sea', deadline=time.monotonic() + 0.05)
+    assert completion.started.wait(1)
+    follower, follower_outcome = in_background(vocabulary, 'deep sea', deadline=time.monotonic() + 5)
+
+    # Past the leader's deadline; the shared completion keeps going
+    time.sleep(0.1)
+    completion.release.set()
+    leader.join(1)
+    follower.join(1)
+
+    assert completion.deadlines == [None]
+    assert leader_outcome == {'result': [OCEAN, WHALE]}
+    assert follower_outcome == {'result': [OCEAN, WHALE]}
+
+
+def test_followers_stop_waiting_at_their_own_deadline(completion):
+    leader, leader_outcome = in_background(vocabulary, 'Coral Reefs')
+    assert completion.started.wait(1)
+
+    follower, follower_outcome = in_background(vocabulary, 'Coral Reefs', deadline=time.monotonic() + 0.05)
+    follower.join(1)
+    assert isinstance(follower_outcome.get('error'), DeadlineExceeded)
+
+    completion.release.set()
+    leader.join(1)
+    assert leader_outcome == {'result': [OCEAN, WHALE]}
+
+
+def test_unshared_completion_is_bounded_by_the_deadline(completion):
+    completion.release.set()
+    deadline = time.monotonic() + 5
+    assert vocabulary('Tide Pools', deadline=deadline, use_cache=False) == [OCEAN, WHALE]
+    assert completion.deadlines == [deadline]
+
+
+def test_default_deadline_can_be_left_to_the_client():
+    assert server.get_request_deadline({}, use_default=False) is None
+    assert server.get_request_deadline({'timeoutMs': 500}, use_default=False) is not None
+    assert server.get_request_deadline({}) is not None
@@ -0,0 +1,31 @@
+"""
+Tests for rejecting invalid vocabulary request sizes before any OpenAI call
+"""
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize('num_questions', ['12', 12.5, 0, -3, server.MAX_WORDS + 1, [12], {'n': 12}])
+def test_generate_rejects_invalid_num_questions(client, num_questions):
+    response = client.post('/generate', json={'type': 'vocab', 'theme': 'Ocean', 'numQuestions': num_questions})
+    assert response.status_code == 400
+    assert 'numQuestions' in response.get_json()['error']
+
+
+def test_generate_requires_num_questions(client):
+    response = client.post('/generate', json={'type': 'vocab', 'theme': 'Ocean'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('num_words', ['12', 12.5, -1, server.MAX_WORDS + 1])
+def test_generate_vocab_rejects_invalid_num_words(client, num_words):
+    response = client.post('/generate_vocab', json={'theme': 'Ocean', 'numWords': num_words})
+    assert response.status_code == 400
+    assert 'numWords' in response.get_json()['error']
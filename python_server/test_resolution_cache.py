@@ -0,0 +1,39 @@
+"""
+Tests for the persistent word -> image URL cache (ImageResolutionCache)
+"""
+
+import pytest
+
+from server import ImageResolutionCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageResolutionCache(tmp_path / 'resolutions.sqlite3', ttl=3600, negative_ttl=3600)
+
+
+def counters(cache):
+    stats = cache.stats()
+    return stats['hits'], stats['negative_hits'], stats['misses']
+
+
+def test_get_counts_hits_and_misses(cache):
+    cache.put('Ocean', 'https://example.org/ocean.png', 'wikimedia')
+    cache.put('Zephyr', None, None)
+
+    assert cache.get('ocean') == ('https://example.org/ocean.png', 'wikimedia')
+    assert cache.get('Zephyr') == (None, None)
+    assert cache.get('Lagoon') is None
+    assert counters(cache) == (1, 1, 1)
+
+
+def test_peek_and_contains_are_not_counted(cache):
+    cache.put('Ocean', 'https://example.org/ocean.png', 'wikimedia')
+    cache.put('Zephyr', None, None)
+
+    assert cache.peek('Ocean') == ('https://example.org/ocean.png', 'wikimedia')
+    assert cache.peek('Zephyr') == (None, None)
+    assert cache.peek('Lagoon') is None
+    assert cache.contains('Zephyr')
+    assert not cache.contains('Lagoon')
+    assert counters(cache) == (0, 0, 0)
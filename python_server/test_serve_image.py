@@ -0,0 +1,131 @@
+"""
+Tests for serving stored images from /vocab_images
+"""
+
+import hashlib
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+def get(client, url, **kwargs):
+    """GET a URL, reading the whole response and closing it (which unpins the image)."""
+    response = client.get(url, **kwargs)
+    response.get_data()
+    response.close()
+    return response
+
+
+@pytest.fixture
+def stored_image():
+    """Store an image for a word in the server's image store; yields its plain and versioned URLs."""
+    word = 'Sea Turtle'
+    name = server.get_image_path(word).name
+    data = b'\x89PNG\r\n\x1a\n' + b'sea turtle'.ljust(2000, b'.')
+    tmp_path = server.VOCAB_IMAGES_TMP_DIR / f"{name}.part"
+    tmp_path.write_bytes(data)
+    blob_path = server.image_store.put(tmp_path, hashlib.sha256(data).hexdigest(), 'png', name)
+    [versioned_url] = server.resolve_images([word])
+    yield f"/vocab_images/{name}", f"/{versioned_url}", data
+    server.image_store.remove(blob_path)
+
+
+@pytest.fixture
+def hidden_files():
+    """A partial download and a dot-file in the images directory, removed afterwards."""
+    partial = server.VOCAB_IMAGES_TMP_DIR / 'secret.png.part'
+    partial.write_bytes(b'partial download')
+    dot_file = server.VOCAB_IMAGES_DIR / '.secret.png'
+    dot_file.write_bytes(b'hidden')
+    yield
+    partial.unlink()
+    dot_file.unlink()
+
+
+@pytest.mark.parametrize('path', [
+    '.secret.png',
+    '.incoming/secret.png.part',
+    'blobs/../.secret.png',
+    'blobs/../.incoming/secret.png.part',
+    'blobs/%2e%2e/.incoming/secret.png.part',
+    'ocean/../../vocab_images/.secret.png',
+])
+def test_dot_files_are_not_served_however_the_path_is_spelled(client, hidden_files, path):
+    response = get(client, f"/vocab_images/{path}")
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Image not found'}
+
+
+def test_index_is_kept_outside_the_images_directory():
+    assert server.VOCAB_IMAGES_DIR not in server.IMAGE_STORE_DB_PATH.parents
+
+
+def test_versioned_urls_are_immutable_and_revalidate_with_304(client, stored_image):
+    _, versioned_url, data = stored_image
+    response = get(client, versioned_url)
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == server.IMMUTABLE_MAX_AGE
+    etag, _ = response.get_etag()
+    assert etag
+
+    response = get(client, versioned_url, headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_plain_urls_must_be_revalidated(client, stored_image):
+    plain_url, versioned_url, data = stored_image
+    response = get(client, plain_url)
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.cache_control.no_cache
+    assert not response.cache_control.immutable
+    etag, _ = response.get_etag()
+    assert etag == get(client, versioned_url).get_etag()[0]
+
+    response = get(client, plain_url, headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304
+
+    response = get(client, plain_url, headers={'If-None-Match': '"some-other-version"'})
+    assert response.status_code == 200
+    assert response.data == data
+
+
+def test_unknown_versions_are_not_found(client, stored_image):
+    plain_url, _, _ = stored_image
+    response = get(client, plain_url.replace('.png', f".{'0' * server.IMAGE_VERSION_LENGTH}.png"))
+    assert response.status_code == 404
+
+
+def test_small_images_are_served_from_memory(client, stored_image):
+    _, versioned_url, data = stored_image
+    get(client, versioned_url)
+    hits = server.hot_image_cache.hits
+
+    response = get(client, versioned_url)
+    assert response.data == data
+    assert server.hot_image_cache.hits == hits + 1
+
+
+@pytest.mark.parametrize('cached', [True, False])
+def test_range_requests_get_206(client, stored_image, monkeypatch, cached):
+    if not cached:
+        # Too large for the memory cache, so sent from disk by send_file
+        monkeypatch.setattr(server.hot_image_cache, 'max_file_bytes', 100)
+    _, versioned_url, data = stored_image
+    too_large = server.hot_image_cache.too_large
+
+    response = get(client, versioned_url, headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == data[100:200]
+    assert response.headers['Content-Range'] == f"bytes 100-199/{len(data)}"
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert server.hot_image_cache.too_large == too_large + (0 if cached else 1)
@@ -0,0 +1,76 @@
+"""
+Tests for the pooled upstream HTTP client (UpstreamHTTPClient)
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from server import UpstreamHTTPClient
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """Answers /redirect?to=<url> with a 302 and anything else with 200, recording the request headers."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path.startswith('/redirect?to='):
+            self.send_response(302)
+            self.send_header('Location', self.path[len('/redirect?to='):])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+
+@pytest.fixture
+def upstream():
+    """A local upstream, reachable both as 127.0.0.1 and as localhost."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RecordingHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client():
+    return UpstreamHTTPClient(pool_size=2, default_rate_limit=(1000.0, 1000))
+
+
+def get(client, url):
+    headers = {'Authorization': 'Bearer secret', 'Cookie': 'session=1', 'User-Agent': 'vocab-tests'}
+    with client.request(url, headers) as response:
+        assert response.read() == b'ok'
+
+
+def test_same_host_redirect_keeps_credentials(upstream, client):
+    base = f"http://127.0.0.1:{upstream.server_port}"
+    get(client, f"{base}/redirect?to=/image.png")
+
+    [_, (path, second)] = upstream.requests
+    assert path == '/image.png'
+    assert second['Authorization'] == 'Bearer secret'
+    assert second['Cookie'] == 'session=1'
+
+
+def test_cross_host_redirect_drops_credentials(upstream, client):
+    other_host = f"http://localhost:{upstream.server_port}"
+    get(client, f"http://127.0.0.1:{upstream.server_port}/redirect?to={other_host}/image.png")
+
+    [(_, first), (path, second)] = upstream.requests
+    assert first['Authorization'] == 'Bearer secret'
+    assert path == '/image.png'
+    assert 'Authorization' not in second
+    assert 'Cookie' not in second
+    assert second['User-Agent'] == 'vocab-tests'
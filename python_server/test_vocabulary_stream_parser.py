@@ -0,0 +1,91 @@
+"""
+Tests for the incremental vocabulary completion parser (VocabularyStreamParser)
+"""
+
+import json
+
+import pytest
+
+from server import VocabularyStreamParser
+
+OCEAN = {'word': 'Ocean', 'definition': 'A very large expanse of sea.'}
+WHALE = {'word': 'Whale', 'definition': 'A very large marine mammal.'}
+
+
+def parse(text, chunk_size):
+    """Feed text to a new parser in chunks of chunk_size characters, returning the parser and its items."""
+    parser = VocabularyStreamParser()
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items.extend(parser.feed(text[start:start + chunk_size]))
+    return parser, items
+
+
+@pytest.fixture(params=[1, 3, 10000], ids=['char', 'small-chunks', 'whole'])
+def chunk_size(request):
+    return request.param
+
+
+def test_parses_array(chunk_size):
+    parser, items = parse(json.dumps([OCEAN, WHALE], indent=2), chunk_size)
+    parser.finish()
+    assert items == [OCEAN, WHALE]
+    assert parser.items_parsed == 2
+
+
+def test_returns_each_object_when_its_brace_closes():
+    parser = VocabularyStreamParser()
+    assert parser.feed('[\n  {"word": "Ocean", "definition": "A very large') == []
+    assert parser.feed(' expanse of sea."}') == [OCEAN]
+    assert parser.feed(',\n  {"word": "Whale", "definition": "A very large marine mammal."}\n]') == [WHALE]
+
+
+def test_ignores_code_fence_and_surrounding_text(chunk_size):
+    text = f"Here you go:\n```json\n{json.dumps([OCEAN, WHALE])}\n```\nEnjoy {{\"word\": \"Extra\"}}"
+    parser, items = parse(text, chunk_size)
+    parser.finish()
+    assert items == [OCEAN, WHALE]
+
+
+def test_keeps_complete_objects_of_truncated_response(chunk_size):
+    text = json.dumps([OCEAN, WHALE])[:-20]
+    parser, items = parse(text, chunk_size)
+    parser.finish()
+    assert items == [OCEAN]
+
+
+def test_braces_brackets_and_escapes_inside_strings(chunk_size):
+    tricky = {'word': 'Brace {', 'definition': 'Holds "}" and \\"] in place, like {this} or [that]\\'}
+    parser, items = parse(json.dumps([tricky, OCEAN]), chunk_size)
+    parser.finish()
+    assert items == [tricky, OCEAN]
+
+
+def test_nested_values_stay_in_their_object(chunk_size):
+    nested = {'word': 'Reef', 'tags': ['coral', {'zone': 'tropical'}], 'definition': 'A ridge near the surface.'}
+    parser, items = parse(json.dumps([nested, WHALE]), chunk_size)
+    assert items == [nested, WHALE]
+
+
+def test_skips_unparseable_object(chunk_size):
+    parser, items = parse('[{"word": "Ocean",}, ' + json.dumps(WHALE) + ']', chunk_size)
+    parser.finish()
+    assert items == [WHALE]
+    assert parser.items_parsed == 1
+
+
+def test_rejects_object_response():
+    with pytest.raises(ValueError, match='not an array'):
+        VocabularyStreamParser().feed(json.dumps({'vocabulary': [OCEAN]}))
+
+
+def test_finish_rejects_empty_or_missing_array():
+    parser = VocabularyStreamParser()
+    parser.feed('  \n')
+    with pytest.raises(ValueError, match='Empty response'):
+        parser.finish()
+
+    parser = VocabularyStreamParser()
+    parser.feed('Sorry, I cannot help with that.')
+    with pytest.raises(ValueError, match='Invalid JSON'):
+        parser.finish()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Bulk cache warming for vocabulary images
+Reads themes (one per line, vocabulary generated with OpenAI) or plain words
+from a file and resolves and downloads their images in parallel through the
+same code path as the server (resolve_images -> search_and_save_image).
+
+Progress is appended to a state file as each word finishes, so an
+interrupted run picks up where it stopped when started again.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Pre-download vocabulary images for themes or word lists')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--themes', type=Path, help='File with one theme per line (needs OPENAI_API_KEY)')
+    source.add_argument('--words', type=Path, help='File with one word per line')
+    parser.add_argument('--num-words', type=int, default=20, help='Words generated per theme (default: 20, max 50)')
+    parser.add_argument('--workers', type=int, help='Parallel image downloads (default: IMAGE_WORKERS)')
+    parser.add_argument('--rate', type=float, default=5.0,
+                        help='Maximum words started per second, to stay within upstream rate limits (default: 5, 0 = unlimited)')
+    parser.add_argument('--batch', type=int, default=50, help='Words resolved per batch (default: 50)')
+    parser.add_argument('--state', type=Path, help='Progress file (default: <input>.progress)')
+    parser.add_argument('--restart', action='store_true', help='Ignore saved progress and start over')
+    return parser.parse_args()
+
+
+def read_lines(path: Path):
+    """Read non-empty, non-comment lines from a file, without duplicates."""
+    lines = []
+    seen = set()
+    for line in path.read_text(encoding='utf-8').splitlines():
+        line = line.strip()
+        if line and not line.startswith('#') and line.lower() not in seen:
+            seen.add(line.lower())
+            lines.append(line)
+    return lines
+
+
+class WarmingState:
+    """
+    Append-only JSON lines file recording finished words and the word
+    lists generated for themes.
+
+    Args:
+        path: The state file
+        restart: If True, discard existing progress
+    """
+
+    def __init__(self, path: Path, restart: bool):
+        self.path = path
+        self.words = {}
+        self.themes = {}
+        self._lock = threading.Lock()
+
+        if restart:
+            path.unlink(missing_ok=True)
+        elif path.exists():
+            for line in path.read_text(encoding='utf-8').splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interruption
+                    continue
+                if 'theme' in record:
+                    self.themes[record['theme']] = record['words']
+                else:
+                    self.words[record['word']] = record['status']
+
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _append(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def record_theme(self, theme: str, words):
+        """Remember a theme's generated words so a resumed run doesn't generate them again."""
+        self.themes[theme] = words
+        self._append({'theme': theme, 'words': words})
+
+    def record_word(self, word: str, status: str):
+        """Remember that a word is finished ('failed' words are retried on the next run)."""
+        self.words[word] = status
+        self._append({'word': word, 'status': status})
+
+    def is_done(self, word: str) -> bool:
+        """Check whether a previous run already finished a word."""
+        return self.words.get(word, 'failed') != 'failed'
+
+    def close(self):
+        """Close the state file."""
+        self._file.close()
+
+
+class RateLimiter:
+    """
+    Spaces out work so that at most rate items start per second.
+
+    Args:
+        rate: Items per second (0 = unlimited)
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+
+    def acquire(self, count: int = 1):
+        """Wait until count more items may start."""
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(self._next, now) + count * self.interval
+
+
+def main():
+    """Warm the image cache and print a report."""
+    args = parse_args()
+
+    input_path = args.themes or args.words
+    state_path = args.state or input_path.with_name(f"{input_path.name}.progress")
+
+    # server.py reads its configuration at import time; eviction and re-scans
+    # are left to the server
+    os.environ['IMAGE_STORE_BACKGROUND_TASKS'] = 'false'
+    if args.workers:
+        os.environ['IMAGE_WORKERS'] = str(args.workers)
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    import server
+    server.logger.setLevel('WARNING')
+
+    state = WarmingState(state_path, args.restart)
+    limiter = RateLimiter(args.rate)
+    counts = {'stored': 0, 'downloaded': 0, 'no_image': 0, 'failed': 0, 'resumed': 0}
+    store_bytes_before = server.image_store.stats()['bytes']
+    start = time.perf_counter()
+    interrupted = False
+
+    try:
+        # Collect the words to warm, generating vocabulary for themes not seen before
+        if args.themes:
+            words = []
+            for theme in read_lines(args.themes):
+                if theme not in state.themes:
+                    print(f"Generating {args.num_words} words for theme '{theme}'...")
+                    vocab_list = server.generate_vocabulary_list(theme, min(args.num_words, server.MAX_WORDS))
+                    state.record_theme(theme, [vocab['word'] for vocab in vocab_list])
+                words.extend(state.themes[theme])
+        else:
+            words = read_lines(args.words)
+
+        pending = []
+        for word in dict.fromkeys(words):
+            if state.is_done(word):
+                counts['resumed'] += 1
+            else:
+                pending.append(word)
+
+        print(f"{len(pending)} words to warm ({counts['resumed']} already done in a previous run), state: {state_path}")
+
+        for offset in range(0, len(pending), args.batch):
+            batch = pending[offset:offset + args.batch]
+            limiter.acquire(len(batch))
+            already_stored = {word for word in batch if server.image_exists(word)}
+
+            for index, image_path in server.iter_resolved_images(batch):
+                word = batch[index]
+                if word in already_stored:
+                    status = 'stored'
+                elif image_path:
+                    status = 'downloaded'
+                elif server.resolution_cache.peek(word) == (None, None):
+                    status = 'no_image'
+                else:
+                    status = 'failed'
+                counts[status] += 1
+                state.record_word(word, status)
+
+            done = offset + len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"  {done}/{len(pending)} words, {done / elapsed:.1f} words/s")
+
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\nInterrupted; run the same command again to resume")
+    finally:
+        state.close()
+
+    elapsed = time.perf_counter() - start
+    processed = counts['stored'] + counts['downloaded'] + counts['no_image'] + counts['failed']
+
+    if not interrupted and server.rendition_executor is not None:
+        print("Waiting for renditions...")
+        server.rendition_executor.shutdown(wait=True)
+
+    print(f"\nWords processed:   {processed} in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.1f} words/s)")
+    print(f"Already stored:    {counts['stored']}")
+    print(f"Downloaded:        {counts['downloaded']}")
+    print(f"No image found:    {counts['no_image']}")
+    print(f"Failed (retried on next run): {counts['failed']}")
+    print(f"Skipped (resumed): {counts['resumed']}")
+    if processed:
+        print(f"Hit rate:          {counts['stored'] / processed:.1%} already stored")
+    print(f"Store grew by:     {(server.image_store.stats()['bytes'] - store_bytes_before) / 1024:.1f} KB")
+
+    if interrupted:
+        sys.exit(130)
+
+
+if __name__ == '__main__':
+    main()